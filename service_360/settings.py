@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 import os
+from celery.schedules import crontab
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -60,7 +61,27 @@ MIDDLEWARE = [
 MIDDLEWARE += ['simple_history.middleware.HistoryRequestMiddleware']
 MIDDLEWARE += [
     'session_controller.log_middleware.LogMiddleware',
+    # Внутри сессий и аутентификации: их служебные записи не закрепляют клиента за default
+    'session_controller.db_router.PrimaryPinMiddleware',
 ]
+# Логи посещений пишутся пачками вне запроса (session_controller/visit_log_writer.py)
+VISIT_LOG = {
+    'BACKEND': 'buffer',  # 'buffer', 'celery' или 'off'
+    'BATCH_SIZE': 100,
+    'FLUSH_INTERVAL': 5.0,  # секунд
+    'MAX_BUFFER': 10000,
+    'SAMPLE_RATE': 1.0,
+    'EXCLUDE_PATHS': ['/static/', '/media/', '/__debug__/', '/swagger/'],
+}
+# Замеры по каждому запросу: SQL, кэш, время каждого middleware (session_controller/instrumentation.py).
+# Результат — заголовок Server-Timing и гистограммы по маршрутам на /metrics/
+PERF_INSTRUMENTATION = True
+PERF_METRICS_TOKEN = os.environ.get('PERF_METRICS_TOKEN')
+if PERF_INSTRUMENTATION:
+    MIDDLEWARE = ['session_controller.instrumentation.InstrumentationMiddleware'] + [
+        item for name in MIDDLEWARE
+        for item in ('session_controller.instrumentation.MiddlewareTimer', name)
+    ] + ['session_controller.instrumentation.MiddlewareTimer']
 INTERNAL_IPS = [
     '127.0.0.1',  # Для локального сервера
     'localhost',   # Еще одна возможность для localhost
@@ -70,6 +91,11 @@ REST_FRAMEWORK = {
 
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    # orjson, если установлен (session_controller/fast_lists.py)
+    'DEFAULT_RENDERER_CLASSES': [
+        'session_controller.fast_lists.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 ROOT_URLCONF = 'service_360.urls'
@@ -96,12 +122,53 @@ WSGI_APPLICATION = 'service_360.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Постоянные соединения: держатся между запросами и проверяются перед повторным использованием
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 60))
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+# Реплика для отчётов (session_controller/db_router.py). Локально вместо неё подойдёт копия SQLite
+# или та же база только на чтение: REPLICA_DB_NAME='file:/путь/db.sqlite3?mode=ro'
+if os.environ.get('REPLICA_DB_NAME'):
+    DATABASES['replica'] = {
+        'ENGINE': os.environ.get('REPLICA_DB_ENGINE', 'django.db.backends.sqlite3'),
+        'NAME': os.environ['REPLICA_DB_NAME'],
+        'HOST': os.environ.get('REPLICA_DB_HOST', ''),
+        'PORT': os.environ.get('REPLICA_DB_PORT', ''),
+        'USER': os.environ.get('REPLICA_DB_USER', ''),
+        'PASSWORD': os.environ.get('REPLICA_DB_PASSWORD', ''),
+        'OPTIONS': {'uri': True} if os.environ['REPLICA_DB_NAME'].startswith('file:') else {},
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'MIRROR': 'default'},
     }
+# Режим SQLite для конкурентной записи (session_controller/db_maintenance.py): прагмы на каждое соединение,
+# короткие транзакции BEGIN IMMEDIATE вместо повышения блокировки посреди транзакции.
+# WAL хранится в файле базы и включается один раз при выкладке: manage.py sqlite_maintenance --enable-wal
+SQLITE = {
+    'BUSY_TIMEOUT': 10000,  # мс ожидания блокировки записи вместо «database is locked»
+    'MMAP_SIZE': 256 * 1024 * 1024,
+    'CACHE_SIZE_KB': 64 * 1024,  # на соединение
+    'VACUUM_PAGES': 2000,  # страниц за один проход incremental_vacuum
 }
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default']['OPTIONS'] = {
+        'init_command': ';'.join((
+            f"PRAGMA busy_timeout={SQLITE['BUSY_TIMEOUT']}",
+            f"PRAGMA mmap_size={SQLITE['MMAP_SIZE']}",
+            f"PRAGMA cache_size=-{SQLITE['CACHE_SIZE_KB']}",
+            'PRAGMA temp_store=MEMORY',
+        )),
+        'transaction_mode': 'IMMEDIATE',
+    }
+DATABASE_ROUTERS = ['session_controller.db_router.ReplicaRouter']
+# Сколько секунд после записи клиент читает только из default (отставание реплики)
+REPLICA_PIN_SECONDS = 5
 INSTALLED_APPS += ['django_celery_beat']
 
 CELERY_BROKER_URL = 'redis://127.0.0.1:6379/0'
@@ -109,6 +176,98 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_BACKEND = 'redis://127.0.0.1:6379/0'
 CELERY_CACHE_BACKEND = 'django-cache'
+CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+CELERY_BEAT_SCHEDULE = {
+    'rollup-visit-logs': {
+        'task': 'session_controller.tasks.rollup_visit_logs',
+        'schedule': 60 * 5,
+    },
+    'prune-visit-logs': {
+        'task': 'session_controller.tasks.prune_visit_logs',
+        'schedule': 60 * 60 * 24,
+    },
+    'prune-pdf-cache': {
+        'task': 'session_controller.tasks.prune_pdf_cache',
+        'schedule': 60 * 60 * 24,
+    },
+}
+# Сырые логи посещений старше этого срока остаются только в агрегатах
+VISIT_LOG_RETENTION_DAYS = 30
+# Справочник сотрудников для ночной синхронизации (session_controller/hris_sync.py)
+HRIS_DIRECTORY = {
+    'PATH': os.environ.get('HRIS_DIRECTORY_PATH'),
+    'DEACTIVATE_MISSING': os.environ.get('HRIS_DEACTIVATE_MISSING') == '1',
+}
+if HRIS_DIRECTORY['PATH']:
+    CELERY_BEAT_SCHEDULE['sync-directory'] = {
+        'task': 'session_controller.tasks.sync_directory',
+        'schedule': crontab(hour=2, minute=0),
+    }
+# Сжатие и срок хранения таблиц истории (session_controller/history.py)
+HISTORY_RETENTION = {
+    'KEEP_VERSIONS': 10,  # последние версии объекта хранятся всегда
+    'KEEP_DAYS': 180,  # более старые версии — не дольше этого срока
+    'BATCH_SIZE': 1000,
+    'MODELS': ['session_controller.Session', 'session_controller.Assessment',
+               'session_controller.Competency', 'session_controller.Profile'],
+}
+CELERY_BEAT_SCHEDULE['compact-history'] = {
+    'task': 'session_controller.tasks.compact_history',
+    'schedule': crontab(hour=4, minute=0),
+}
+# Составной индекс (history_date, id) в таблицах истории — для отбора по сроку хранения и страниц истории
+SIMPLE_HISTORY_DATE_INDEX = 'Composite'
+# Архивация старых сессий (session_controller/archive.py): сжатые JSONL вне MEDIA_ROOT
+SESSION_ARCHIVE = {
+    'DIR': os.environ.get('SESSION_ARCHIVE_DIR', BASE_DIR / 'archive'),
+    'AGE_DAYS': 30,
+    'BATCH_SIZE': 100,  # сессий в файле
+    'DELETE_CHUNK_SIZE': 1000,  # строк в одной транзакции удаления
+    'PAUSE': 0.2,  # секунд между пачками
+    'MAX_SECONDS': 15 * 60,  # остальное доделает следующий запуск
+}
+CELERY_BEAT_SCHEDULE['archive-old-sessions'] = {
+    'task': 'session_controller.tasks.archive_old_sessions',
+    'schedule': crontab(hour=3, minute=0),
+}
+# PDF-резюме профилей (session_controller/pdf_export.py): кэш по хэшу содержимого и архивы в закрытом каталоге
+PDF_EXPORT = {
+    'FONT_PATH': os.environ.get('PDF_FONT_PATH', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'),
+    'PROCESSES': None,  # None — по числу процессоров
+    'DIR': os.environ.get('PDF_EXPORT_DIR', BASE_DIR / 'private' / 'pdf'),  # вне MEDIA_ROOT, архив отдаёт админка
+    'CACHE_DIR': 'cache',
+    'OUTPUT_DIR': 'archives',
+    'CACHE_MAX_AGE_DAYS': 30,
+    'OUTPUT_MAX_AGE_HOURS': 24,
+}
+CELERY_BEAT_SCHEDULE['prune-pdf-exports'] = {
+    'task': 'session_controller.tasks.prune_pdf_exports',
+    'schedule': crontab(minute=20),
+}
+# Подсказки при вводе (session_controller/autocomplete.py): индекс в памяти каждого процесса
+AUTOCOMPLETE = {
+    'LIMIT': 20,
+    'WARM_ON_STARTUP': True,  # загрузка индексов в service_360/wsgi.py
+}
+# Полнотекстовый поиск (session_controller/search.py): FTS5 в SQLite, tsvector в PostgreSQL
+SEARCH = {
+    'HOME_LIMIT': 10,  # результатов каждого вида на главной
+    'API_LIMIT': 20,
+    'API_MAX_LIMIT': 100,
+    'SNIPPET_WORDS': 12,
+}
+# Выгрузка оценок (session_controller/exports.py): потоково в ответе или фоновой задачей в закрытый каталог
+ASSESSMENT_EXPORT = {
+    'CHUNK_SIZE': 2000,
+    'ASYNC_THRESHOLD': 200000,  # строк; больше — только фоновой задачей
+    'XLSX_MAX_ROWS': 100000,
+    'DIR': os.environ.get('ASSESSMENT_EXPORT_DIR', BASE_DIR / 'private' / 'exports'),  # вне MEDIA_ROOT
+    'MAX_AGE_HOURS': 24,  # потом файл удаляется и ссылка перестаёт работать
+}
+CELERY_BEAT_SCHEDULE['prune-assessment-exports'] = {
+    'task': 'session_controller.tasks.prune_assessment_exports',
+    'schedule': crontab(minute=10),
+}
 CACHES = {
     'default': {
         'BACKEND': 'django_redis.cache.RedisCache',
@@ -119,11 +278,46 @@ CACHES = {
         'TIMEOUT': 60 * 15,  # 15 минут
     }
 }
+# Время жизни кэша страниц и фрагментов; устаревание по записи — через версии моделей (cache_utils.py)
+PAGE_CACHE_TIMEOUT = 60 * 15
+# Предвычисленные модели чтения (session_controller/read_models.py): прогрев после записей, по расписанию и при выкладке
+READ_MODELS = {
+    'TIMEOUT': 60 * 60 * 24,  # ключи версионированы, срок жизни только ограничивает мусор в кэше
+    'INTERVAL': 60 * 15,  # начальный интервал задач «read-model:<имя>» в django_celery_beat
+    'REFRESH_DELAY': 2,  # секунд; записи за это время прогреваются одной задачей
+}
+CELERY_BEAT_SCHEDULE['refresh-read-models'] = {
+    'task': 'session_controller.tasks.refresh_read_models',
+    'schedule': 60,
+}
+# Роль пользователя для проверок доступа (session_controller/roles.py); сбрасывается при записи Profile
+ROLE_CACHE_TIMEOUT = 60 * 60
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = '127.0.0.1'
 EMAIL_PORT = 1025  # Порт MailHog для SMTP
 EMAIL_USE_TLS = False  # MailHog не требует TLS
 DEFAULT_FROM_EMAIL = 'no-reply@test.com'
+# Кампания напоминаний оценщикам (session_controller/reminders.py); проверяется локально через MailHog
+REMINDERS = {
+    'MIN_INTERVAL_HOURS': 24,  # не чаще одного письма оценщику за этот срок
+    'REPEAT_UNCHANGED_DAYS': 7,  # тот же набор пропусков повторяется не чаще этого срока
+    'RATE_PER_SECOND': 10,  # ограничение скорости отправки; 0 — без ограничения
+    'BATCH_SIZE': 200,  # как часто записывать отметки об отправке
+    'MAX_SESSIONS_IN_DIGEST': 20,
+}
+CELERY_BEAT_SCHEDULE['send-reminders'] = {
+    'task': 'session_controller.tasks.send_reminders',
+    'schedule': crontab(hour=9, minute=0, day_of_week='mon-fri'),
+}
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    CELERY_BEAT_SCHEDULE['optimize-database'] = {
+        'task': 'session_controller.tasks.optimize_database',
+        'schedule': crontab(minute=15),
+    }
+    CELERY_BEAT_SCHEDULE['maintain-database'] = {
+        'task': 'session_controller.tasks.maintain_database',
+        'schedule': crontab(hour=4, minute=30),
+    }
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -142,8 +336,24 @@ AUTH_PASSWORD_VALIDATORS = [
         'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
     },
 ]
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+# Сессии читаются из кэша, в базу пишутся только создание и смена входа (session_controller/session_store.py)
+SESSION_ENGINE = 'session_controller.session_store'
 SESSION_COOKIE_AGE = 3600
+SESSIONS = {
+    'FALLBACK_CACHE': 'sessions_fallback',  # кэш в памяти процесса на время недоступности Redis
+    'RETRY_SECONDS': 30,  # как долго не обращаться к Redis после ошибки
+    'CLEANUP_BATCH_SIZE': 5000,
+}
+CACHES['sessions_fallback'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'sessions',
+    'TIMEOUT': SESSION_COOKIE_AGE,
+    'OPTIONS': {'MAX_ENTRIES': 10000},
+}
+CELERY_BEAT_SCHEDULE['clear-expired-sessions'] = {
+    'task': 'session_controller.tasks.clear_expired_sessions',
+    'schedule': crontab(minute=40),
+}
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
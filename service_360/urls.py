@@ -49,6 +49,9 @@ urlpatterns = [
 
 
     path('logs/', visit_logs, name='visit_logs'),
+    path('logs/stats/', visit_stats, name='visit_stats'),
+    path('logs/writer/', visit_log_writer_stats, name='visit_log_writer_stats'),
+    path('metrics/', metrics, name='metrics'),
     path('admin/', admin.site.urls),
     path('api/', include('session_controller.urls')),
 ]
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'service_360.settings')
 
 application = get_wsgi_application()
+
+# Индексы подсказок загружаются до первого запроса (при --preload gunicorn — один раз до fork)
+from session_controller import autocomplete  # noqa: E402
+
+autocomplete.warm()
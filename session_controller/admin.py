@@ -1,30 +1,112 @@
-from django.template.loader import render_to_string
-from reportlab.pdfgen import canvas
-from django.http import HttpResponse
 from .models import Profile, SessionCompetency
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
 from import_export import resources
 from import_export.admin import ExportMixin
 from .models import Evaluator, Session, Assessment, Competency, Profile, Project
-from django.urls import reverse
+from . import autocomplete, exports, pdf_export
+from .tasks import export_profile_pdfs
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, Http404
+from django.urls import path, reverse
 from django.utils.html import format_html
-import pdfkit
 
 
-class EvaluatorInline(admin.TabularInline):
+class IndexedAutocompleteSelect(AutocompleteSelect):
+    """
+    Виджет автодополнения админки, который берёт подсказки из индекса в памяти (autocomplete.py),
+    а не из AutocompleteJsonView с поиском по базе.
+    """
+    def __init__(self, field, admin_site, index_name, **kwargs):
+        self.index_name = index_name
+        super().__init__(field, admin_site, **kwargs)
+
+    def get_url(self):
+        return reverse('autocomplete_api', args=[self.index_name])
+
+
+class IndexedAutocompleteMixin:
+    # Поле внешнего ключа -> имя индекса подсказок
+    indexed_autocomplete_fields = {}
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        index_name = self.indexed_autocomplete_fields.get(db_field.name)
+        if index_name:
+            # Выбранное значение подгружается одним запросом, список целиком не строится
+            kwargs['widget'] = IndexedAutocompleteSelect(db_field, self.admin_site, index_name)
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+class IndexedAutocompleteFilter(admin.SimpleListFilter):
+    """
+    Фильтр списка с полем автодополнения вместо перечня всех значений в боковой панели.
+    """
+    template = 'admin/autocomplete_filter.html'
+    index_name = None
+    field_name = None
+
+    def lookups(self, request, model_admin):
+        object_id = self.object_id()
+        if object_id is None:
+            return []
+        return [(str(object_id), autocomplete.label(self.index_name, object_id) or object_id)]
+
+    def has_output(self):
+        return True
+
+    def object_id(self):
+        value = self.value()
+        return int(value) if value and value.isdigit() else None
+
+    def queryset(self, request, queryset):
+        if self.value() is None:
+            return queryset
+        object_id = self.object_id()
+        return queryset.filter(**{f'{self.field_name}_id': object_id}) if object_id else queryset.none()
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.value() is None,
+            'query_string': changelist.get_query_string(remove=[self.parameter_name]),
+            'display': 'Все',
+        }
+
+    def selected(self):
+        return self.lookup_choices[0] if self.lookup_choices else None
+
+    def url(self):
+        return reverse('autocomplete_api', args=[self.index_name])
+
+    @staticmethod
+    def media(field, admin_site, index_name):
+        # Скрипты select2 из админки и переход по выбранному значению
+        return (IndexedAutocompleteSelect(field, admin_site, index_name).media
+                + forms.Media(js=['js/autocomplete_filter.js']))
+
+
+class EvaluatorAutocompleteFilter(IndexedAutocompleteFilter):
+    title = 'evaluator'
+    parameter_name = 'evaluator'
+    index_name = 'users'
+    field_name = 'evaluator'
+
+
+class EvaluatorInline(IndexedAutocompleteMixin, admin.TabularInline):
     model = Evaluator
     extra = 1
     fields = ('evaluator',)
     fk_name = 'session'
+    indexed_autocomplete_fields = {'evaluator': 'users'}
 
 
-class SessionAdmin(admin.ModelAdmin):
+class SessionAdmin(IndexedAutocompleteMixin, admin.ModelAdmin):
     list_display = ('title', 'evaluated_link', 'is_active', 'created_at')
     list_filter = ('is_active', 'created_at')
     list_display_links = ('title',)
     search_fields = ['title', 'evaluated__username']
     fields = ('title', 'evaluated', 'is_active')
-    raw_id_fields = ('evaluated',)
+    indexed_autocomplete_fields = {'evaluated': 'users'}
     date_hierarchy = 'created_at'
     inlines = [EvaluatorInline]
 
@@ -62,22 +144,56 @@ class AssessmentResource(resources.ModelResource):
         return assessment.created_at.strftime('%Y-%m-%d')
 
 
-class AssessmentAdmin(ExportMixin, admin.ModelAdmin):
+class AssessmentAdmin(IndexedAutocompleteMixin, ExportMixin, admin.ModelAdmin):
     list_display = ('session', 'competency',
                     'evaluator', 'score', 'created_at')
     resource_class = AssessmentResource
-    list_filter = ('created_at', 'score', 'evaluator')
+    list_filter = ('created_at', 'score', EvaluatorAutocompleteFilter)
+    indexed_autocomplete_fields = {'evaluator': 'users', 'competency': 'competencies'}
     search_fields = ['session__title', 'competency__name']
+    # Связи нужны и в списке, и в dehydrate_* при экспорте — одним JOIN вместо запроса на строку
+    list_select_related = ('session__evaluated', 'competency', 'evaluator')
+    actions = ['export_as_csv', 'export_as_jsonl', 'export_as_xlsx']
+
+    @property
+    def media(self):
+        return super().media + EvaluatorAutocompleteFilter.media(
+            Assessment._meta.get_field('evaluator'), self.admin_site, 'users')
+
+    def _stream_export(self, request, queryset, export_format):
+        try:
+            exports.check_format(export_format, queryset.count())
+        except exports.ExportError as e:
+            self.message_user(request, str(e), level='error')
+            return None
+        return exports.export_response(queryset, export_format)
+
+    @admin.action(description="Выгрузить в CSV (потоково)")
+    def export_as_csv(self, request, queryset):
+        return self._stream_export(request, queryset, 'csv')
+
+    @admin.action(description="Выгрузить в JSONL (потоково)")
+    def export_as_jsonl(self, request, queryset):
+        return self._stream_export(request, queryset, 'jsonl')
+
+    @admin.action(description="Выгрузить в XLSX")
+    def export_as_xlsx(self, request, queryset):
+        return self._stream_export(request, queryset, 'xlsx')
 
 
 admin.site.register(Assessment, AssessmentAdmin)
 
-admin.site.register(Evaluator)
+
+@admin.register(Evaluator)
+class EvaluatorAdmin(IndexedAutocompleteMixin, admin.ModelAdmin):
+    indexed_autocomplete_fields = {'evaluator': 'users'}
+
+
 admin.site.register(Project)
 
 
 @admin.register(Profile)
-class ProfileAdmin(admin.ModelAdmin):
+class ProfileAdmin(IndexedAutocompleteMixin, admin.ModelAdmin):
     list_display = ('full_name', 'user', 'department', 'role',)
     list_filter = ('hire_date', 'department', 'role', 'is_active')
     search_fields = ['full_name', 'role', 'user__username']
@@ -85,6 +201,7 @@ class ProfileAdmin(admin.ModelAdmin):
     actions = ['export_resume_as_pdf']
 
     filter_horizontal = ('projects', )
+    indexed_autocomplete_fields = {'user': 'users'}
 
     fieldsets = (
         (None, {
@@ -96,27 +213,34 @@ class ProfileAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_urls(self):
+        return [
+            path('resume-archives/<str:name>/', self.admin_site.admin_view(self.resume_archive),
+                 name='session_controller_profile_resume_archive'),
+        ] + super().get_urls()
+
+    def resume_archive(self, request, name):
+        # admin_view пускает только персонал; архив содержит данные профилей — нужен и просмотр профилей
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        archive = pdf_export.stored_archive(name)
+        if archive is None:
+            raise Http404("Архив ещё не готов или срок его хранения истёк.")
+        return FileResponse(open(archive, 'rb'), as_attachment=True, filename=name)
+
     def export_resume_as_pdf(self, request, queryset):
-        if not queryset.exists():
+        profile_ids = list(queryset.values_list('id', flat=True))
+        if not profile_ids:
             self.message_user(
                 request, "Нет выбранных профилей для экспорта.", level='error')
             return
 
-        # Рендерим HTML-шаблон
-        path_to_wkhtmltopdf = r'C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe'  # Укажите путь к wkhtmltopdf
-        config = pdfkit.configuration(wkhtmltopdf=path_to_wkhtmltopdf)
-
-        html_string = render_to_string(
-            'pdf_template.html', {'profiles': queryset})
-
-        # Генерируем PDF с помощью pdfkit
-        pdf = pdfkit.from_string(html_string, False, configuration=config)
-        # pdf = pdfkit.from_string(html_string, False)
-
-        # Отправляем PDF в ответе
-        response = HttpResponse(pdf, content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="resumes.pdf"'
-        return response
+        # Рисуется фоновой задачей; ссылка на архив известна сразу
+        name, url = pdf_export.output_path()
+        export_profile_pdfs.delay(profile_ids, name)
+        self.message_user(request, format_html(
+            'Экспорт {} профилей поставлен в очередь. Архив появится по ссылке: <a href="{}">{}</a>',
+            len(profile_ids), url, url))
 
     export_resume_as_pdf.short_description = "Экспортировать резюме в PDF"
 
@@ -125,4 +249,7 @@ class ProfileAdmin(admin.ModelAdmin):
 
 admin.site.register(Competency)
 
-admin.site.register(SessionCompetency)
+
+@admin.register(SessionCompetency)
+class SessionCompetencyAdmin(IndexedAutocompleteMixin, admin.ModelAdmin):
+    indexed_autocomplete_fields = {'competency': 'competencies'}
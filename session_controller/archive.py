@@ -0,0 +1,250 @@
+"""
+Архивация старых сессий в сжатые JSONL-файлы и восстановление из них.
+
+Сессии обрабатываются пачками по id. Пачка сначала целиком (с оценщиками,
+компетенциями и оценками) записывается в файл .jsonl.gz, файл атомарно
+появляется на диске, и только потом строки удаляются из базы небольшими
+транзакциями. В ArchiveCheckpoint хранятся id записанных, но ещё не
+удалённых сессий: прерванный запуск сначала доудаляет их. Между пачками
+делается пауза, а запуск ограничен по времени, поэтому запись не держит
+базу подолгу и не мешает обычным запросам.
+
+Удаление идёт мимо сигналов: архивный файл и есть запись об удалённых
+объектах, поэтому строк истории на каждую оценку не создаётся, а сводки,
+поисковый индекс и версии кэша обновляются пачкой.
+"""
+import gzip
+import json
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import now
+from simple_history.utils import bulk_create_with_history
+
+from . import score_summaries, search
+from .cache_utils import bump_model_version
+from .models import (ArchiveCheckpoint, Assessment, Competency, Evaluator, SearchDocument, Session,
+                     SessionCompetency, SessionCompetencyScoreSummary, SessionScoreSummary)
+
+CHECKPOINT_NAME = 'sessions'
+SESSION_FIELDS = ('id', 'title', 'evaluated_id', 'is_active', 'created_at')
+ASSESSMENT_FIELDS = ('id', 'competency_id', 'evaluator_id', 'score', 'comment', 'created_at')
+# Порядок удаления: сначала зависимые строки, сессии последними
+CHILD_MODELS = (Assessment, Evaluator, SessionCompetency, SessionCompetencyScoreSummary, SessionScoreSummary)
+CHANGE_REASON = 'Восстановлено из архива'
+
+
+def archive_settings(name):
+    return settings.SESSION_ARCHIVE[name]
+
+
+def archive_dir():
+    return str(archive_settings('DIR'))
+
+
+def eligible_sessions(days=None):
+    cutoff = now() - timedelta(days=days or archive_settings('AGE_DAYS'))
+    return Session.objects.filter(is_active=False, created_at__lt=cutoff)
+
+
+def serialize(session_ids):
+    """
+    Метод для выборки пачки сессий с зависимыми строками: четыре запроса на пачку.
+    """
+    records = {}
+    for row in Session.objects.filter(id__in=session_ids).order_by('id').values(*SESSION_FIELDS):
+        row['created_at'] = row['created_at'].isoformat()
+        records[row['id']] = {'session': row, 'evaluators': [], 'competencies': [], 'assessments': []}
+    for session_id, evaluator_id in Evaluator.objects.filter(session_id__in=records).values_list(
+            'session_id', 'evaluator_id'):
+        records[session_id]['evaluators'].append(evaluator_id)
+    for session_id, competency_id, description in SessionCompetency.objects.filter(
+            session_id__in=records).values_list('session_id', 'competency_id', 'discription'):
+        records[session_id]['competencies'].append({'competency_id': competency_id, 'discription': description})
+    assessments = Assessment.objects.filter(session_id__in=records).order_by('id').values(
+        'session_id', *ASSESSMENT_FIELDS)
+    for row in assessments.iterator(chunk_size=2000):
+        row['created_at'] = row['created_at'].isoformat()
+        records[row.pop('session_id')]['assessments'].append(row)
+    return list(records.values())
+
+
+def write_file(records):
+    """
+    Метод для записи пачки в архивный файл. Файл появляется под своим именем только целиком.
+    """
+    directory = archive_dir()
+    os.makedirs(directory, exist_ok=True)
+    first, last = records[0]['session']['id'], records[-1]['session']['id']
+    name = f"sessions-{now():%Y%m%d-%H%M%S}-{first}-{last}.jsonl.gz"
+    path = os.path.join(directory, name)
+    partial = path + '.part'
+    with gzip.open(partial, 'wt', encoding='utf-8') as target:
+        for record in records:
+            target.write(json.dumps(record, ensure_ascii=False) + '\n')
+    with open(partial, 'rb') as written:
+        os.fsync(written.fileno())
+    os.replace(partial, path)
+    return name
+
+
+def delete_sessions(session_ids, chunk_size):
+    """
+    Метод для удаления заархивированных сессий короткими транзакциями.
+    """
+    for model in CHILD_MODELS:
+        ids = list(model.objects.filter(session_id__in=session_ids).values_list('id', flat=True))
+        for start in range(0, len(ids), chunk_size):
+            with transaction.atomic():
+                # _raw_delete — без сигналов и строк истории; связи этих строк уже удалены или в архиве
+                model.objects.filter(id__in=ids[start:start + chunk_size])._raw_delete(model.objects.db)
+    with transaction.atomic():
+        SearchDocument.objects.filter(kind='session', object_id__in=session_ids).delete()
+        Session.objects.filter(id__in=session_ids)._raw_delete(Session.objects.db)
+    for model in (Session, SessionCompetency, Evaluator, SearchDocument):
+        bump_model_version(model)
+
+
+def archive_sessions(days=None, batch_size=None, max_seconds=None, dry_run=False):
+    """
+    Метод для архивации неактивных сессий старше срока. Возвращает счётчики;
+    если время запуска кончилось, оставшиеся сессии обработает следующий запуск.
+    """
+    batch_size = batch_size or archive_settings('BATCH_SIZE')
+    max_seconds = max_seconds if max_seconds is not None else archive_settings('MAX_SECONDS')
+    chunk_size = archive_settings('DELETE_CHUNK_SIZE')
+    pause = archive_settings('PAUSE')
+    started = time.monotonic()
+    stats = {'sessions': 0, 'assessments': 0, 'files': [], 'resumed': 0, 'finished': True}
+
+    checkpoint, _ = ArchiveCheckpoint.objects.get_or_create(name=CHECKPOINT_NAME)
+    if checkpoint.pending and not dry_run:
+        # Прошлый запуск прервался после записи файла — доудаляем то, что уже в архиве
+        delete_sessions(checkpoint.pending, chunk_size)
+        stats['resumed'] = len(checkpoint.pending)
+        checkpoint.pending, checkpoint.pending_file = [], ''
+        checkpoint.save(update_fields=['pending', 'pending_file', 'updated_at'])
+
+    queryset = eligible_sessions(days).order_by('id')
+    last_id = 0
+    while True:
+        session_ids = list(queryset.filter(id__gt=last_id).values_list('id', flat=True)[:batch_size])
+        if not session_ids:
+            break
+        last_id = session_ids[-1]
+        records = serialize(session_ids)
+        stats['sessions'] += len(records)
+        stats['assessments'] += sum(len(record['assessments']) for record in records)
+        if dry_run or not records:
+            continue
+
+        name = write_file(records)
+        stats['files'].append(name)
+        archived = [record['session']['id'] for record in records]
+        checkpoint.last_id, checkpoint.pending, checkpoint.pending_file = last_id, archived, name
+        checkpoint.save(update_fields=['last_id', 'pending', 'pending_file', 'updated_at'])
+
+        delete_sessions(archived, chunk_size)
+        checkpoint.pending, checkpoint.pending_file = [], ''
+        checkpoint.save(update_fields=['pending', 'pending_file', 'updated_at'])
+
+        if max_seconds and time.monotonic() - started > max_seconds:
+            stats['finished'] = False
+            break
+        # Даём пройти записям обычных запросов
+        time.sleep(pause)
+    return stats
+
+
+def read_file(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as source:
+        for line in source:
+            if line.strip():
+                yield json.loads(line)
+
+
+def restore(paths, session_ids=None, batch_size=None):
+    """
+    Метод для восстановления сессий из архивных файлов с прежними id.
+    Уже существующие сессии пропускаются; строки, ссылающиеся на удалённых
+    пользователей или компетенции, не восстанавливаются и попадают в отчёт.
+    """
+    batch_size = batch_size or archive_settings('BATCH_SIZE')
+    wanted = set(session_ids) if session_ids else None
+    stats = {'restored': 0, 'existing': 0, 'assessments': 0, 'skipped': []}
+    batch = []
+    for path in paths:
+        for record in read_file(path):
+            if wanted is None or record['session']['id'] in wanted:
+                batch.append(record)
+            if len(batch) >= batch_size:
+                _restore_batch(batch, stats)
+                batch = []
+    _restore_batch(batch, stats)
+    return stats
+
+
+def _restore_batch(records, stats):
+    if not records:
+        return
+    by_id = {record['session']['id']: record for record in records}
+    existing = set(Session.objects.filter(id__in=by_id).values_list('id', flat=True))
+    stats['existing'] += len(existing)
+    records = [record for session_id, record in by_id.items() if session_id not in existing]
+    user_ids = {record['session']['evaluated_id'] for record in records}
+    competency_ids = set()
+    for record in records:
+        user_ids.update(record['evaluators'])
+        user_ids.update(row['evaluator_id'] for row in record['assessments'])
+        competency_ids.update(row['competency_id'] for row in record['competencies'])
+        competency_ids.update(row['competency_id'] for row in record['assessments'])
+    users = set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+    competencies = set(Competency.objects.filter(id__in=competency_ids).values_list('id', flat=True))
+
+    sessions, evaluators, links, assessments = [], [], [], []
+    for record in records:
+        row = record['session']
+        if row['evaluated_id'] not in users:
+            stats['skipped'].append(f"сессия {row['id']}: нет оцениваемого пользователя {row['evaluated_id']}")
+            continue
+        sessions.append(Session(**dict(row, created_at=parse_datetime(row['created_at']))))
+        evaluators.extend(Evaluator(session_id=row['id'], evaluator_id=user_id)
+                          for user_id in record['evaluators'] if user_id in users)
+        links.extend(SessionCompetency(session_id=row['id'], **link)
+                     for link in record['competencies'] if link['competency_id'] in competencies)
+        for assessment in record['assessments']:
+            if assessment['evaluator_id'] in users and assessment['competency_id'] in competencies:
+                assessments.append(Assessment(session_id=row['id'], **dict(
+                    assessment, created_at=parse_datetime(assessment['created_at']))))
+            else:
+                stats['skipped'].append(f"оценка {assessment['id']} сессии {row['id']}: нет пользователя "
+                                        f"или компетенции")
+    if not sessions:
+        return
+
+    created_at = {('session', obj.id): obj.created_at for obj in sessions}
+    created_at.update({('assessment', obj.id): obj.created_at for obj in assessments})
+    session_ids = [obj.id for obj in sessions]
+    with transaction.atomic(), score_summaries.suspended():
+        bulk_create_with_history(sessions, Session, default_change_reason=CHANGE_REASON)
+        Evaluator.objects.bulk_create(evaluators)
+        SessionCompetency.objects.bulk_create(links)
+        bulk_create_with_history(assessments, Assessment, default_change_reason=CHANGE_REASON)
+        # auto_now_add при вставке ставит текущее время — возвращаем исходные даты
+        for obj in sessions:
+            obj.created_at = created_at[('session', obj.id)]
+        for obj in assessments:
+            obj.created_at = created_at[('assessment', obj.id)]
+        Session.objects.bulk_update(sessions, ['created_at'], batch_size=500)
+        Assessment.objects.bulk_update(assessments, ['created_at'], batch_size=500)
+        score_summaries.rebuild(session_ids)
+    search.index('session', session_ids)
+    for model in (Session, SessionCompetency, Evaluator):
+        bump_model_version(model)
+    stats['restored'] += len(sessions)
+    stats['assessments'] += len(assessments)
@@ -0,0 +1,216 @@
+"""
+Подсказки при вводе (autocomplete) для пользователей и компетенций.
+
+Каждый процесс держит в памяти отсортированный список пар (слово, id) и ищет
+в нём префикс двоичным поиском, поэтому ответ не обращается к базе. Индекс
+загружается при старте (см. service_360/wsgi.py) и помечается версиями
+моделей из cache_utils: изменения в этом процессе применяются к индексу
+сразу (signals.py), а изменения из других процессов и массовые записи
+видны по сменившейся версии — тогда индекс перечитывается целиком.
+"""
+import bisect
+import logging
+import re
+import threading
+from typing import Callable, NamedTuple, Tuple
+
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from .cache_utils import bump_model_version, model_label, model_versions
+from .models import Competency, Profile
+
+logger = logging.getLogger(__name__)
+
+WORD_RE = re.compile(r'\w+')
+
+
+def words(text):
+    return WORD_RE.findall((text or '').lower().replace('ё', 'е'))
+
+
+class PrefixIndex:
+    def __init__(self, entries=()):
+        self.labels = {}
+        self.tokens = {}
+        self._by_label = None
+        pairs = []
+        for object_id, label, text in entries:
+            tokens = self._remember(object_id, label, text)
+            pairs.extend((token, object_id) for token in tokens)
+        self.pairs = sorted(set(pairs))
+
+    def _remember(self, object_id, label, text):
+        tokens = tuple(sorted(set(words(text))))
+        self._by_label = None
+        self.labels[object_id] = label
+        self.tokens[object_id] = tokens
+        return tokens
+
+    def __len__(self):
+        return len(self.labels)
+
+    def remove(self, object_id):
+        for token in self.tokens.pop(object_id, ()):
+            position = bisect.bisect_left(self.pairs, (token, object_id))
+            if position < len(self.pairs) and self.pairs[position] == (token, object_id):
+                del self.pairs[position]
+        self.labels.pop(object_id, None)
+        self._by_label = None
+
+    def upsert(self, object_id, label, text):
+        self.remove(object_id)
+        for token in self._remember(object_id, label, text):
+            bisect.insort(self.pairs, (token, object_id))
+
+    def lookup(self, query, offset=0, limit=20):
+        """
+        Метод для поиска по префиксам слов: все слова запроса должны быть началами слов записи.
+        Возвращает ([(id, подпись)], есть ли ещё результаты).
+        """
+        needed = offset + limit + 1
+        terms = words(query)
+        if not terms:
+            # Пустой запрос (список только открыли) — первые записи по алфавиту
+            if self._by_label is None:
+                self._by_label = sorted(self.labels, key=self.labels.get)
+            found = self._by_label[:needed]
+        else:
+            # Идём по самому длинному слову — у него меньше всего совпадений
+            first = max(terms, key=len)
+            rest = [term for term in terms if term != first]
+            found, seen = [], set()
+            position = bisect.bisect_left(self.pairs, (first,))
+            while position < len(self.pairs) and len(found) < needed:
+                token, object_id = self.pairs[position]
+                if not token.startswith(first):
+                    break
+                position += 1
+                if object_id in seen:
+                    continue
+                seen.add(object_id)
+                tokens = self.tokens.get(object_id, ())
+                if all(any(token.startswith(term) for token in tokens) for term in rest):
+                    found.append(object_id)
+        page = found[offset:offset + limit]
+        return [(object_id, self.labels.get(object_id, '')) for object_id in page], len(found) > offset + limit
+
+
+def user_label(username, full_name):
+    return f"{username} ({full_name})" if full_name else username
+
+
+def load_users(ids=None):
+    users = User.objects.order_by('id')
+    if ids is not None:
+        users = users.filter(id__in=ids)
+    for user_id, username, first_name, last_name, email, full_name in users.values_list(
+            'id', 'username', 'first_name', 'last_name', 'email', 'profile__full_name').iterator(chunk_size=5000):
+        full_name = full_name or f"{first_name} {last_name}".strip()
+        yield user_id, user_label(username, full_name), ' '.join(
+            filter(None, (username, first_name, last_name, full_name, email.split('@')[0])))
+
+
+def load_competencies(ids=None):
+    competencies = Competency.objects.order_by('id')
+    if ids is not None:
+        competencies = competencies.filter(id__in=ids)
+    for competency_id, name in competencies.values_list('id', 'name').iterator(chunk_size=5000):
+        yield competency_id, name, name
+
+
+class IndexSpec(NamedTuple):
+    load: Callable
+    # Модели, от которых зависят подписи; их версии сверяются при каждом обращении
+    models: Tuple
+
+
+INDEXES = {
+    'users': IndexSpec(load_users, (User, Profile)),
+    'competencies': IndexSpec(load_competencies, (Competency,)),
+}
+
+_lock = threading.Lock()
+_loaded = {}  # имя -> (версии моделей, PrefixIndex)
+
+
+def autocomplete_settings(name):
+    return settings.AUTOCOMPLETE[name]
+
+
+def build(name):
+    spec = INDEXES[name]
+    # Версии берём до чтения данных: запись во время загрузки вызовет повторную загрузку, а не пропуск
+    versions = model_versions(spec.models)
+    index = PrefixIndex(spec.load())
+    _loaded[name] = (versions, index)
+    return index
+
+
+def get_index(name):
+    versions = model_versions(INDEXES[name].models)
+    loaded = _loaded.get(name)
+    if loaded is not None and loaded[0] == versions:
+        return loaded[1]
+    with _lock:
+        loaded = _loaded.get(name)
+        if loaded is not None and loaded[0] == versions:
+            return loaded[1]
+        return build(name)
+
+
+def lookup(name, query, page=1, limit=None):
+    limit = limit or autocomplete_settings('LIMIT')
+    return get_index(name).lookup(query, (max(page, 1) - 1) * limit, limit)
+
+
+def label(name, object_id):
+    return get_index(name).labels.get(object_id)
+
+
+def refresh(name, sender, ids):
+    """
+    Метод для обновления записей индекса после коммита; версия sender к этому моменту уже увеличена.
+    Если между загрузкой и этим вызовом писал кто-то ещё, индекс просто перечитается при обращении.
+    """
+    with _lock:
+        loaded = _loaded.get(name)
+        if loaded is None:
+            return
+        versions, index = loaded
+        current = model_versions(INDEXES[name].models)
+        expected = dict(versions)
+        expected[model_label(sender)] += 1
+        if current != expected:
+            _loaded.pop(name, None)
+            return
+        ids = set(ids)
+        entries = list(INDEXES[name].load(ids))
+        for object_id in ids - {entry[0] for entry in entries}:
+            index.remove(object_id)
+        for entry in entries:
+            index.upsert(*entry)
+        _loaded[name] = (current, index)
+
+
+def invalidate(name):
+    """
+    Метод для сброса индекса во всех процессах после массовых записей в обход сигналов.
+    """
+    bump_model_version(INDEXES[name].models[0])
+    _loaded.pop(name, None)
+
+
+def warm():
+    """
+    Метод для загрузки всех индексов при старте процесса.
+    """
+    if not autocomplete_settings('WARM_ON_STARTUP'):
+        return
+    for name in INDEXES:
+        try:
+            with _lock:
+                build(name)
+        except Exception:
+            # Без базы (например, до миграций) процесс должен стартовать; индекс загрузится при обращении
+            logger.warning("Не удалось загрузить индекс подсказок %s", name, exc_info=True)
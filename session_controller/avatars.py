@@ -0,0 +1,106 @@
+"""
+Производные изображения аватаров: квадратные миниатюры в WebP и JPEG.
+
+Задача Celery после загрузки аватара нарезает фиксированные размеры и
+сохраняет их под именами с хэшем содержимого исходника, поэтому файлы
+неизменяемы, одинаковые исходники не обрабатываются дважды, а ссылки
+можно кэшировать сколько угодно. Пути лежат в Profile.avatar_derivatives.
+"""
+import hashlib
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from .models import Profile
+
+SIZES = {'small': 64, 'medium': 150, 'large': 300}
+FORMATS = {'webp': ('WEBP', {'quality': 80, 'method': 4}), 'jpeg': ('JPEG', {'quality': 85, 'optimize': True})}
+DERIVED_DIR = 'avatars/derived'
+
+
+def derivative_name(digest, size, image_format):
+    return f"{DERIVED_DIR}/{digest[:20]}-{SIZES[size]}.{'jpg' if image_format == 'jpeg' else image_format}"
+
+
+def build_derivatives(source):
+    """
+    Метод для нарезки миниатюр из открытого файла исходника. Возвращает словарь для avatar_derivatives.
+    """
+    from PIL import Image, ImageOps
+
+    data = source.read()
+    digest = hashlib.sha256(data).hexdigest()
+    derivatives = {'source': digest}
+    names = {(size, image_format): derivative_name(digest, size, image_format)
+             for size in SIZES for image_format in FORMATS}
+    if all(default_storage.exists(name) for name in names.values()):
+        # Такой исходник уже обрабатывали (у этого или другого профиля)
+        derivatives.update({f'{size}_{image_format}': name for (size, image_format), name in names.items()})
+        return derivatives
+
+    with Image.open(BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+        for size, pixels in SIZES.items():
+            thumbnail = ImageOps.fit(image, (pixels, pixels), Image.Resampling.LANCZOS)
+            for image_format, (pil_format, options) in FORMATS.items():
+                picture = thumbnail
+                if image_format == 'jpeg' and picture.mode == 'RGBA':
+                    # У JPEG нет прозрачности — подкладываем белый фон
+                    picture = Image.new('RGB', picture.size, 'white')
+                    picture.paste(thumbnail, mask=thumbnail.getchannel('A'))
+                buffer = BytesIO()
+                picture.save(buffer, pil_format, **options)
+                name = names[(size, image_format)]
+                if not default_storage.exists(name):
+                    default_storage.save(name, ContentFile(buffer.getvalue()))
+                derivatives[f'{size}_{image_format}'] = name
+    return derivatives
+
+
+def process_avatar(profile_id):
+    """
+    Метод для обработки текущего аватара профиля. Возвращает сохранённый словарь производных.
+    """
+    profile = Profile.objects.filter(id=profile_id).only('id', 'avatar', 'avatar_derivatives').first()
+    if profile is None or not profile.avatar:
+        return {}
+    with profile.avatar.open('rb') as source:
+        derivatives = build_derivatives(source)
+    # Пока шла обработка, аватар могли заменить — тогда результат не записываем
+    Profile.objects.filter(id=profile_id, avatar=profile.avatar.name).update(avatar_derivatives=derivatives)
+    return derivatives
+
+
+def reset(profile):
+    """
+    Метод для сброса производных старого аватара (до сохранения профиля, из signals.py).
+    """
+    profile.avatar_derivatives = {}
+
+
+def schedule(profile):
+    """
+    Метод для постановки обработки аватара после коммита (после сохранения профиля, из signals.py).
+    """
+    from .tasks import process_avatar as process_avatar_task
+
+    if profile.avatar:
+        transaction.on_commit(lambda: process_avatar_task.delay(profile.id))
+
+
+def avatar_name(profile, size='medium', image_format='webp'):
+    """
+    Метод для выбора пути к нужной производной; None, если производных ещё нет.
+    """
+    return (profile.avatar_derivatives or {}).get(f'{size}_{image_format}')
+
+
+def avatar_url(profile, size='medium', image_format='webp'):
+    name = avatar_name(profile, size, image_format)
+    if name:
+        return default_storage.url(name)
+    # Обработка ещё не закончилась — показываем исходник
+    return profile.avatar.url if profile.avatar else ''
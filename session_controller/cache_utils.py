@@ -0,0 +1,107 @@
+"""
+Кэш результатов с версионированием по моделям.
+
+Каждой модели соответствует счётчик версии в кэше. Ключ результата
+включает версии всех моделей, от которых он зависит, поэтому запись в
+любую из них (см. signals.py) делает старые ключи недостижимыми без
+перебора и удаления.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.utils.http import urlencode
+
+from .instrumentation import record_cache
+
+VERSION_KEY = 'model_version:{}'
+LOCK_SUFFIX = ':lock'
+LOCK_TIMEOUT = 30  # секунд, на случай падения процесса, строящего значение
+WAIT_STEP = 0.05
+MAX_WAIT = 3.0
+
+_MISSING = object()
+
+
+def model_label(model):
+    return model._meta.label_lower
+
+
+def model_version(model):
+    key = VERSION_KEY.format(model_label(model))
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, None)
+        version = cache.get(key, 1)
+    return version
+
+
+def bump_model_version(model):
+    key = VERSION_KEY.format(model_label(model))
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Счётчика ещё нет (или его вытеснили) — начинаем с версии, отличной от начальной
+        cache.set(key, 2, None)
+        return 2
+
+
+def model_versions(models):
+    # Одним обращением к кэшу на все модели
+    keys = {VERSION_KEY.format(model_label(model)): model for model in models}
+    found = cache.get_many(list(keys))
+    return {
+        model_label(model): found[key] if key in found else model_version(model)
+        for key, model in keys.items()
+    }
+
+
+def versions_key(models):
+    return '-'.join(f"{label}.{version}" for label, version in sorted(model_versions(models).items()))
+
+
+def params_digest(params, allowed=None):
+    """
+    Нормализует параметры запроса (порядок, пустые значения, посторонние ключи)
+    и возвращает короткий хэш для ключа кэша.
+    """
+    items = sorted(
+        (name, value)
+        for name in params
+        if allowed is None or name in allowed
+        for value in params.getlist(name)
+        if value != ''
+    )
+    return hashlib.md5(urlencode(items).encode()).hexdigest()
+
+
+def get_or_build(key, builder, timeout):
+    """
+    Возвращает значение из кэша или строит его.
+
+    При одновременных промахах строит значение только тот, кто взял
+    блокировку; остальные недолго ждут его результата.
+    """
+    value = cache.get(key, _MISSING)
+    record_cache(value is not _MISSING)
+    if value is not _MISSING:
+        return value
+
+    lock_key = key + LOCK_SUFFIX
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            value = builder()
+            cache.set(key, value, timeout)
+        finally:
+            cache.delete(lock_key)
+        return value
+
+    waited = 0.0
+    while waited < MAX_WAIT:
+        time.sleep(WAIT_STEP)
+        waited += WAIT_STEP
+        value = cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+    # Строящий процесс не успел — отдаём свежий результат, не трогая кэш
+    return builder()
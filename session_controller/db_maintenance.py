@@ -0,0 +1,123 @@
+"""
+Обслуживание базы SQLite в режиме конкурентной записи (см. SQLITE в настройках).
+
+* PRAGMA optimize — раз в час: SQLite сам обновляет статистику там, где она
+  устарела, это дёшево;
+* ANALYZE, инкрементальная очистка свободных страниц и checkpoint WAL с
+  усечением файла — ночью.
+
+Режим WAL записывается в файл базы, поэтому включается не прагмой на каждое
+соединение, а один раз при выкладке командой sqlite_maintenance --enable-wal.
+Соединения с базой в WAL получают synchronous=NORMAL (tune_connection).
+
+Инкрементальная очистка работает только в базе с auto_vacuum=INCREMENTAL;
+перевести в этот режим существующую базу можно один раз командой
+sqlite_maintenance --enable-incremental-vacuum (нужен полный VACUUM).
+Для других СУБД функции ничего не делают.
+"""
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+def is_sqlite(using=DEFAULT_DB_ALIAS):
+    return connections[using].vendor == 'sqlite'
+
+
+def pragma(statement, using=DEFAULT_DB_ALIAS):
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'PRAGMA {statement}')
+        return cursor.fetchone()
+
+
+def optimize(using=DEFAULT_DB_ALIAS):
+    """
+    Метод для обновления устаревшей статистики планировщика.
+    """
+    if not is_sqlite(using):
+        return False
+    pragma('optimize', using)
+    return True
+
+
+def analyze(using=DEFAULT_DB_ALIAS):
+    if not is_sqlite(using):
+        return False
+    with connections[using].cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return True
+
+
+def incremental_vacuum(pages=None, using=DEFAULT_DB_ALIAS):
+    """
+    Метод для возврата свободных страниц файлу порциями, без блокировки базы на полный VACUUM.
+    Возвращает число освобождённых страниц.
+    """
+    if not is_sqlite(using) or pragma('auto_vacuum', using)[0] != AUTO_VACUUM_INCREMENTAL:
+        return 0
+    free_before = pragma('freelist_count', using)[0]
+    with connections[using].cursor() as cursor:
+        # Прагма возвращает строку на каждую страницу — дочитываем, иначе очистка не завершится
+        cursor.execute(f"PRAGMA incremental_vacuum({pages or settings.SQLITE['VACUUM_PAGES']})")
+        cursor.fetchall()
+    return free_before - pragma('freelist_count', using)[0]
+
+
+def checkpoint(using=DEFAULT_DB_ALIAS):
+    """
+    Метод для переноса WAL в основной файл и усечения WAL. Возвращает (занято, страниц в WAL, перенесено).
+    """
+    if not is_sqlite(using):
+        return None
+    return pragma('wal_checkpoint(TRUNCATE)', using)
+
+
+def enable_wal(using=DEFAULT_DB_ALIAS):
+    """
+    Метод для перевода базы в режим WAL. Возвращает установленный режим журнала.
+    """
+    if not is_sqlite(using):
+        return None
+    mode = pragma('journal_mode=WAL', using)[0]
+    pragma('synchronous=NORMAL', using)
+    return mode
+
+
+def tune_connection(sender, connection, **kwargs):
+    """
+    Приёмник connection_created: в WAL synchronous=NORMAL не теряет целостность, а fsync остаётся только на checkpoint.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode')
+        if cursor.fetchone()[0] == 'wal':
+            cursor.execute('PRAGMA synchronous=NORMAL')
+
+
+def enable_incremental_vacuum(using=DEFAULT_DB_ALIAS):
+    """
+    Метод для перевода базы в режим auto_vacuum=INCREMENTAL. Полный VACUUM блокирует базу — только в окно обслуживания.
+    """
+    if not is_sqlite(using):
+        return False
+    with connections[using].cursor() as cursor:
+        cursor.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        cursor.execute('VACUUM')
+    return True
+
+
+def maintain(using=DEFAULT_DB_ALIAS):
+    """
+    Метод для ночного обслуживания. Возвращает сводку для логов задачи.
+    """
+    if not is_sqlite(using):
+        return {}
+    analyze(using)
+    optimize(using)
+    return {
+        'freed_pages': incremental_vacuum(using=using),
+        'checkpoint': checkpoint(using),
+        'journal_mode': pragma('journal_mode', using)[0],
+    }
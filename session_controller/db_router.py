@@ -0,0 +1,122 @@
+"""
+Маршрутизация чтения между основной базой и репликой для отчётов.
+
+Реплика (алиас replica в settings.DATABASES) используется только там, где
+это явно разрешено: внутри use_replica() или в представлениях с декоратором
+replica_reads — журнал посещений, отчёты, выгрузки, просмотр истории.
+Всё остальное, включая все записи, идёт в default, поэтому отчёты не
+конкурируют с сохранением оценок.
+
+Чтение своих записей: после первой записи в текущем запросе или задаче
+чтение возвращается в default до конца области, а PrimaryPinMiddleware
+ставит cookie, которая на REPLICA_PIN_SECONDS оставляет на default и
+следующие запросы этого клиента — на время отставания реплики.
+
+Без настроенной реплики всё читается из default, и поведение не меняется.
+"""
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA = 'replica'
+PIN_COOKIE = 'db_primary'
+
+
+class RoutingState:
+    __slots__ = ('pinned', 'wrote')
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+_replica = ContextVar('db_use_replica', default=False)
+_state = ContextVar('db_routing_state', default=None)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def read_alias():
+    """
+    Метод для выбора базы для отчётного чтения: реплика, если она есть и клиент недавно не писал.
+    """
+    state = _state.get()
+    if replica_configured() and not (state is not None and state.pinned):
+        return REPLICA
+    return DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def use_replica(enabled=True):
+    """
+    Метод для включения чтения с реплики в блоке; use_replica(False) возвращает чтение в default.
+    """
+    replica_token = _replica.set(enabled)
+    # Вне запроса (задачи, команды) у блока своё состояние: запись в нём закрепит чтение за default
+    state_token = _state.set(_state.get() or RoutingState())
+    try:
+        yield
+    finally:
+        _state.reset(state_token)
+        _replica.reset(replica_token)
+
+
+def use_primary():
+    return use_replica(False)
+
+
+def replica_reads(view):
+    """
+    Декоратор представления, читающего с реплики. Ответ должен строиться внутри
+    представления (render), а не лениво после возврата.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        with use_replica():
+            return view(*args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _replica.get():
+            return read_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.pinned = state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # В реплике те же данные, что и в default
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема реплики приходит с репликацией
+        if db == REPLICA:
+            return False
+        return None
+
+
+class PrimaryPinMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RoutingState(pinned=PIN_COOKIE in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote and replica_configured():
+            response.set_cookie(PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True,
+                                samesite='Lax')
+        return response
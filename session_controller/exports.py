@@ -0,0 +1,197 @@
+"""
+Потоковая выгрузка оценок в CSV, JSONL и XLSX.
+
+Строки берутся одним запросом с JOIN через values_list(...).iterator(), поэтому
+память не зависит от объёма выгрузки. Небольшие выгрузки отдаются прямо в
+ответе (StreamingHttpResponse), большие пишет фоновая задача в файл в
+закрытом каталоге ASSESSMENT_EXPORT['DIR'] (вне MEDIA_ROOT), а клиент сразу
+получает ссылку на него. Файл скачивает только тот, кто запросил выгрузку;
+через MAX_AGE_HOURS его удаляет задача prune_assessment_exports.
+"""
+import csv
+import json
+import os
+import re
+import tempfile
+import time
+import uuid
+
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.timezone import now
+
+from .db_router import read_alias
+from .filters import AssessmentExportFilter
+from .models import Assessment
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # pragma: no cover - необязательная зависимость
+    Workbook = None
+
+HEADERS = ('session', 'competency', 'evaluator', 'score', 'created_at')
+COLUMNS = ('session__title', 'competency__name', 'evaluator__username', 'score', 'created_at')
+FILTERS = tuple(AssessmentExportFilter.base_filters)
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+}
+
+
+class ExportError(Exception):
+    pass
+
+
+def export_settings(name):
+    return settings.ASSESSMENT_EXPORT[name]
+
+
+def assessment_queryset(params=None):
+    """
+    Метод для построения выборки оценок по параметрам выгрузки (значения — строки из запроса).
+    Неверные значения — ExportError. Выгрузка читает с реплики; база выбирается сразу,
+    так как строки отдаются уже после выхода из представления.
+    """
+    filterset = AssessmentExportFilter(params or {}, queryset=Assessment.objects.using(read_alias()).order_by('id'))
+    if not filterset.is_valid():
+        raise ExportError('; '.join(
+            f"{name}: {' '.join(errors)}" for name, errors in filterset.errors.items()))
+    return filterset.qs
+
+
+def iter_rows(queryset):
+    # Плоские кортежи из JOIN, без экземпляров моделей и без запросов на строку
+    return queryset.order_by('id').values_list(*COLUMNS).iterator(chunk_size=export_settings('CHUNK_SIZE'))
+
+
+def format_row(row):
+    # Те же значения, что отдаёт AssessmentResource в админке
+    session, competency, evaluator, score, created_at = row
+    return (session or 'N/A', competency or 'N/A', evaluator or 'N/A',
+            f'{score} points', created_at.strftime('%Y-%m-%d'))
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(HEADERS)
+    for row in rows:
+        yield writer.writerow(format_row(row))
+
+
+def stream_jsonl(rows):
+    for session, competency, evaluator, score, created_at in rows:
+        yield json.dumps({
+            'session': session,
+            'competency': competency,
+            'evaluator': evaluator,
+            'score': score,
+            'created_at': created_at.isoformat(),
+        }, ensure_ascii=False) + '\n'
+
+
+def write_xlsx(rows, target):
+    if Workbook is None:
+        raise ExportError("Для выгрузки в XLSX нужен пакет openpyxl.")
+    # write_only держит в памяти только текущую строку
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('assessments')
+    sheet.append(HEADERS)
+    for row in rows:
+        sheet.append(format_row(row))
+    workbook.save(target)
+
+
+def check_format(export_format, count):
+    if export_format not in FORMATS:
+        raise ExportError(f"Неизвестный формат: {export_format}. Доступны: {', '.join(FORMATS)}.")
+    if export_format == 'xlsx' and count > export_settings('XLSX_MAX_ROWS'):
+        raise ExportError(
+            f"XLSX поддерживается до {export_settings('XLSX_MAX_ROWS')} строк; используйте CSV или JSONL.")
+
+
+def export_response(queryset, export_format, filename='assessments'):
+    """
+    Метод для отдачи выгрузки прямо в ответе.
+    """
+    content_type, extension = FORMATS[export_format]
+    attachment = f'{filename}.{extension}'
+    if export_format == 'xlsx':
+        target = _temporary_file()
+        write_xlsx(iter_rows(queryset), target)
+        target.seek(0)
+        return FileResponse(target, as_attachment=True, filename=attachment, content_type=content_type)
+
+    stream = stream_csv if export_format == 'csv' else stream_jsonl
+    response = StreamingHttpResponse(stream(iter_rows(queryset)), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{attachment}"'
+    return response
+
+
+def _temporary_file():
+    # XLSX — zip-архив, его нельзя писать в сокет по частям; до 10 МБ держим в памяти
+    return tempfile.SpooledTemporaryFile(max_size=10 * 1024 * 1024)
+
+
+NAME_RE = re.compile(r'^assessments-[\w-]+\.(?:%s)$' % '|'.join(extension for _, extension in FORMATS.values()))
+
+
+def export_path(export_format, user_id):
+    """
+    Метод для выбора имени файла фоновой выгрузки: (путь в каталоге выгрузок, URL для скачивания).
+    Имя известно заранее, поэтому ссылку можно отдать до окончания выгрузки.
+    """
+    name = f"assessments-{now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}.{FORMATS[export_format][1]}"
+    return f'{user_id}/{name}', reverse('assessment-export-file', kwargs={'name': name})
+
+
+def stored_file(user_id, name):
+    """
+    Метод для поиска готовой выгрузки пользователя; None, если файла нет, он не дописан или устарел.
+    """
+    if not NAME_RE.match(name):
+        return None
+    path = os.path.join(export_settings('DIR'), str(user_id), name)
+    if not os.path.isfile(path) or os.path.getmtime(path) < time.time() - export_settings('MAX_AGE_HOURS') * 60 * 60:
+        return None
+    return path
+
+
+def export_to_file(export_format, params, relative_path):
+    """
+    Метод для записи выгрузки в файл. Файл появляется по ссылке только целиком.
+    """
+    path = os.path.join(export_settings('DIR'), relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = path + '.part'
+    rows = iter_rows(assessment_queryset(params))
+    if export_format == 'xlsx':
+        write_xlsx(rows, partial)
+    else:
+        stream = stream_csv if export_format == 'csv' else stream_jsonl
+        with open(partial, 'w', encoding='utf-8', newline='') as target:
+            target.writelines(stream(rows))
+    os.replace(partial, path)
+    return path
+
+
+def prune_files(max_age_hours=None):
+    """
+    Метод для удаления выгрузок (и недописанных файлов) старше срока. Возвращает число удалённых.
+    """
+    max_age_hours = max_age_hours or export_settings('MAX_AGE_HOURS')
+    cutoff = time.time() - max_age_hours * 60 * 60
+    removed = 0
+    for directory, _, files in os.walk(export_settings('DIR')):
+        for name in files:
+            path = os.path.join(directory, name)
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+    return removed
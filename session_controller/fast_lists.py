@@ -0,0 +1,141 @@
+"""
+Быстрый режим списков API (?fast=1).
+
+Строки берутся через values() одним запросом с JOIN вместо экземпляров
+моделей, многие-ко-многим — одним запросом к промежуточной таблице на
+страницу. План выборки строится по полям обычного сериализатора, поэтому
+схема ответа та же; сериализаторы с полями, которые так не получить
+(вложенные, SerializerMethodField), обслуживаются обычным путём.
+"""
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - необязательная зависимость
+    orjson = None
+
+FAST_PARAM = 'fast'
+TRUE_VALUES = ('1', 'true', 'yes')
+
+# Значения этих полей values() уже отдаёт в нужном виде
+IDENTITY_FIELDS = (serializers.CharField, serializers.IntegerField, serializers.BooleanField,
+                   serializers.PrimaryKeyRelatedField)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON через orjson, если он установлен; иначе — стандартный рендерер DRF.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return orjson.dumps(data, default=encoders.JSONEncoder().default)
+
+
+def _file_converter(model_field, request):
+    def convert(name):
+        if not name:
+            return None
+        url = model_field.storage.url(name)
+        return request.build_absolute_uri(url) if request is not None else url
+    return convert
+
+
+def build_plan(serializer):
+    """
+    Метод для построения плана выборки в порядке полей сериализатора:
+    (имя в ответе, lookup для values() или поле модели многие-ко-многим, преобразование).
+    None, если сериализатор так не прочитать.
+    """
+    model = serializer.Meta.model
+    request = serializer.context.get('request')
+    plan = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if field.source == '*' or isinstance(field, (serializers.BaseSerializer, serializers.SerializerMethodField)):
+            return None
+        if isinstance(field, serializers.ManyRelatedField):
+            if not isinstance(field.child_relation, serializers.PrimaryKeyRelatedField):
+                return None
+            plan.append((name, model._meta.get_field(field.source), None))
+            continue
+        lookup = '__'.join(field.source_attrs)
+        if isinstance(field, serializers.FileField):
+            convert = _file_converter(model._meta.get_field(lookup), request)
+        elif isinstance(field, IDENTITY_FIELDS):
+            convert = None
+        else:
+            convert = field.to_representation
+        plan.append((name, lookup, convert))
+    return plan
+
+
+def plan_values(queryset, plan):
+    """
+    Метод для выборки колонок плана через values(); связи идут JOIN-ами, экземпляры не создаются.
+    """
+    lookups = {lookup for _, lookup, _ in plan if isinstance(lookup, str)}
+    return queryset.select_related(None).prefetch_related(None).values('pk', *lookups)
+
+
+def _many_values(rows, plan):
+    ids = [row['pk'] for row in rows]
+    related = {}
+    for name, model_field, _ in plan:
+        if isinstance(model_field, str):
+            continue
+        through = model_field.remote_field.through
+        source, target = model_field.m2m_field_name(), model_field.m2m_reverse_field_name()
+        values = related[name] = {pk: [] for pk in ids}
+        # Тот же порядок, что у prefetch_related: по ordering связанной модели, иначе по её ключу
+        ordering = [f'{target}__{name}' for name in model_field.related_model._meta.ordering] or [target]
+        pairs = through.objects.filter(**{f'{source}__in': ids}).order_by(*ordering).values_list(source, target)
+        for owner_id, target_id in pairs:
+            values[owner_id].append(target_id)
+    return related
+
+
+def serialize_rows(rows, plan):
+    """
+    Метод для сериализации строк values() по плану: список словарей той же схемы, что у сериализатора.
+    """
+    rows = list(rows)
+    related = _many_values(rows, plan)
+    data = []
+    for row in rows:
+        item = {}
+        for name, lookup, convert in plan:
+            if name in related:
+                item[name] = related[name][row['pk']]
+                continue
+            value = row[lookup]
+            item[name] = value if convert is None or value is None else convert(value)
+        data.append(item)
+    return data
+
+
+class FastListMixin:
+    """
+    Подмешивается к ModelViewSet: list() с ?fast=1 сериализует строки из values().
+    """
+
+    def use_fast_list(self, request):
+        return request.query_params.get(FAST_PARAM, '').lower() in TRUE_VALUES
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_fast_list(request):
+            return super().list(request, *args, **kwargs)
+        plan = build_plan(self.get_serializer())
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+
+        rows = plan_values(self.filter_queryset(self.get_queryset()), plan)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serialize_rows(page, plan))
+        return Response(serialize_rows(rows, plan))
@@ -1,26 +1,36 @@
 from django.db.models import Q
 import django_filters
 from django_filters import rest_framework as filters
-from .models import Session, Competency
+from . import search
+from .models import Assessment, Session, Competency
 
 
 class SessionFilter(filters.FilterSet):
     title = filters.CharFilter(lookup_expr='icontains')
+    # Начала слов заголовка по полнотекстовому индексу (session_controller/search.py) — без сканирования таблицы
+    title_words = filters.CharFilter(method='filter_title')
     evaluated = filters.CharFilter(
         field_name='evaluated__username', lookup_expr='icontains')
     created_at = filters.DateFromToRangeFilter()
 
     class Meta:
         model = Session
-        fields = ['title', 'evaluated', 'created_at']
+        fields = ['title', 'title_words', 'evaluated', 'created_at']
+
+    def filter_title(self, queryset, name, value):
+        return search.matching(queryset, value, 'session', title_only=True)
 
 
 class CompetencyFilter(django_filters.FilterSet):
     name = django_filters.CharFilter(lookup_expr='icontains')
+    name_words = django_filters.CharFilter(method='filter_name')
 
     class Meta:
         model = Competency
-        fields = ['name']
+        fields = ['name', 'name_words']
+
+    def filter_name(self, queryset, name, value):
+        return search.matching(queryset, value, 'competency', title_only=True)
 
 
 class UserProfileFilter(filters.FilterSet):
@@ -37,3 +47,17 @@ class UserProfileFilter(filters.FilterSet):
                 Q(role__icontains=role) & Q(user__is_active=is_active))
 
         return queryset
+
+
+class AssessmentExportFilter(filters.FilterSet):
+    # Параметры выгрузки оценок (session_controller/exports.py); неверные значения — ошибка 400
+    session = filters.NumberFilter(field_name='session_id')
+    competency = filters.NumberFilter(field_name='competency_id')
+    evaluator = filters.NumberFilter(field_name='evaluator_id')
+    score = filters.NumberFilter()
+    created_after = filters.DateFilter(field_name='created_at', lookup_expr='date__gte')
+    created_before = filters.DateFilter(field_name='created_at', lookup_expr='date__lte')
+
+    class Meta:
+        model = Assessment
+        fields = ['session', 'competency', 'evaluator', 'score', 'created_after', 'created_before']
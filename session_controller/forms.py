@@ -67,6 +67,6 @@ class ProfileAvatarForm(forms.ModelForm):
             if avatar_field:  # Если аватар существует, удалим файл
                 if os.path.isfile(avatar_field.path):
                     os.remove(avatar_field.path)
-            cleaned_data['avatar'] = None
+            cleaned_data['avatar'] = False
 
         return cleaned_data
@@ -0,0 +1,124 @@
+"""
+Сопровождение таблиц истории simple_history: сжатие и срок хранения.
+
+Таблицы истории читаются диапазонами объектов (по индексу на id) в виде
+кортежей, без загрузки экземпляров. Для каждого объекта:
+
+* сжатие — версия «~», в которой отслеживаемые поля совпадают с
+  предыдущей оставленной версией (сохранение без изменений), удаляется;
+* срок хранения — из оставшихся версий всегда сохраняются последние
+  KEEP_VERSIONS, а более старые удаляются, если они старше KEEP_DAYS.
+
+Удаление идёт пачками по history_id в коротких транзакциях.
+"""
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.utils.timezone import now
+from simple_history.utils import bulk_update_with_history
+
+HISTORY_FIELDS = {'history_id', 'history_date', 'history_change_reason', 'history_type', 'history_user'}
+
+
+def history_settings(name):
+    return settings.HISTORY_RETENTION[name]
+
+
+def tracked_fields(history_model):
+    return [field.attname for field in history_model._meta.concrete_fields if field.name not in HISTORY_FIELDS]
+
+
+def _group_deletions(versions, fields_count, keep_versions, cutoff):
+    """
+    Метод для выбора удаляемых версий одного объекта; versions — от старой к новой,
+    кортежи (history_id, history_date, history_type, *отслеживаемые поля).
+    """
+    kept, removed = [], []
+    previous = None
+    for version in versions:
+        values = version[3:3 + fields_count]
+        if version[2] == '~' and previous is not None and values == previous:
+            removed.append(version[0])
+            continue
+        kept.append(version)
+        previous = values
+    # Версия хранится, если она среди последних keep_versions или моложе срока; keep_versions=0 — только срок
+    for version in kept[:len(kept) - keep_versions]:
+        if version[1] < cutoff:
+            removed.append(version[0])
+    return removed
+
+
+def compact_model(model, keep_versions=None, keep_days=None, batch_size=None, dry_run=False):
+    """
+    Метод для сжатия истории одной модели. Возвращает (просмотрено версий, удалено версий).
+    """
+    keep_versions = history_settings('KEEP_VERSIONS') if keep_versions is None else keep_versions
+    keep_days = history_settings('KEEP_DAYS') if keep_days is None else keep_days
+    batch_size = batch_size or history_settings('BATCH_SIZE')
+    history_model = model.history.model
+    fields = tracked_fields(history_model)
+    cutoff = now() - timedelta(days=keep_days)
+
+    scanned = removed = 0
+    last_id = None
+    while True:
+        # Объекты берутся диапазонами по индексу на id, версии диапазона читаются целиком
+        object_ids = history_model.objects.order_by('id').values_list('id', flat=True).distinct()
+        if last_id is not None:
+            object_ids = object_ids.filter(id__gt=last_id)
+        object_ids = list(object_ids[:batch_size])
+        if not object_ids:
+            break
+        last_id = object_ids[-1]
+        rows = history_model.objects.filter(id__in=object_ids).order_by('id', 'history_date', 'history_id')
+        groups = {}
+        for row in rows.values_list('id', 'history_id', 'history_date', 'history_type', *fields):
+            groups.setdefault(row[0], []).append(row[1:])
+            scanned += 1
+        doomed = [history_id for versions in groups.values()
+                  for history_id in _group_deletions(versions, len(fields), keep_versions, cutoff)]
+        removed += len(doomed)
+        if dry_run:
+            continue
+        for start in range(0, len(doomed), batch_size):
+            with transaction.atomic():
+                history_model.objects.filter(history_id__in=doomed[start:start + batch_size]).delete()
+    return scanned, removed
+
+
+def history_models():
+    return [apps.get_model(label) for label in history_settings('MODELS')]
+
+
+def compact_history(**options):
+    """
+    Метод для сжатия истории всех моделей из настроек. Возвращает счётчики по моделям.
+    """
+    return {model._meta.label: compact_model(model, **options) for model in history_models()}
+
+
+def update_with_history(queryset, values, user=None, reason=None, batch_size=500):
+    """
+    Метод для массового обновления полей с записью истории: UPDATE пачками и строки
+    истории через bulk_create, без save() на каждый объект. Возвращает число объектов.
+    """
+    fields = list(values)
+    updated = 0
+    last_pk = None
+    while True:
+        batch = queryset.order_by('pk')
+        if last_pk is not None:
+            batch = batch.filter(pk__gt=last_pk)
+        batch = list(batch[:batch_size])
+        if not batch:
+            return updated
+        last_pk = batch[-1].pk
+        for obj in batch:
+            for name, value in values.items():
+                setattr(obj, name, value)
+        bulk_update_with_history(batch, queryset.model, fields, batch_size=batch_size,
+                                 default_user=user, default_change_reason=reason)
+        updated += len(batch)
@@ -0,0 +1,261 @@
+"""
+Инкрементальная синхронизация пользователей и профилей со справочником сотрудников.
+
+Файл справочника (CSV с заголовком или JSONL) читается потоково, ключ строки —
+username. Для каждой строки считается отпечаток нормализованных полей и
+сравнивается с сохранённым в Profile.directory_fingerprint: неизменившиеся
+строки пропускаются, остальные применяются пачками через bulk_create и
+bulk_update с массовой записью истории.
+"""
+import csv
+import hashlib
+import json
+from datetime import date
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils.dateparse import parse_date
+from simple_history.utils import bulk_create_with_history, bulk_update_with_history
+
+from . import autocomplete, roles
+from .models import ROLES, Profile
+
+USER_FIELDS = ('email', 'first_name', 'last_name', 'is_active')
+PROFILE_FIELDS = ('full_name', 'department', 'role', 'hire_date', 'is_active')
+FINGERPRINT_FIELDS = ('email', 'first_name', 'last_name', 'full_name', 'department', 'role', 'hire_date', 'is_active')
+ROLE_VALUES = {value for value, _ in ROLES}
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'да'}
+CHANGE_REASON = 'Синхронизация со справочником сотрудников'
+
+
+class DirectoryError(Exception):
+    pass
+
+
+def read_rows(path, file_format=None):
+    """
+    Метод для потокового чтения справочника: (номер строки, словарь полей).
+    """
+    file_format = file_format or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+    with open(path, encoding='utf-8-sig', newline='') as source:
+        if file_format == 'jsonl':
+            # Строки разбираются в normalize: ошибка в одной строке не прерывает чтение файла
+            for number, line in enumerate(source, start=1):
+                if line.strip():
+                    yield number, line
+        elif file_format == 'csv':
+            # Первая строка — заголовок, данные начинаются со второй
+            yield from enumerate(csv.DictReader(source), start=2)
+        else:
+            raise DirectoryError(f"Неизвестный формат справочника: {file_format}")
+
+
+def decode(raw):
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except json.JSONDecodeError as e:
+            raise DirectoryError(f"неверный JSON: {e.msg}") from e
+    if not isinstance(raw, dict):
+        raise DirectoryError("строка справочника не является объектом")
+    return raw
+
+
+def normalize(raw):
+    """
+    Метод для приведения строки справочника к значениям полей моделей.
+    """
+    raw = decode(raw)
+    try:
+        return _normalize(raw)
+    except (TypeError, ValueError) as e:
+        # Например, несуществующая дата 2024-02-30: parse_date бросает ValueError
+        raise DirectoryError(f"неверное значение: {e}") from e
+
+
+def _normalize(raw):
+    username = str(raw.get('username') or '').strip()
+    if not username:
+        raise DirectoryError("не указан username")
+    role = str(raw.get('role') or '').strip()
+    if role not in ROLE_VALUES:
+        raise DirectoryError(f"неизвестная роль {role!r}")
+
+    hire_date = raw.get('hire_date') or None
+    if hire_date is not None and not isinstance(hire_date, date):
+        hire_date = parse_date(str(hire_date).strip())
+        if hire_date is None:
+            raise DirectoryError(f"неверная дата приёма {raw.get('hire_date')!r}")
+
+    is_active = raw.get('is_active', True)
+    if not isinstance(is_active, bool):
+        is_active = str(is_active).strip().lower() in TRUE_VALUES
+
+    row = {
+        'username': username,
+        'email': str(raw.get('email') or '').strip().lower(),
+        'first_name': str(raw.get('first_name') or '').strip()[:150],
+        'last_name': str(raw.get('last_name') or '').strip()[:150],
+        'department': (str(raw.get('department') or '').strip() or None),
+        'role': role,
+        'hire_date': hire_date,
+        'is_active': is_active,
+    }
+    # Как Profile.save(): без явного ФИО берём имя и фамилию пользователя
+    row['full_name'] = (str(raw.get('full_name') or '').strip()
+                        or f"{row['first_name']} {row['last_name']}".strip() or None)
+    return row
+
+
+def fingerprint(row):
+    values = [row[name].isoformat() if isinstance(row[name], date) else row[name] for name in FINGERPRINT_FIELDS]
+    return hashlib.sha1(json.dumps(values, ensure_ascii=False).encode()).hexdigest()
+
+
+def load_state():
+    """
+    Метод для загрузки текущего состояния одним запросом: username -> (user_id, profile_id, отпечаток).
+    """
+    state = {}
+    for user_id, username, profile_id, stored in User.objects.values_list(
+            'id', 'username', 'profile__id', 'profile__directory_fingerprint').iterator(chunk_size=5000):
+        state[username] = (user_id, profile_id, stored)
+    return state
+
+
+class DirectorySync:
+    def __init__(self, batch_size=1000, deactivate_missing=False, force=False, dry_run=False):
+        self.batch_size = batch_size
+        self.deactivate_missing = deactivate_missing
+        self.force = force
+        self.dry_run = dry_run
+        self.stats = {'created': 0, 'updated': 0, 'unchanged': 0, 'deactivated': 0, 'errors': []}
+
+    def run(self, rows):
+        self.state = load_state()
+        seen = set()
+        batch = []
+        unreadable = False
+        for number, raw in rows:
+            try:
+                raw = decode(raw)
+            except DirectoryError as e:
+                self.stats['errors'].append(f"строка {number}: {e}")
+                unreadable = True
+                continue
+            try:
+                row = normalize(raw)
+            except DirectoryError as e:
+                self.stats['errors'].append(f"строка {number}: {e}")
+                # Сотрудник с ошибкой в строке есть в справочнике — не отключаем его
+                seen.add(str(raw.get('username') or '').strip())
+                continue
+            if row['username'] in seen:
+                self.stats['errors'].append(f"строка {number}: username {row['username']} повторяется")
+                continue
+            seen.add(row['username'])
+            row['fingerprint'] = fingerprint(row)
+            current = self.state.get(row['username'])
+            if current is not None and current[1] is not None and current[2] == row['fingerprint'] and not self.force:
+                self.stats['unchanged'] += 1
+                continue
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                self.apply(batch)
+                batch = []
+        self.apply(batch)
+
+        if self.deactivate_missing and unreadable:
+            # Чей username в нечитаемой строке, неизвестно — отключение в этот раз пропускаем
+            self.stats['errors'].append("отключение отсутствующих пропущено: в справочнике есть нечитаемые строки")
+        elif self.deactivate_missing:
+            self.deactivate([username for username in self.state if username not in seen])
+        if not self.dry_run and (self.stats['created'] or self.stats['updated'] or self.stats['deactivated']):
+            # Массовые записи идут мимо сигналов — индекс подсказок перечитается во всех процессах
+            autocomplete.invalidate('users')
+        return self.stats
+
+    def apply(self, rows):
+        if not rows:
+            return
+        new_users = [row for row in rows if row['username'] not in self.state]
+        existing = [row for row in rows if row['username'] in self.state]
+        self.stats['created'] += len(new_users) + sum(1 for row in existing if self.state[row['username']][1] is None)
+        self.stats['updated'] += sum(1 for row in existing if self.state[row['username']][1] is not None)
+        if self.dry_run:
+            return
+
+        # Вход только после сброса пароля; неиспользуемый пароль один на пачку, а не на каждого
+        password = make_password(None)
+        with transaction.atomic():
+            users = User.objects.bulk_create([
+                User(username=row['username'], password=password,
+                     **{name: row[name] for name in USER_FIELDS})
+                for row in new_users
+            ], batch_size=self.batch_size)
+            for row, user in zip(new_users, users):
+                self.state[row['username']] = (user.id, None, '')
+
+            changed_users = [
+                User(id=self.state[row['username']][0], **{name: row[name] for name in USER_FIELDS})
+                for row in existing
+            ]
+            User.objects.bulk_update(changed_users, USER_FIELDS, batch_size=self.batch_size)
+
+            # Обновляемые профили загружаем целиком: история должна сохранить и поля вне справочника
+            profile_ids = [self.state[row['username']][1] for row in rows if self.state[row['username']][1]]
+            profiles = Profile.objects.in_bulk(profile_ids)
+            to_create, to_update = [], []
+            for row in rows:
+                user_id, profile_id, _ = self.state[row['username']]
+                profile = profiles[profile_id] if profile_id else Profile(user_id=user_id)
+                for name in PROFILE_FIELDS:
+                    setattr(profile, name, row[name])
+                profile.directory_fingerprint = row['fingerprint']
+                (to_update if profile_id else to_create).append((row['username'], profile))
+            if to_create:
+                bulk_create_with_history([profile for _, profile in to_create], Profile,
+                                         batch_size=self.batch_size, default_change_reason=CHANGE_REASON)
+            if to_update:
+                # Поля вне справочника (аватар, резюме, портфолио) не трогаем
+                bulk_update_with_history([profile for _, profile in to_update], Profile,
+                                         PROFILE_FIELDS + ('directory_fingerprint',),
+                                         batch_size=self.batch_size, default_change_reason=CHANGE_REASON)
+            for username, profile in to_create + to_update:
+                self.state[username] = (profile.user_id, profile.id, profile.directory_fingerprint)
+
+            # Массовые операции идут мимо сигналов — закэшированные роли сбрасываем сами
+            user_ids = [profile.user_id for _, profile in to_update]
+            transaction.on_commit(lambda ids=user_ids: roles.invalidate(ids))
+
+    def deactivate(self, usernames):
+        """
+        Метод для отключения сотрудников, пропавших из справочника.
+        Трогаем только профили, пришедшие из справочника (с отпечатком).
+        """
+        profile_ids = [self.state[username][1] for username in usernames
+                       if self.state[username][1] and self.state[username][2]]
+        for start in range(0, len(profile_ids), self.batch_size):
+            with transaction.atomic():
+                profiles = list(Profile.objects.filter(id__in=profile_ids[start:start + self.batch_size],
+                                                       is_active=True))
+                self.stats['deactivated'] += len(profiles)
+                if self.dry_run or not profiles:
+                    continue
+                for profile in profiles:
+                    profile.is_active = False
+                    # Пустой отпечаток: при возвращении в справочник строка применится заново
+                    profile.directory_fingerprint = ''
+                bulk_update_with_history(profiles, Profile, ['is_active', 'directory_fingerprint'],
+                                         batch_size=self.batch_size, default_change_reason=CHANGE_REASON)
+                user_ids = [profile.user_id for profile in profiles]
+                User.objects.filter(id__in=user_ids).update(is_active=False)
+                transaction.on_commit(lambda ids=user_ids: roles.invalidate(ids))
+
+
+def sync_directory(path, file_format=None, **options):
+    """
+    Метод для синхронизации со справочником из файла. Возвращает счётчики изменений и ошибки строк.
+    """
+    return DirectorySync(**options).run(read_rows(path, file_format))
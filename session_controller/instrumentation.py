@@ -0,0 +1,201 @@
+"""
+Лёгкие замеры производительности для продакшена.
+
+InstrumentationMiddleware (первый в цепочке) считает для каждого запроса
+число SQL-запросов и время в БД, попадания и промахи кэша, а MiddlewareTimer,
+вставленный перед каждым middleware, — собственное время каждого из них.
+Итог уходит в заголовок Server-Timing и в скользящие гистограммы по
+маршрутам, которые отдаёт /metrics/.
+"""
+import re
+import threading
+import time
+import types
+from collections import defaultdict, deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.db import connections
+
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+WINDOW = 1000  # сколько последних запросов маршрута хранить для перцентилей
+# Якоря ^ и $ в начале и конце сегментов маршрута (include + регулярные выражения роутера DRF), но не [^/.]
+ROUTE_ANCHORS_RE = re.compile(r'(?:^|(?<=/))\^|\$(?=/|$)')
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.db_ms = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.marks = []
+
+    def middleware_times(self):
+        """
+        Собственное время каждого звена: время внутри его таймера минус
+        время внутри следующего (вложенного) таймера.
+        """
+        inclusive = [(label, (end or start) - start) for label, start, end in self.marks]
+        times = []
+        for index, (label, total) in enumerate(inclusive):
+            inner = inclusive[index + 1][1] if index + 1 < len(inclusive) else 0.0
+            times.append((label, max(total - inner, 0.0) * 1000))
+        return times
+
+
+def record_cache(hit):
+    metrics = _current.get()
+    if metrics is None:
+        return
+    if hit:
+        metrics.cache_hits += 1
+    else:
+        metrics.cache_misses += 1
+
+
+class RouteStats:
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.recent = deque(maxlen=WINDOW)
+        self.queries = 0
+        self.db_ms = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.middleware_ms = defaultdict(float)
+        self.statuses = defaultdict(int)
+
+    def add(self, duration_ms, status, metrics, middleware_times):
+        self.count += 1
+        self.total_ms += duration_ms
+        for index, bound in enumerate(BUCKETS_MS):
+            if duration_ms <= bound:
+                self.buckets[index] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+        self.recent.append(duration_ms)
+        self.queries += metrics.queries
+        self.db_ms += metrics.db_ms
+        self.cache_hits += metrics.cache_hits
+        self.cache_misses += metrics.cache_misses
+        for label, spent in middleware_times:
+            self.middleware_ms[label] += spent
+        self.statuses[status] += 1
+
+    def snapshot(self):
+        recent = sorted(self.recent)
+
+        def percentile(share):
+            if not recent:
+                return None
+            return round(recent[min(int(share * len(recent)), len(recent) - 1)], 3)
+
+        count = self.count or 1
+        return {
+            'count': self.count,
+            'avg_ms': round(self.total_ms / count, 3),
+            'p50_ms': percentile(0.50),
+            'p95_ms': percentile(0.95),
+            'p99_ms': percentile(0.99),
+            'histogram': dict(zip([f"le_{bound}" for bound in BUCKETS_MS] + ['le_inf'], self.buckets)),
+            'avg_queries': round(self.queries / count, 2),
+            'avg_db_ms': round(self.db_ms / count, 3),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'avg_middleware_ms': {label: round(spent / count, 3) for label, spent in self.middleware_ms.items()},
+            'statuses': dict(self.statuses),
+        }
+
+
+_routes = defaultdict(RouteStats)
+_routes_lock = threading.Lock()
+
+
+def snapshot():
+    with _routes_lock:
+        return {key: stats.snapshot() for key, stats in sorted(_routes.items())}
+
+
+def reset():
+    with _routes_lock:
+        _routes.clear()
+
+
+def _route_key(request):
+    match = getattr(request, 'resolver_match', None)
+    route = match.route if match is not None and match.route else '<unresolved>'
+    # Маршруты роутера DRF заданы регулярными выражениями: api/^sessions/$ -> api/sessions/
+    return f"{request.method} /{ROUTE_ANCHORS_RE.sub('', route).lstrip('/')}"
+
+
+class InstrumentationMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def _query_wrapper(self, execute, sql, params, many, context):
+        metrics = _current.get()
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if metrics is not None:
+                metrics.queries += 1
+                metrics.db_ms += (time.perf_counter() - started) * 1000
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(self._query_wrapper))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        middleware_times = metrics.middleware_times()
+        timings = [f'total;dur={duration_ms:.2f}',
+                   f'db;dur={metrics.db_ms:.2f};desc="{metrics.queries} queries"',
+                   f'cache;desc="hits={metrics.cache_hits} misses={metrics.cache_misses}"']
+        timings += [f'{label};dur={spent:.2f}' for label, spent in middleware_times]
+        response['Server-Timing'] = ', '.join(timings)
+
+        with _routes_lock:
+            _routes[_route_key(request)].add(duration_ms, response.status_code, metrics, middleware_times)
+        return response
+
+
+class MiddlewareTimer:
+    """
+    Ставится перед каждым middleware и отмечает вход и выход из следующего звена.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        target = getattr(get_response, '__wrapped__', get_response)
+        # Самый внутренний таймер оборачивает не middleware, а вызов представления
+        if hasattr(target, '__func__'):
+            self.label = 'view'
+        elif isinstance(target, types.FunctionType):
+            # Middleware-функция: HistoryRequestMiddleware.<locals>.middleware -> HistoryRequestMiddleware
+            self.label = target.__qualname__.split('.')[0]
+        else:
+            self.label = type(target).__name__
+
+    def __call__(self, request):
+        metrics = _current.get()
+        if metrics is None:
+            return self.get_response(request)
+        mark = [self.label, time.perf_counter(), None]
+        metrics.marks.append(mark)
+        try:
+            return self.get_response(request)
+        finally:
+            mark[2] = time.perf_counter()
@@ -0,0 +1,51 @@
+"""
+Постраничный вывод по ключу (seek pagination) для ленты по убыванию (timestamp, id).
+
+Вместо OFFSET следующая страница начинается строго после последней строки
+предыдущей, поэтому стоимость страницы не зависит от глубины пролистывания.
+"""
+import base64
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(timestamp, pk):
+    raw = f"{timestamp.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Возвращает (timestamp, id) или None для пустого/повреждённого курсора.
+    """
+    if not cursor:
+        return None
+    try:
+        timestamp, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        timestamp = parse_datetime(timestamp)
+        pk = int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if timestamp is None:
+        return None
+    return timestamp, pk
+
+
+def keyset_page(queryset, cursor, page_size, field='timestamp'):
+    """
+    Возвращает (строки, курсор следующей страницы или None).
+    queryset должен отдавать словари, содержащие field и id.
+    """
+    queryset = queryset.order_by(f'-{field}', '-id')
+    position = decode_cursor(cursor)
+    if position:
+        timestamp, pk = position
+        queryset = queryset.filter(
+            Q(**{f'{field}__lt': timestamp}) | Q(**{field: timestamp, 'id__lt': pk}))
+    rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(rows[-1][field], rows[-1]['id'])
+    return rows, next_cursor
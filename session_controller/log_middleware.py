@@ -1,17 +1,19 @@
 from django.utils.timezone import now
-from .models import VisitLog
+from .visit_log_writer import get_writer
 
 
 class LogMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
+        self.writer = get_writer()
 
     def __call__(self, request):
         response = self.get_response(request)
 
-        if request.user.is_authenticated:
-            VisitLog.objects.create(
-                user=request.user,
+        # Запись только ставится в буфер, в базу она уйдёт пачкой
+        if request.user.is_authenticated and self.writer.should_log(request):
+            self.writer.enqueue(
+                user_id=request.user.pk,
                 path=request.path,
                 method=request.method,
                 timestamp=now()
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from session_controller import archive
+
+
+class Command(BaseCommand):
+    help = "Архивирует неактивные старые сессии в сжатые JSONL-файлы и удаляет их из базы"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Возраст сессий в днях (по умолчанию из настроек)")
+        parser.add_argument('--batch-size', type=int, help="Сессий в одном архивном файле")
+        parser.add_argument('--max-seconds', type=int, default=0, help="Ограничение времени; 0 — без ограничения")
+        parser.add_argument('--dry-run', action='store_true', help="Только посчитать, ничего не записывая")
+
+    def handle(self, *args, **options):
+        stats = archive.archive_sessions(options['days'], options['batch_size'], options['max_seconds'],
+                                         options['dry_run'])
+        for name in stats['files']:
+            self.stdout.write(name)
+        if stats['resumed']:
+            self.stdout.write(f"Доудалено после прерванного запуска: {stats['resumed']}")
+        message = f"Сессий: {stats['sessions']}, оценок: {stats['assessments']}, файлов: {len(stats['files'])}"
+        if not stats['finished']:
+            self.stdout.write(self.style.WARNING(message + " (время вышло, остальное — следующим запуском)"))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,211 @@
+import io
+import json
+import math
+import platform
+import time
+
+import django
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import (CaptureQueriesContext, override_settings, setup_databases, setup_test_environment,
+                               teardown_databases, teardown_test_environment)
+from django.utils.timezone import now
+
+from session_controller.visit_log_writer import get_writer
+
+SIZES = {
+    'small': {'users': 50, 'sessions': 100, 'competencies': 20, 'visit_logs': 2000},
+    'medium': {'users': 500, 'sessions': 2000, 'competencies': 50, 'visit_logs': 50000},
+    'large': {'users': 5000, 'sessions': 20000, 'competencies': 100, 'visit_logs': 500000},
+}
+
+# (имя, путь, кто запрашивает: anonymous, user или staff); в путях подставляются id из тестовых данных
+ROUTES = [
+    ('home', '/', 'anonymous'),
+    ('home_search', '/?query=a', 'anonymous'),
+    ('all_sessions', '/sessions/', 'anonymous'),
+    ('all_projects', '/projects/', 'anonymous'),
+    ('all_competencies', '/competencies/', 'anonymous'),
+    ('session_detail', '/session/{session}/', 'anonymous'),
+    ('project_detail', '/project/{project}/', 'anonymous'),
+    ('competency_detail', '/competency/{competency}/', 'anonymous'),
+    ('profile_detail', '/profile/{profile}/', 'anonymous'),
+    ('visit_logs', '/logs/', 'anonymous'),
+    ('visit_stats', '/logs/stats/', 'anonymous'),
+    ('api_sessions', '/api/sessions/', 'anonymous'),
+    ('api_session_detail', '/api/sessions/{session}/', 'anonymous'),
+    ('api_sessions_average_score', '/api/sessions/average_score/', 'anonymous'),
+    ('api_session_score_summary', '/api/sessions/{session}/score_summary/', 'anonymous'),
+    ('api_competencies', '/api/competencies/', 'anonymous'),
+    ('api_competency_names', '/api/competencies/list_names/', 'anonymous'),
+    ('api_assessments', '/api/assessments/', 'anonymous'),
+    ('api_users', '/api/users/', 'anonymous'),
+    ('api_session_count', '/api/get_session_count/', 'anonymous'),
+    ('api_search', '/api/search/?q=a', 'anonymous'),
+    ('api_autocomplete_users', '/api/autocomplete/users/?term=a', 'anonymous'),
+    ('api_autocomplete_competencies', '/api/autocomplete/competencies/?term=a', 'anonymous'),
+    ('home_authenticated', '/', 'user'),
+    ('api_sessions_authenticated', '/api/sessions/', 'user'),
+    ('api_assessments_export', '/api/assessments/export/', 'user'),
+    ('metrics', '/metrics/', 'staff'),
+]
+
+BENCHMARK_SETTINGS = {
+    # Локальный кэш вместо Redis, задачи Celery выполняются на месте
+    'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    'CELERY_TASK_ALWAYS_EAGER': True,
+    'DEBUG': False,
+    # Буфер журнала посещений сбрасывался бы уже после удаления тестовой базы
+    'VISIT_LOG': {'BACKEND': 'off'},
+}
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    index = max(math.ceil(share * len(ordered)) - 1, 0)
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = "Замеряет задержку, число SQL-запросов и объём ответа для всех маршрутов и сравнивает с эталоном"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', choices=SIZES, default='small')
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--route', action='append', dest='routes',
+                            help="Замерить только указанные маршруты (по имени)")
+        parser.add_argument('--cache', choices=['locmem', 'dummy'], default='locmem',
+                            help="dummy — замер без кэша")
+        parser.add_argument('--output', default='bench_results.json')
+        parser.add_argument('--baseline', help="JSON прошлых замеров для сравнения")
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help="Допустимый рост p95 и объёма ответа (доля)")
+        parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                            help="Рост p95 меньше этого значения не считается регрессией")
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        routes = [route for route in ROUTES if not options['routes'] or route[0] in options['routes']]
+        if not routes:
+            raise CommandError("Нет маршрутов для замера")
+
+        overrides = dict(BENCHMARK_SETTINGS)
+        if options['cache'] == 'dummy':
+            overrides['CACHES'] = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+        # Отдельная тестовая база: рабочая не затрагивается
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            with override_settings(**overrides):
+                self.seed(options['size'], options['seed'])
+                results = self.run_routes(routes, options['iterations'], options['warmup'])
+                # Если писатель был создан до замера с буфером, дописываем его в тестовую базу
+                get_writer().flush()
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            'meta': {
+                'created_at': now().isoformat(),
+                'size': options['size'],
+                'dataset': SIZES[options['size']],
+                'iterations': options['iterations'],
+                'cache': options['cache'],
+                'django': django.get_version(),
+                'python': platform.python_version(),
+            },
+            'routes': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            json.dump(report, output, indent=2, ensure_ascii=False)
+        self.print_results(results)
+        self.stdout.write(f"Результаты записаны в {options['output']}")
+
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as baseline:
+                regressions = self.compare(json.load(baseline)['routes'], results,
+                                           options['threshold'], options['min_delta_ms'])
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f"Регрессий: {len(regressions)}")
+
+    def seed(self, size, seed):
+        from django.contrib.auth.models import User
+        from session_controller.models import Competency, Profile, Project, Session
+
+        call_command('populate_db', seed=seed, history='skip', stdout=io.StringIO(), **SIZES[size])
+        self.ids = {
+            'session': Session.objects.order_by('id').values_list('id', flat=True).first(),
+            'project': Project.objects.order_by('id').values_list('id', flat=True).first(),
+            'competency': Competency.objects.order_by('id').values_list('id', flat=True).first(),
+            'profile': Profile.objects.order_by('id').values_list('id', flat=True).first(),
+        }
+        self.user = Profile.objects.order_by('id').first().user
+        self.staff = User.objects.create_superuser('benchmark_staff', 'benchmark@example.com', None)
+
+    def run_routes(self, routes, iterations, warmup):
+        clients = {'anonymous': Client(), 'user': Client(), 'staff': Client()}
+        clients['user'].force_login(self.user)
+        clients['staff'].force_login(self.staff)
+
+        results = {}
+        for name, path, access in routes:
+            client = clients[access]
+            url = path.format(**self.ids)
+            for _ in range(warmup):
+                client.get(url)
+
+            timings, queries, sizes, statuses = [], [], [], set()
+            for _ in range(iterations):
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = client.get(url)
+                    content = b''.join(response.streaming_content) if response.streaming else response.content
+                    timings.append((time.perf_counter() - started) * 1000)
+                queries.append(len(captured.captured_queries))
+                sizes.append(len(content))
+                statuses.add(response.status_code)
+
+            results[name] = {
+                'url': url,
+                'status': sorted(statuses),
+                'p50_ms': round(percentile(timings, 0.50), 3),
+                'p95_ms': round(percentile(timings, 0.95), 3),
+                'p99_ms': round(percentile(timings, 0.99), 3),
+                'queries': max(queries),
+                'bytes': max(sizes),
+            }
+        return results
+
+    def print_results(self, results):
+        self.stdout.write(f"{'маршрут':<30} {'p50':>9} {'p95':>9} {'p99':>9} {'SQL':>5} {'байт':>9}  статус")
+        for name, row in results.items():
+            self.stdout.write(
+                f"{name:<30} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f} "
+                f"{row['queries']:>5} {row['bytes']:>9}  {','.join(map(str, row['status']))}")
+
+    def compare(self, baseline, results, threshold, min_delta_ms):
+        regressions = []
+        for name, row in results.items():
+            base = baseline.get(name)
+            if base is None:
+                continue
+            if row['p95_ms'] > base['p95_ms'] * (1 + threshold) and row['p95_ms'] - base['p95_ms'] > min_delta_ms:
+                regressions.append(f"{name}: p95 {base['p95_ms']} -> {row['p95_ms']} мс")
+            if row['queries'] > base['queries']:
+                regressions.append(f"{name}: SQL-запросов {base['queries']} -> {row['queries']}")
+            if row['bytes'] > base['bytes'] * (1 + threshold):
+                regressions.append(f"{name}: ответ {base['bytes']} -> {row['bytes']} байт")
+            if row['status'] != base['status']:
+                regressions.append(f"{name}: статус {base['status']} -> {row['status']}")
+
+        for line in regressions:
+            self.stdout.write(self.style.ERROR(line))
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS("Регрессий относительно эталона нет"))
+        return regressions
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from session_controller import history
+
+
+class Command(BaseCommand):
+    help = "Сжимает таблицы истории: удаляет версии без изменений и версии старше срока хранения"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-versions', type=int, help="Сколько последних версий объекта хранить всегда")
+        parser.add_argument('--keep-days', type=int, help="Срок хранения более старых версий, дней")
+        parser.add_argument('--dry-run', action='store_true', help="Только посчитать, ничего не удаляя")
+
+    def handle(self, *args, **options):
+        results = history.compact_history(keep_versions=options['keep_versions'], keep_days=options['keep_days'],
+                                          dry_run=options['dry_run'])
+        for label, (scanned, removed) in results.items():
+            self.stdout.write(f"{label}: версий {scanned}, удалено {removed}")
+        self.stdout.write(self.style.SUCCESS("Готово" + (" (без изменений)" if options['dry_run'] else "")))
@@ -1,92 +1,200 @@
 from django.core.management.base import BaseCommand
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils.timezone import now
 from faker import Faker
 from django.contrib.auth.models import User
-from session_controller.models import Profile, Session, Competency, Assessment, SessionCompetency, Evaluator, Project
+from session_controller.models import (Profile, Session, Competency, Assessment, SessionCompetency, Evaluator,
+                                       Project, VisitLog)
+from session_controller import score_summaries, search
 import random
-from datetime import timedelta, date
+import time
+from datetime import timedelta
 
 ROLES = ['employee', 'team_lead', 'hr_manager']
+METHODS = ['GET'] * 8 + ['POST']
+PATHS = ['/', '/sessions/', '/projects/', '/competencies/', '/logs/', '/api/sessions/',
+         '/api/assessments/', '/api/competencies/', '/api/users/', '/profile/edit-avatar/']
 
 
 class Command(BaseCommand):
-    help = "Заполняет базу данных тестовыми данными"
-
-    def handle(self, *args, **kwargs):
-        fake = Faker()
-
-        # Создание пользователей и профилей
-        users = []
-        for _ in range(20):  # 20 пользователей
-            username = fake.user_name()
-            user = User.objects.create_user(
-                username=username, password='password123')
-            profile = Profile.objects.create(
-                user=user,
-                full_name=fake.name(),
-                department=fake.word(),
-                role=random.choice(ROLES),
-                hire_date=fake.date_this_decade(),
-                is_active=True
-            )
-            users.append(user)
-
-        # Создание проектов
-        projects = []
-        for _ in range(5):  # 5 проектов
-            project = Project.objects.create(
-                name=fake.sentence(nb_words=3),
-                description=fake.text(max_nb_chars=200),
-                start_date=fake.date_this_decade(),
-                end_date=fake.date_this_decade()
+    help = "Заполняет базу данных тестовыми данными (в том числе объёмами для нагрузочных тестов)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--projects', type=int, default=5)
+        parser.add_argument('--competencies', type=int, default=10)
+        parser.add_argument('--sessions', type=int, default=5)
+        parser.add_argument('--competencies-per-session', type=int, default=3)
+        parser.add_argument('--evaluators-per-session', type=int, default=3)
+        parser.add_argument('--visit-logs', type=int, default=0,
+                            help="Сколько записей VisitLog создать")
+        parser.add_argument('--visit-log-days', type=int, default=30,
+                            help="За сколько последних дней распределить VisitLog")
+        parser.add_argument('--seed', type=int, default=None,
+                            help="Зерно генератора для воспроизводимых данных")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--history', choices=['bulk', 'skip'], default='bulk',
+                            help="bulk — записать историю simple_history пачками, skip — не писать")
+        parser.add_argument('--password', default='password123')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.fake = Faker()
+        if options['seed'] is not None:
+            self.fake.seed_instance(options['seed'])
+        self.batch_size = options['batch_size']
+        self.with_history = options['history'] == 'bulk'
+        started = time.monotonic()
+
+        user_ids = self.create_users(options['users'], options['password'])
+        self.create_projects(options['projects'], user_ids)
+        competency_ids = self.create_competencies(options['competencies'])
+        self.create_sessions(
+            options['sessions'], user_ids, competency_ids,
+            min(options['competencies_per_session'], len(competency_ids)),
+            min(options['evaluators_per_session'], len(user_ids)))
+        if options['visit_logs']:
+            self.create_visit_logs(options['visit_logs'], user_ids, options['visit_log_days'])
+
+        # bulk_create не вызывает сигналы — сводки оценок и поисковый индекс собираем один раз в конце
+        score_summaries.rebuild()
+        search.rebuild()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Данные успешно добавлены за {time.monotonic() - started:.1f} с!"))
+
+    def batches(self, total):
+        for start in range(0, total, self.batch_size):
+            yield range(start, min(start + self.batch_size, total))
+
+    def bulk_create(self, model, objs):
+        model.objects.bulk_create(objs, batch_size=self.batch_size)
+        if self.with_history and hasattr(model, 'history'):
+            model.history.bulk_history_create(objs, batch_size=self.batch_size)
+        return objs
+
+    def create_users(self, count, password):
+        # PBKDF2 считается один раз, а не на каждого пользователя
+        password_hash = make_password(password)
+        # Суффикс делает имена уникальными и при повторном запуске на непустой базе
+        offset = User.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        user_ids = []
+        for batch in self.batches(count):
+            with transaction.atomic():
+                users = User.objects.bulk_create([
+                    User(
+                        username=f"{self.fake.user_name()}_{offset + index}",
+                        first_name=self.fake.first_name(),
+                        last_name=self.fake.last_name(),
+                        email=self.fake.email(),
+                        password=password_hash,
+                    )
+                    for index in batch
+                ], batch_size=self.batch_size)
+                self.bulk_create(Profile, [
+                    Profile(
+                        user=user,
+                        full_name=f"{user.first_name} {user.last_name}",
+                        department=self.fake.word(),
+                        role=self.rng.choice(ROLES),
+                        hire_date=self.fake.date_this_decade(),
+                        is_active=True
+                    )
+                    for user in users
+                ])
+            user_ids.extend(user.id for user in users)
+        self.stdout.write(f"Пользователей и профилей: {len(user_ids)}")
+        return user_ids
+
+    def create_projects(self, count, user_ids):
+        projects = Project.objects.bulk_create([
+            Project(
+                name=self.fake.sentence(nb_words=3),
+                description=self.fake.text(max_nb_chars=200),
+                start_date=self.fake.date_this_decade(),
+                end_date=self.fake.date_this_decade()
             )
-            projects.append(project)
+            for _ in range(count)
+        ], batch_size=self.batch_size)
+        if not projects:
+            return
 
         # Добавление проектов к профилям
-        for profile in Profile.objects.all():
-            assigned_projects = random.sample(
-                projects, k=random.randint(1, len(projects)))
-            profile.projects.set(assigned_projects)
-
-        # Создание компетенций
-        competencies = []
-        for _ in range(10):  # 10 компетенций
-            competency = Competency.objects.create(
-                name=fake.job(),
-                description=fake.text(max_nb_chars=200)
-            )
-            competencies.append(competency)
-
-        # Создание сессий
-        sessions = []
-        for _ in range(5):  # 5 сессий
-            session = Session.objects.create(
-                title=fake.sentence(nb_words=4),
-                evaluated=random.choice(users),
-                is_active=random.choice([True, False])
+        through = Profile.projects.through
+        profile_ids = Profile.objects.filter(user_id__in=user_ids).values_list('id', flat=True)
+        links = []
+        for profile_id in profile_ids.iterator(chunk_size=self.batch_size):
+            for project in self.rng.sample(projects, k=self.rng.randint(1, min(3, len(projects)))):
+                links.append(through(profile_id=profile_id, project_id=project.id))
+            if len(links) >= self.batch_size:
+                through.objects.bulk_create(links, batch_size=self.batch_size)
+                links = []
+        through.objects.bulk_create(links, batch_size=self.batch_size)
+        self.stdout.write(f"Проектов: {len(projects)}")
+
+    def create_competencies(self, count):
+        competencies = self.bulk_create(Competency, [
+            Competency(
+                name=self.fake.job()[:100],
+                description=self.fake.text(max_nb_chars=200)
             )
-            sessions.append(session)
-
-            # Добавление компетенций в сессии
-            # 3 случайные компетенции
-            for competency in random.sample(competencies, k=3):
-                SessionCompetency.objects.create(
-                    session=session, competency=competency)
-
-            # Назначение оценщиков
-            evaluators = random.sample(users, k=3)  # 3 случайных оценщика
-            for evaluator in evaluators:
-                Evaluator.objects.create(session=session, evaluator=evaluator)
-
-        # Создание оценок
-        for session in sessions:
-            for competency in session.competencies.all():
-                for evaluator in session.evaluators.all():
-                    Assessment.objects.create(
-                        session=session,
-                        competency=competency,
-                        evaluator=evaluator.evaluator,
-                        score=random.randint(1, 10),
-                        comment=fake.text(max_nb_chars=100)
+            for _ in range(count)
+        ])
+        self.stdout.write(f"Компетенций: {len(competencies)}")
+        return [competency.id for competency in competencies]
+
+    def create_sessions(self, count, user_ids, competency_ids, per_session, evaluators_per_session):
+        titles = [self.fake.sentence(nb_words=4) for _ in range(min(count, 1000))]
+        comments = [self.fake.text(max_nb_chars=100) for _ in range(min(count, 1000))]
+        assessments_total = 0
+        for batch in self.batches(count):
+            with transaction.atomic():
+                sessions = self.bulk_create(Session, [
+                    Session(
+                        title=self.rng.choice(titles),
+                        evaluated_id=self.rng.choice(user_ids),
+                        is_active=self.rng.choice([True, False])
+                    )
+                    for _ in batch
+                ])
+                links, evaluators, assessments = [], [], []
+                for session in sessions:
+                    # Компетенции и оценщики сессии, по оценке на каждую пару
+                    session_competencies = self.rng.sample(competency_ids, k=per_session)
+                    session_evaluators = self.rng.sample(user_ids, k=evaluators_per_session)
+                    links.extend(SessionCompetency(session_id=session.id, competency_id=competency_id)
+                                 for competency_id in session_competencies)
+                    evaluators.extend(Evaluator(session_id=session.id, evaluator_id=evaluator_id)
+                                      for evaluator_id in session_evaluators)
+                    assessments.extend(
+                        Assessment(
+                            session_id=session.id,
+                            competency_id=competency_id,
+                            evaluator_id=evaluator_id,
+                            score=self.rng.randint(1, 10),
+                            comment=self.rng.choice(comments)
+                        )
+                        for competency_id in session_competencies
+                        for evaluator_id in session_evaluators
                     )
+                SessionCompetency.objects.bulk_create(links, batch_size=self.batch_size)
+                Evaluator.objects.bulk_create(evaluators, batch_size=self.batch_size)
+                self.bulk_create(Assessment, assessments)
+            assessments_total += len(assessments)
+        self.stdout.write(f"Сессий: {count}, оценок: {assessments_total}")
 
-        self.stdout.write(self.style.SUCCESS("Данные успешно добавлены!"))
+    def create_visit_logs(self, count, user_ids, days):
+        end = now()
+        span = int(timedelta(days=days).total_seconds())
+        for batch in self.batches(count):
+            VisitLog.objects.bulk_create([
+                VisitLog(
+                    user_id=self.rng.choice(user_ids),
+                    path=self.rng.choice(PATHS),
+                    method=self.rng.choice(METHODS),
+                    timestamp=end - timedelta(seconds=self.rng.randint(0, span))
+                )
+                for _ in batch
+            ], batch_size=self.batch_size)
+        self.stdout.write(f"Логов посещений: {count}")
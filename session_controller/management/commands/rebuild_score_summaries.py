@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from session_controller import score_summaries
+
+
+class Command(BaseCommand):
+    help = "Пересобирает или проверяет сводки оценок по сессиям и компетенциям"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help="Только сравнить сводки с пересчётом, ничего не меняя")
+        parser.add_argument('--session', type=int, action='append', dest='sessions',
+                            help="Ограничиться указанными сессиями (можно несколько раз)")
+
+    def handle(self, *args, **options):
+        session_ids = options['sessions']
+
+        if options['verify']:
+            mismatches = score_summaries.verify(session_ids)
+            for kind, key, expected, actual in mismatches:
+                self.stdout.write(f"{kind} {key}: ожидалось {expected}, сохранено {actual}")
+            if mismatches:
+                self.stdout.write(self.style.ERROR(f"Расхождений: {len(mismatches)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS("Сводки совпадают с данными"))
+            return
+
+        sessions, pairs = score_summaries.rebuild(session_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f"Сводки пересобраны: сессий {sessions}, пар сессия-компетенция {pairs}"))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from session_controller import search
+
+
+class Command(BaseCommand):
+    help = "Строит полнотекстовый индекс сессий, проектов и компетенций"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="Сколько объектов индексировать за одну транзакцию")
+
+    def handle(self, *args, **options):
+        counts = search.rebuild(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            "Индекс построен: " + ', '.join(f"{kind} {count}" for kind, count in counts.items())))
@@ -0,0 +1,30 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from session_controller import archive
+
+
+class Command(BaseCommand):
+    help = "Восстанавливает сессии с оценками из архивных файлов"
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+',
+                            help="Архивные файлы .jsonl.gz (имя без пути ищется в каталоге архива)")
+        parser.add_argument('--session', type=int, action='append', dest='sessions',
+                            help="Восстановить только указанные сессии (можно несколько раз)")
+
+    def handle(self, *args, **options):
+        paths = []
+        for name in options['files']:
+            path = name if os.path.exists(name) else os.path.join(archive.archive_dir(), name)
+            if not os.path.exists(path):
+                raise CommandError(f"Файл не найден: {name}")
+            paths.append(path)
+
+        stats = archive.restore(paths, options['sessions'])
+        for problem in stats['skipped']:
+            self.stdout.write(self.style.WARNING(problem))
+        self.stdout.write(self.style.SUCCESS(
+            f"Восстановлено сессий: {stats['restored']}, оценок: {stats['assessments']}; "
+            f"уже были в базе: {stats['existing']}"))
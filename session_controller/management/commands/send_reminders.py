@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from session_controller import reminders
+
+
+class Command(BaseCommand):
+    help = "Рассылает оценщикам напоминания о незаполненных оценках"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, help="Не больше этого числа оценщиков")
+        parser.add_argument('--dry-run', action='store_true', help="Только посчитать, кому нужно напомнить")
+
+    def handle(self, *args, **options):
+        stats = reminders.send_reminders(limit=options['limit'], dry_run=options['dry_run'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Оценщиков: {stats['evaluators']}, пропущенных оценок: {stats['missing']}, "
+            f"отправлено: {stats['sent']}, без изменений: {stats['unchanged']}, ошибок: {stats['failed']}"))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from session_controller import db_maintenance
+
+
+class Command(BaseCommand):
+    help = "Обслуживание SQLite: ANALYZE, PRAGMA optimize, инкрементальная очистка и checkpoint WAL"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--enable-wal', action='store_true',
+                            help="Перевести базу в режим WAL (хранится в файле базы; один раз при выкладке)")
+        parser.add_argument('--enable-incremental-vacuum', action='store_true',
+                            help="Один раз перевести базу в auto_vacuum=INCREMENTAL (полный VACUUM, блокирует базу)")
+
+    def handle(self, *args, **options):
+        if not db_maintenance.is_sqlite():
+            raise CommandError("База по умолчанию — не SQLite")
+        if options['enable_wal']:
+            self.stdout.write(f"Режим журнала: {db_maintenance.enable_wal()}")
+        if options['enable_incremental_vacuum']:
+            db_maintenance.enable_incremental_vacuum()
+            self.stdout.write("Включён auto_vacuum=INCREMENTAL")
+        for name, value in db_maintenance.maintain().items():
+            self.stdout.write(f"{name}: {value}")
+        self.stdout.write(self.style.SUCCESS("Готово"))
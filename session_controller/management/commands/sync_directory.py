@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from session_controller.hris_sync import DirectoryError, sync_directory
+
+
+class Command(BaseCommand):
+    help = "Синхронизирует пользователей и профили со справочником сотрудников (CSV или JSONL)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], dest='file_format',
+                            help="По умолчанию определяется по расширению файла")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--deactivate-missing', action='store_true',
+                            help="Отключить сотрудников из справочника, которых нет в файле")
+        parser.add_argument('--force', action='store_true',
+                            help="Применить все строки, не сравнивая отпечатки")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Только посчитать изменения")
+
+    def handle(self, *args, **options):
+        try:
+            stats = sync_directory(
+                options['path'], options['file_format'], batch_size=options['batch_size'],
+                deactivate_missing=options['deactivate_missing'], force=options['force'],
+                dry_run=options['dry_run'])
+        except (OSError, DirectoryError, ValueError) as e:
+            raise CommandError(f"Не удалось прочитать справочник: {e}")
+
+        for error in stats['errors']:
+            self.stdout.write(self.style.WARNING(error))
+        prefix = "Без изменений (--dry-run): " if options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}создано {stats['created']}, обновлено {stats['updated']}, "
+            f"без изменений {stats['unchanged']}, отключено {stats['deactivated']}, "
+            f"ошибок {len(stats['errors'])}"))
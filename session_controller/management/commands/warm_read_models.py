@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from session_controller import read_models
+
+
+class Command(BaseCommand):
+    help = "Собирает модели чтения и создаёт их периодические задачи; запускается после выкладки"
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help="Имена моделей чтения (по умолчанию все)")
+        parser.add_argument('--no-schedules', action='store_true', help="Не создавать периодические задачи")
+
+    def handle(self, *args, **options):
+        names = options['names'] or list(read_models.REGISTRY)
+        for name in names:
+            if name not in read_models.REGISTRY:
+                self.stderr.write(f"Неизвестная модель чтения: {name}")
+                continue
+            self.stdout.write(f"{name}: {read_models.rebuild(name)} мс")
+        if not options['no_schedules']:
+            for name in read_models.sync_schedules():
+                self.stdout.write(f"Создана периодическая задача {read_models.TASK_NAME.format(name)}")
+        self.stdout.write(self.style.SUCCESS("Готово"))
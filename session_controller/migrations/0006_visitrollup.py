@@ -0,0 +1,48 @@
+# Generated by Django 5.1.5 on 2026-10-18 09:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('session_controller', '0005_visitlog'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VisitPath',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=255, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VisitRollupCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VisitRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Час'), ('day', 'День')], max_length=4)),
+                ('bucket', models.DateTimeField()),
+                ('method', models.CharField(max_length=10)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('path', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='session_controller.visitpath')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visit_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period', 'bucket'], name='session_con_period_30503f_idx')],
+                'unique_together': {('period', 'bucket', 'user', 'path', 'method')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.5 on 2026-10-18 09:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('session_controller', '0006_visitrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='visitlog',
+            index=models.Index(fields=['timestamp', 'id'], name='visitlog_ts_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visitlog',
+            index=models.Index(fields=['user', 'timestamp', 'id'], name='visitlog_user_ts_id_idx'),
+        ),
+    ]
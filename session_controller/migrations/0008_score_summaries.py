@@ -0,0 +1,49 @@
+# Generated by Django 5.1.5 on 2026-10-18 09:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('session_controller', '0007_visitlog_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionScoreSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total', models.BigIntegerField(default=0)),
+                ('sum_squares', models.BigIntegerField(default=0)),
+                ('min_score', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('max_score', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('evaluator_count', models.PositiveIntegerField(default=0)),
+                ('competency_count', models.PositiveIntegerField(default=0)),
+                ('session', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='score_summary', to='session_controller.session')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='SessionCompetencyScoreSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total', models.BigIntegerField(default=0)),
+                ('sum_squares', models.BigIntegerField(default=0)),
+                ('min_score', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('max_score', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('competency', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='score_summaries', to='session_controller.competency')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='competency_score_summaries', to='session_controller.session')),
+            ],
+            options={
+                'unique_together': {('session', 'competency')},
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.1.5 on 2026-10-18 09:38
+
+import django.db.models.deletion
+import simple_history.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('session_controller', '0008_score_summaries'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='directory_fingerprint',
+            field=models.CharField(blank=True, default='', editable=False, max_length=40),
+        ),
+        migrations.CreateModel(
+            name='HistoricalProfile',
+            fields=[
+                ('id', models.BigIntegerField(auto_created=True, blank=True, db_index=True, verbose_name='ID')),
+                ('full_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('department', models.CharField(blank=True, max_length=100, null=True)),
+                ('role', models.CharField(choices=[('employee', 'Employee'), ('team_lead', 'Team Lead'), ('hr_manager', 'HR Manager')], max_length=50)),
+                ('hire_date', models.DateField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('avatar', models.TextField(blank=True, max_length=100, null=True)),
+                ('resume', models.TextField(blank=True, max_length=100, null=True)),
+                ('portfolio', models.URLField(blank=True, max_length=500, null=True)),
+                ('directory_fingerprint', models.CharField(blank=True, default='', editable=False, max_length=40)),
+                ('history_id', models.AutoField(primary_key=True, serialize=False)),
+                ('history_date', models.DateTimeField(db_index=True)),
+                ('history_change_reason', models.CharField(max_length=100, null=True)),
+                ('history_type', models.CharField(choices=[('+', 'Created'), ('~', 'Changed'), ('-', 'Deleted')], max_length=1)),
+                ('history_user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'historical Профиль',
+                'verbose_name_plural': 'historical Профили',
+                'ordering': ('-history_date', '-history_id'),
+                'get_latest_by': ('history_date', 'history_id'),
+            },
+            bases=(simple_history.models.HistoricalChanges, models.Model),
+        ),
+    ]
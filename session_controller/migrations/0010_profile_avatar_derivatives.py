@@ -0,0 +1,23 @@
+# Generated by Django 5.1.5 on 2026-10-18 09:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('session_controller', '0009_profile_history'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicalprofile',
+            name='avatar_derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='avatar_derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
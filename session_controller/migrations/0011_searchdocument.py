@@ -0,0 +1,76 @@
+# Generated by Django 5.1.5 on 2026-10-18 09:49
+
+from django.db import migrations, models
+
+# Полнотекстовый индекс по документам поиска: во внешнем FTS5-индексе в SQLite
+# (синхронизируется триггерами) или GIN-индексах по выражению в PostgreSQL.
+# На других СУБД индекса нет, поиск работает через LIKE (см. session_controller/search.py).
+SQLITE_FORWARD = [
+    """CREATE VIRTUAL TABLE session_controller_searchdocument_fts USING fts5(
+        title, body,
+        content='session_controller_searchdocument', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+    """CREATE TRIGGER session_controller_searchdocument_ai AFTER INSERT ON session_controller_searchdocument BEGIN
+        INSERT INTO session_controller_searchdocument_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+    """CREATE TRIGGER session_controller_searchdocument_ad AFTER DELETE ON session_controller_searchdocument BEGIN
+        INSERT INTO session_controller_searchdocument_fts(session_controller_searchdocument_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END""",
+    """CREATE TRIGGER session_controller_searchdocument_au AFTER UPDATE ON session_controller_searchdocument BEGIN
+        INSERT INTO session_controller_searchdocument_fts(session_controller_searchdocument_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO session_controller_searchdocument_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS session_controller_searchdocument_au",
+    "DROP TRIGGER IF EXISTS session_controller_searchdocument_ad",
+    "DROP TRIGGER IF EXISTS session_controller_searchdocument_ai",
+    "DROP TABLE IF EXISTS session_controller_searchdocument_fts",
+]
+POSTGRESQL_FORWARD = [
+    """CREATE INDEX session_controller_searchdocument_fts ON session_controller_searchdocument
+        USING gin (to_tsvector('simple', title || ' ' || body))""",
+    """CREATE INDEX session_controller_searchdocument_title_fts ON session_controller_searchdocument
+        USING gin (to_tsvector('simple', title))""",
+]
+POSTGRESQL_BACKWARD = [
+    "DROP INDEX IF EXISTS session_controller_searchdocument_title_fts",
+    "DROP INDEX IF EXISTS session_controller_searchdocument_fts",
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, ()):
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('session_controller', '0010_profile_avatar_derivatives'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('session', 'Сессия'), ('project', 'Проект'), ('competency', 'Компетенция')], max_length=20)),
+                ('object_id', models.PositiveIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('body', models.TextField(blank=True, default='')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+        migrations.RunPython(
+            _run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRESQL_FORWARD}),
+            _run({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRESQL_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.1.5 on 2026-10-18 09:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('session_controller', '0012_archivecheckpoint'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='historicalassessment',
+            name='history_date',
+            field=models.DateTimeField(),
+        ),
+        migrations.AlterField(
+            model_name='historicalcompetency',
+            name='history_date',
+            field=models.DateTimeField(),
+        ),
+        migrations.AlterField(
+            model_name='historicalprofile',
+            name='history_date',
+            field=models.DateTimeField(),
+        ),
+        migrations.AlterField(
+            model_name='historicalsession',
+            name='history_date',
+            field=models.DateTimeField(),
+        ),
+        migrations.AddIndex(
+            model_name='historicalassessment',
+            index=models.Index(fields=['history_date', 'id'], name='session_con_history_891b09_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historicalcompetency',
+            index=models.Index(fields=['history_date', 'id'], name='session_con_history_3a2769_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historicalprofile',
+            index=models.Index(fields=['history_date', 'id'], name='session_con_history_92c390_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historicalsession',
+            index=models.Index(fields=['history_date', 'id'], name='session_con_history_6a8095_idx'),
+        ),
+    ]
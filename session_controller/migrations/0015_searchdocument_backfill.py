@@ -0,0 +1,43 @@
+from django.db import migrations
+
+
+def backfill(apps, schema_editor):
+    # Индекс из 0011 создаётся пустым, а документы появляются только при изменении объектов.
+    # Документы строятся по историческим моделям так же, как в session_controller/search.py;
+    # FTS-индекс заполняют триггеры из 0011.
+    db = schema_editor.connection.alias
+    Session = apps.get_model('session_controller', 'Session')
+    Project = apps.get_model('session_controller', 'Project')
+    Competency = apps.get_model('session_controller', 'Competency')
+    Assessment = apps.get_model('session_controller', 'Assessment')
+    SearchDocument = apps.get_model('session_controller', 'SearchDocument')
+
+    comments = {}
+    rows = Assessment.objects.using(db).exclude(comment__isnull=True).exclude(comment='').order_by('id')
+    for session_id, comment in rows.values_list('session_id', 'comment').iterator(chunk_size=2000):
+        comments.setdefault(session_id, []).append(comment)
+
+    def documents():
+        for session_id, title in Session.objects.using(db).values_list('id', 'title').iterator(chunk_size=2000):
+            yield 'session', session_id, title, '\n'.join(comments.get(session_id, ()))
+        for kind, model in (('project', Project), ('competency', Competency)):
+            for object_id, name, description in model.objects.using(db).values_list(
+                    'id', 'name', 'description').iterator(chunk_size=2000):
+                yield kind, object_id, name, description or ''
+
+    SearchDocument.objects.using(db).all().delete()
+    SearchDocument.objects.using(db).bulk_create([
+        SearchDocument(kind=kind, object_id=object_id, title=title[:255], body=body)
+        for kind, object_id, title, body in documents()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('session_controller', '0014_reminderdispatch'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
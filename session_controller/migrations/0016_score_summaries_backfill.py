@@ -0,0 +1,51 @@
+from collections import defaultdict
+
+from django.db import migrations
+from django.db.models import Count, F, Max, Min, Sum
+
+
+def backfill(apps, schema_editor):
+    # Таблицы из 0008 создаются пустыми, а сигналы учитывают только новые оценки.
+    # Считаем сводки по историческим моделям — как score_summaries.rebuild().
+    db = schema_editor.connection.alias
+    Assessment = apps.get_model('session_controller', 'Assessment')
+    Evaluator = apps.get_model('session_controller', 'Evaluator')
+    SessionCompetency = apps.get_model('session_controller', 'SessionCompetency')
+    SessionScoreSummary = apps.get_model('session_controller', 'SessionScoreSummary')
+    SessionCompetencyScoreSummary = apps.get_model('session_controller', 'SessionCompetencyScoreSummary')
+
+    stats = {
+        'count': Count('id'),
+        'total': Sum('score'),
+        'sum_squares': Sum(F('score') * F('score')),
+        'min_score': Min('score'),
+        'max_score': Max('score'),
+    }
+    assessments = Assessment.objects.using(db).order_by()
+    sessions = defaultdict(dict)
+    for row in assessments.values('session_id').annotate(**stats):
+        sessions[row.pop('session_id')].update(row)
+    for model, field in ((Evaluator, 'evaluator_count'), (SessionCompetency, 'competency_count')):
+        for row in model.objects.using(db).order_by().values('session_id').annotate(n=Count('id')):
+            sessions[row['session_id']][field] = row['n']
+
+    SessionScoreSummary.objects.using(db).all().delete()
+    SessionCompetencyScoreSummary.objects.using(db).all().delete()
+    SessionScoreSummary.objects.using(db).bulk_create(
+        [SessionScoreSummary(session_id=session_id, **row) for session_id, row in sessions.items()],
+        batch_size=500)
+    SessionCompetencyScoreSummary.objects.using(db).bulk_create(
+        [SessionCompetencyScoreSummary(**row) for row in
+         assessments.values('session_id', 'competency_id').annotate(**stats).iterator(chunk_size=2000)],
+        batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('session_controller', '0015_searchdocument_backfill'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -12,10 +12,88 @@ class VisitLog(models.Model):
     method = models.CharField(max_length=10)
     timestamp = models.DateTimeField()
 
+    class Meta:
+        # Под постраничный просмотр по ключу (timestamp, id), в том числе по одному пользователю
+        indexes = [
+            models.Index(fields=['timestamp', 'id'], name='visitlog_ts_id_idx'),
+            models.Index(fields=['user', 'timestamp', 'id'], name='visitlog_user_ts_id_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} visited {self.path} on {self.timestamp}"
 
 
+class VisitPath(models.Model):
+    """
+    Словарь путей: в агрегатах хранится целочисленный ключ вместо строки.
+    """
+    path = models.CharField(max_length=255, unique=True)
+
+    def __str__(self):
+        return self.path
+
+
+VISIT_ROLLUP_PERIODS = [('hour', 'Час'), ('day', 'День')]
+
+
+class VisitRollup(models.Model):
+    period = models.CharField(max_length=4, choices=VISIT_ROLLUP_PERIODS)
+    bucket = models.DateTimeField()
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="visit_rollups")
+    path = models.ForeignKey(
+        VisitPath, on_delete=models.CASCADE, related_name="rollups")
+    method = models.CharField(max_length=10)
+    hits = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('period', 'bucket', 'user', 'path', 'method')
+        indexes = [models.Index(fields=['period', 'bucket'])]
+
+    def __str__(self):
+        return f"{self.period} {self.bucket}: {self.user_id} {self.method} {self.path_id} x{self.hits}"
+
+
+class VisitRollupCheckpoint(models.Model):
+    """
+    До какого VisitLog.id сырые логи уже учтены в агрегатах.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.last_id}"
+
+
+class ArchiveCheckpoint(models.Model):
+    """
+    Состояние архивации (session_controller/archive.py): сессии, уже записанные
+    в архивный файл, но ещё не удалённые из базы.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    pending = models.JSONField(default=list, blank=True)
+    pending_file = models.CharField(max_length=255, blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.last_id} (ожидают удаления: {len(self.pending)})"
+
+
+class ReminderDispatch(models.Model):
+    """
+    Последнее напоминание оценщику (session_controller/reminders.py) — для защиты от повторов между запусками.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="reminder_dispatch")
+    sent_at = models.DateTimeField()
+    missing_count = models.PositiveIntegerField(default=0)
+    fingerprint = models.CharField(max_length=40, blank=True, default='')
+
+    def __str__(self):
+        return f"{self.user_id}: {self.sent_at:%Y-%m-%d %H:%M} ({self.missing_count})"
+
+
 ROLES = [('employee', 'Employee'), ('team_lead', 'Team Lead'),
          ('hr_manager', 'HR Manager')]
 
@@ -33,6 +111,11 @@ class Profile(models.Model):
     portfolio = models.URLField(max_length=500, blank=True, null=True)
     projects = models.ManyToManyField(
         'Project', related_name='profiles', blank=True)
+    # Пути к миниатюрам аватара с хэшем содержимого в имени (avatars.py)
+    avatar_derivatives = models.JSONField(default=dict, blank=True, editable=False)
+    # Отпечаток строки справочника сотрудников при последней синхронизации (hris_sync.py)
+    directory_fingerprint = models.CharField(max_length=40, blank=True, default='', editable=False)
+    history = HistoricalRecords()
 
     def clean_email(self):
         email = self.email.strip().lower()
@@ -124,6 +207,64 @@ class Assessment(models.Model):
         return f"Сессия: {self.session.title}, Компетенция: {self.competency.name}, Оценщик: {self.evaluator.username}"
 
 
+class ScoreSummary(models.Model):
+    """
+    Накопленная статистика оценок: среднее и дисперсия считаются без обращения к Assessment.
+    """
+    count = models.PositiveIntegerField(default=0)
+    total = models.BigIntegerField(default=0)
+    sum_squares = models.BigIntegerField(default=0)
+    min_score = models.PositiveSmallIntegerField(blank=True, null=True)
+    max_score = models.PositiveSmallIntegerField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def average(self):
+        return self.total / self.count if self.count else None
+
+    @property
+    def variance(self):
+        if not self.count:
+            return None
+        mean = self.total / self.count
+        return max(self.sum_squares / self.count - mean * mean, 0.0)
+
+
+class SessionScoreSummary(ScoreSummary):
+    session = models.OneToOneField(
+        Session, on_delete=models.CASCADE, related_name="score_summary")
+    evaluator_count = models.PositiveIntegerField(default=0)
+    competency_count = models.PositiveIntegerField(default=0)
+
+    @property
+    def expected_count(self):
+        return self.evaluator_count * self.competency_count
+
+    @property
+    def completion(self):
+        expected = self.expected_count
+        return min(self.count / expected, 1.0) if expected else None
+
+    def __str__(self):
+        return f"Сессия {self.session_id}: {self.count} оценок"
+
+
+class SessionCompetencyScoreSummary(ScoreSummary):
+    session = models.ForeignKey(
+        Session, on_delete=models.CASCADE, related_name="competency_score_summaries")
+    competency = models.ForeignKey(
+        Competency, on_delete=models.CASCADE, related_name="score_summaries")
+
+    class Meta:
+        unique_together = ('session', 'competency')
+
+    def __str__(self):
+        return f"Сессия {self.session_id}, компетенция {self.competency_id}: {self.count} оценок"
+
+
 class Evaluator(models.Model):
     session = models.ForeignKey(
         Session, on_delete=models.CASCADE, related_name="evaluators")
@@ -149,3 +290,28 @@ class Project(models.Model):
     class Meta:
         verbose_name = 'Проект'
         verbose_name_plural = 'Проекты'
+
+
+SEARCH_KINDS = (
+    ('session', 'Сессия'),
+    ('project', 'Проект'),
+    ('competency', 'Компетенция'),
+)
+
+
+class SearchDocument(models.Model):
+    """
+    Документ поискового индекса (session_controller/search.py). Полнотекстовый индекс
+    строится по title и body средствами СУБД и создаётся миграцией.
+    """
+    kind = models.CharField(max_length=20, choices=SEARCH_KINDS)
+    object_id = models.PositiveIntegerField()
+    title = models.CharField(max_length=255)
+    body = models.TextField(blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('kind', 'object_id')
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}: {self.title}"
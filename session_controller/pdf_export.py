@@ -0,0 +1,228 @@
+"""
+Фоновая генерация PDF-резюме профилей средствами reportlab.
+
+PDF каждого профиля кэшируется на диске под хэшем своего содержимого, поэтому
+неизменившиеся профили повторно не рисуются. Недостающие PDF рисуются
+параллельно в нескольких процессах billiard (обычный multiprocessing нельзя
+запускать из демонических процессов воркера Celery), результат
+собирается в zip.
+
+И кэш, и архивы лежат в закрытом каталоге PDF_EXPORT['DIR'] вне MEDIA_ROOT:
+архив скачивается через админку (ProfileAdmin), а через OUTPUT_MAX_AGE_HOURS
+его удаляет задача prune_pdf_exports.
+"""
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+import zipfile
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from django.utils.timezone import now
+
+from .models import ROLES, Profile
+
+# Меняется вместе с разметкой страницы — старый кэш при этом перестаёт совпадать
+LAYOUT_VERSION = 2
+FIELDS = ('id', 'user__username', 'full_name', 'department', 'role', 'hire_date', 'avatar_derivatives')
+ROLE_NAMES = dict(ROLES)
+FONT_NAME = 'ResumeFont'
+AVATAR_VARIANT = 'large_jpeg'
+AVATAR_SIZE = 100  # пунктов на странице
+ARCHIVE_NAME_RE = re.compile(r'^resumes-[\w-]+\.zip$')
+
+
+def pdf_settings(name):
+    return settings.PDF_EXPORT[name]
+
+
+def profile_payloads(profile_ids):
+    """
+    Метод для выборки данных профилей одним запросом, в порядке id.
+    """
+    rows = Profile.objects.filter(id__in=profile_ids).order_by('id').values_list(*FIELDS)
+    return [{
+        'id': profile_id,
+        'username': username,
+        'full_name': full_name or '',
+        'department': department or '',
+        'role': ROLE_NAMES.get(role, role),
+        'hire_date': hire_date.isoformat() if hire_date else '',
+        # Имя миниатюры содержит хэш изображения, поэтому смена аватара меняет и хэш PDF
+        'avatar': (derivatives or {}).get(AVATAR_VARIANT, ''),
+    } for profile_id, username, full_name, department, role, hire_date, derivatives in rows]
+
+
+def content_hash(payload):
+    data = dict(payload, layout=LAYOUT_VERSION)
+    data.pop('id')
+    return hashlib.sha1(json.dumps(data, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+
+def cache_path(digest):
+    return os.path.join(pdf_settings('DIR'), pdf_settings('CACHE_DIR'), digest[:2], f'{digest}.pdf')
+
+
+def _register_font(font_path):
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    if FONT_NAME in pdfmetrics.getRegisteredFontNames():
+        return FONT_NAME
+    if font_path and os.path.exists(font_path):
+        # Встроенные шрифты reportlab не содержат кириллицы
+        pdfmetrics.registerFont(TTFont(FONT_NAME, font_path))
+        return FONT_NAME
+    return 'Helvetica'
+
+
+def render_pdf(payload, path, font_path):
+    """
+    Метод для отрисовки PDF одного профиля в файл. Запускается в процессах пула.
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    font = _register_font(font_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = f'{path}.{os.getpid()}.part'
+
+    pdf = canvas.Canvas(partial, pagesize=A4, invariant=1)
+    pdf.setTitle(f"Резюме: {payload['username']}")
+    _, height = A4
+    pdf.setFont(font, 16)
+    pdf.drawString(50, height - 60, f"Профиль пользователя: {payload['username']}")
+    pdf.setFont(font, 12)
+    lines = [
+        ('Полное имя', payload['full_name']),
+        ('Отдел', payload['department']),
+        ('Роль', payload['role']),
+        ('Дата найма', payload['hire_date']),
+    ]
+    for index, (label, value) in enumerate(lines):
+        pdf.drawString(50, height - 100 - index * 22, f"{label}: {value or '—'}")
+    if payload['avatar']:
+        pdf.drawImage(default_storage.path(payload['avatar']), A4[0] - 50 - AVATAR_SIZE,
+                      height - 40 - AVATAR_SIZE, AVATAR_SIZE, AVATAR_SIZE)
+    pdf.showPage()
+    pdf.save()
+    os.replace(partial, path)
+    return path
+
+
+def _render_batch(jobs):
+    for job in jobs:
+        render_pdf(*job)
+
+
+class PDFExportError(Exception):
+    pass
+
+
+def ensure_pdfs(payloads):
+    """
+    Метод для получения путей к PDF профилей: из кэша или отрисовкой недостающих в нескольких процессах.
+    Возвращает (список (payload, путь), число отрисованных).
+    """
+    font_path = pdf_settings('FONT_PATH')
+    paths, missing, queued = [], [], set()
+    for payload in payloads:
+        path = cache_path(content_hash(payload))
+        paths.append((payload, path))
+        if os.path.exists(path):
+            # Отметка использования — по ней prune_cache удаляет давно не нужные файлы
+            os.utime(path)
+        elif path not in queued:
+            queued.add(path)
+            missing.append((payload, path, font_path))
+
+    processes = min(pdf_settings('PROCESSES') or os.cpu_count() or 1, len(missing))
+    if processes > 1:
+        from billiard import Process
+
+        # Результаты пишутся сразу в кэш на диске, обратно в родителя ничего не передаётся
+        workers = [Process(target=_render_batch, args=(missing[index::processes],)) for index in range(processes)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        failed = [worker.exitcode for worker in workers if worker.exitcode]
+        if failed:
+            raise PDFExportError(f"Процессы отрисовки PDF завершились с ошибкой: {failed}")
+    else:
+        _render_batch(missing)
+    return paths, len(missing)
+
+
+def output_path():
+    """
+    Метод для выбора имени архива заранее, чтобы ссылку можно было отдать до окончания задачи.
+    Возвращает (имя архива, ссылку на скачивание в админке).
+    """
+    name = f"resumes-{now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}.zip"
+    return name, reverse('admin:session_controller_profile_resume_archive', args=[name])
+
+
+def archive_path(name):
+    return os.path.join(pdf_settings('DIR'), pdf_settings('OUTPUT_DIR'), name)
+
+
+def stored_archive(name):
+    """
+    Метод для поиска готового архива; None, если его нет, он не дописан или устарел.
+    """
+    if not ARCHIVE_NAME_RE.match(name):
+        return None
+    path = archive_path(name)
+    max_age = pdf_settings('OUTPUT_MAX_AGE_HOURS') * 60 * 60
+    if not os.path.isfile(path) or os.path.getmtime(path) < time.time() - max_age:
+        return None
+    return path
+
+
+def build_archive(profile_ids, name):
+    """
+    Метод для сборки zip с PDF выбранных профилей. Возвращает счётчики.
+    """
+    paths, rendered = ensure_pdfs(profile_payloads(profile_ids))
+    target = archive_path(os.path.basename(name))
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    partial = target + '.part'
+    # PDF уже сжат — храним без повторного сжатия
+    with zipfile.ZipFile(partial, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for payload, path in paths:
+            archive.write(path, f"{payload['username']}.pdf")
+    os.replace(partial, target)
+    return {'profiles': len(paths), 'rendered': rendered, 'cached': len(paths) - rendered}
+
+
+def _prune(root, max_age_seconds):
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    for directory, _, files in os.walk(root):
+        for name in files:
+            path = os.path.join(directory, name)
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+    return removed
+
+
+def prune_cache(max_age_days=None):
+    """
+    Метод для удаления PDF из кэша, которые не использовались дольше срока.
+    """
+    max_age_days = max_age_days or pdf_settings('CACHE_MAX_AGE_DAYS')
+    return _prune(os.path.join(pdf_settings('DIR'), pdf_settings('CACHE_DIR')), max_age_days * 24 * 60 * 60)
+
+
+def prune_archives(max_age_hours=None):
+    """
+    Метод для удаления архивов (и недописанных файлов) старше срока хранения.
+    """
+    max_age_hours = max_age_hours or pdf_settings('OUTPUT_MAX_AGE_HOURS')
+    return _prune(os.path.join(pdf_settings('DIR'), pdf_settings('OUTPUT_DIR')), max_age_hours * 60 * 60)
@@ -0,0 +1,195 @@
+"""
+Предвычисленные модели чтения для дорогих страниц и действий API.
+
+Модель чтения — функция, строящая данные страницы целиком, и список моделей,
+от которых эти данные зависят. Результат лежит в кэше под ключом с версиями
+этих моделей (cache_utils.py), поэтому запись делает его недостижимым, а
+новый строится заранее, а не первым пользователем:
+
+* после записи — отложенной задачей refresh_read_models (signals.py);
+* раз в минуту — задачей refresh-read-models из CELERY_BEAT_SCHEDULE для
+  всех холодных и устаревших моделей (страховка от записей мимо сигналов);
+* по расписанию каждой модели — периодической задачей django_celery_beat
+  «read-model:<имя>», интервал которой можно менять в админке;
+* после выкладки — командой warm_read_models.
+
+Модели чтения — для небольших агрегатов: большой список пришлось бы целиком
+читать из кэша на каждой странице, такие данные отдаются постранично запросом.
+
+Для каждой модели в кэше хранятся время и длительность последней сборки;
+метрики отдаются в /metrics/.
+"""
+import json
+import logging
+import time
+from typing import Callable, NamedTuple, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from .cache_utils import get_or_build, model_label, versions_key
+from .db_router import use_primary
+from .models import Competency, SessionCompetency
+from .tasks import refresh_read_models
+
+logger = logging.getLogger(__name__)
+
+KEY = 'read_model:{}:{}'
+META_KEY = 'read_model_meta:{}'
+REFRESH_LOCK = 'read_models:refresh_scheduled'
+TASK_NAME = 'read-model:{}'
+# Если задача прогрева потерялась, следующий прогрев после записи будет поставлен не позже чем через минуту
+REFRESH_LOCK_TIMEOUT = 60
+
+
+class ReadModel(NamedTuple):
+    name: str
+    build: Callable
+    # Модели, от которых зависят данные; их версии входят в ключ кэша
+    models: Tuple
+
+
+REGISTRY = {}
+
+
+def read_model_settings(name):
+    return settings.READ_MODELS[name]
+
+
+def register(name, models):
+    def decorator(build):
+        REGISTRY[name] = ReadModel(name, build, tuple(models))
+        return build
+    return decorator
+
+
+@register('top_competencies', (Competency, SessionCompetency))
+def build_top_competencies():
+    """
+    Метод для сборки самых используемых компетенций для главной страницы.
+    """
+    return list(Competency.objects.annotate(session_count=Count('sessions_set')).order_by(
+        '-session_count').values('id', 'name', 'session_count')[:5])
+
+
+def cache_key(read_model):
+    return KEY.format(read_model.name, versions_key(read_model.models))
+
+
+def _build(read_model, key):
+    started = time.perf_counter()
+    # Ключ содержит версии на момент записи в default; данные из отстающей реплики легли бы под него устаревшими
+    with use_primary():
+        value = read_model.build()
+    meta = {
+        'key': key,
+        'built_at': time.time(),
+        'build_ms': round((time.perf_counter() - started) * 1000, 1),
+        'size': len(value) if hasattr(value, '__len__') else None,
+    }
+    cache.set(META_KEY.format(read_model.name), meta, None)
+    return value, meta
+
+
+def get(name):
+    """
+    Метод для получения данных модели чтения; при промахе данные строятся один раз для всех ждущих.
+    """
+    read_model = REGISTRY[name]
+    key = cache_key(read_model)
+    return get_or_build(key, lambda: _build(read_model, key)[0], read_model_settings('TIMEOUT'))
+
+
+def rebuild(name):
+    """
+    Метод для принудительной сборки модели чтения. Возвращает длительность сборки, мс.
+    """
+    read_model = REGISTRY[name]
+    # Версии берём до чтения данных: запись во время сборки даст новый ключ, а не устаревшие данные под ним
+    key = cache_key(read_model)
+    value, meta = _build(read_model, key)
+    cache.set(key, value, read_model_settings('TIMEOUT'))
+    return meta['build_ms']
+
+
+def refresh(force=False):
+    """
+    Метод для сборки холодных моделей (ключа с текущими версиями нет в кэше) или всех при force.
+    Возвращает {имя: длительность сборки, мс} для собранных моделей.
+    """
+    # Записи с этого момента поставят новую задачу: текущая может их уже не увидеть
+    cache.delete(REFRESH_LOCK)
+    rebuilt = {}
+    for name, read_model in REGISTRY.items():
+        if force or cache.get(cache_key(read_model)) is None:
+            try:
+                rebuilt[name] = rebuild(name)
+            except Exception:
+                # Одна сломанная модель не мешает прогреву остальных
+                logger.exception("Не удалось собрать модель чтения %s", name)
+    return rebuilt
+
+
+def changed(model):
+    """
+    Метод для отложенного прогрева моделей, зависящих от изменённой модели; вызывается после коммита.
+    Записи до начала прогрева обрабатываются одной задачей.
+    """
+    label = model_label(model)
+    if not any(label in map(model_label, read_model.models) for read_model in REGISTRY.values()):
+        return
+    delay = read_model_settings('REFRESH_DELAY')
+    if not cache.add(REFRESH_LOCK, 1, REFRESH_LOCK_TIMEOUT):
+        return
+    try:
+        refresh_read_models.apply_async(countdown=delay)
+    except Exception:
+        # Без брокера запись не должна падать; модель соберёт первый запрос или минутная задача
+        cache.delete(REFRESH_LOCK)
+        logger.warning("Не удалось поставить прогрев моделей чтения", exc_info=True)
+
+
+def stats():
+    """
+    Метод для метрик моделей чтения: прогрета ли, сколько секунд назад и за сколько собрана.
+    """
+    metas = cache.get_many([META_KEY.format(name) for name in REGISTRY])
+    current = time.time()
+    result = {}
+    for name, read_model in REGISTRY.items():
+        key = cache_key(read_model)
+        meta = metas.get(META_KEY.format(name)) or {}
+        result[name] = {
+            'warm': cache.get(key) is not None,
+            # Последняя сборка была для других версий моделей — данные устарели
+            'outdated': bool(meta) and meta['key'] != key,
+            'age_seconds': round(current - meta['built_at'], 1) if meta else None,
+            'build_ms': meta.get('build_ms'),
+            'size': meta.get('size'),
+        }
+    return result
+
+
+def sync_schedules():
+    """
+    Метод для создания периодических задач django_celery_beat по одной на модель чтения.
+    Уже существующие задачи не трогаются: их интервал мог быть изменён в админке;
+    задачи удалённых моделей удаляются.
+    """
+    from django_celery_beat.models import IntervalSchedule, PeriodicTask
+
+    schedule, _ = IntervalSchedule.objects.get_or_create(
+        every=read_model_settings('INTERVAL'), period=IntervalSchedule.SECONDS)
+    created = []
+    for name in REGISTRY:
+        _, is_new = PeriodicTask.objects.get_or_create(name=TASK_NAME.format(name), defaults={
+            'interval': schedule,
+            'task': 'session_controller.tasks.rebuild_read_model',
+            'args': json.dumps([name]),
+        })
+        if is_new:
+            created.append(name)
+    PeriodicTask.objects.filter(task='session_controller.tasks.rebuild_read_model').exclude(
+        name__in=[TASK_NAME.format(name) for name in REGISTRY]).delete()
+    return created
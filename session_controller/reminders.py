@@ -0,0 +1,161 @@
+"""
+Кампания напоминаний оценщикам о незаполненных оценках.
+
+Кому напоминать, определяет один запрос: пары (оценщик, компетенция) активных
+сессий, для которых нет Assessment (NOT EXISTS по уникальному индексу
+session/competency/evaluator). Оценщики, которым уже напоминали за последние
+MIN_INTERVAL_HOURS, отсекаются там же; если набор пропусков не изменился с прошлого
+письма (совпал fingerprint), тот же дайджест повторяется только через
+REPEAT_UNCHANGED_DAYS. Каждый оценщик получает одно письмо со списком всех своих
+пропусков, письма уходят через одно SMTP-соединение с ограничением скорости, а факт
+отправки сразу записывается в ReminderDispatch.
+"""
+import hashlib
+import time
+from datetime import timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Exists, F, OuterRef
+from django.utils.timezone import now
+
+from .models import Assessment, Evaluator, ReminderDispatch
+
+SUBJECT = 'Напоминание: заполните оценки 360'
+COLUMNS = ('evaluator_id', 'evaluator__username', 'evaluator__email', 'session_id', 'session__title',
+           'competency_name')
+
+
+def reminder_settings(name):
+    return settings.REMINDERS[name]
+
+
+def missing_assessments(min_interval_hours=None):
+    """
+    Метод для выборки недостающих оценок одним запросом, упорядоченно по оценщику.
+    """
+    hours = reminder_settings('MIN_INTERVAL_HOURS') if min_interval_hours is None else min_interval_hours
+    # Компетенция сессии — одна аннотация: все ссылки на неё идут через один JOIN
+    # и дают ровно одну строку на пару (оценщик, компетенция)
+    pairs = Evaluator.objects.annotate(
+        competency_id=F('session__session_competencies__competency_id'),
+        competency_name=F('session__session_competencies__competency__name'),
+    )
+    done = Assessment.objects.filter(
+        session_id=OuterRef('session_id'),
+        evaluator_id=OuterRef('evaluator_id'),
+        competency_id=OuterRef('competency_id'),
+    )
+    recently_reminded = ReminderDispatch.objects.filter(
+        user_id=OuterRef('evaluator_id'), sent_at__gte=now() - timedelta(hours=hours))
+    return pairs.filter(
+        session__is_active=True,
+        competency_id__isnull=False,
+        evaluator__is_active=True,
+    ).exclude(evaluator__email='').filter(~Exists(done), ~Exists(recently_reminded)).order_by(
+        'evaluator_id', 'session_id', 'competency_name').values_list(*COLUMNS)
+
+
+def digests(rows):
+    """
+    Метод для группировки строк в дайджесты: (id, username, email, {(id сессии, название): [компетенции]}).
+    """
+    for (user_id, username, email), user_rows in groupby(rows, key=lambda row: row[:3]):
+        sessions = {}
+        for _, _, _, session_id, title, competency in user_rows:
+            sessions.setdefault((session_id, title), []).append(competency)
+        yield user_id, username, email, sessions
+
+
+def render(username, sessions):
+    limit = reminder_settings('MAX_SESSIONS_IN_DIGEST')
+    lines = [f"Здравствуйте, {username}!", "", "Остались незаполненные оценки:", ""]
+    for (_, title), competencies in list(sessions.items())[:limit]:
+        lines.append(f"• {title}: {', '.join(competencies)}")
+    if len(sessions) > limit:
+        lines.append(f"…и ещё сессий: {len(sessions) - limit}")
+    lines += ["", "Пожалуйста, заполните их в системе оценки 360."]
+    return '\n'.join(lines)
+
+
+def fingerprint(sessions):
+    pairs = sorted((session_id, competency) for (session_id, _), names in sessions.items() for competency in names)
+    return hashlib.sha1(repr(pairs).encode()).hexdigest()
+
+
+def previous_dispatches(user_ids):
+    """
+    Метод для выборки прошлых отметок об отправке: {id оценщика: (fingerprint, sent_at)}.
+    """
+    return {user_id: (value, sent_at) for user_id, value, sent_at in ReminderDispatch.objects.filter(
+        user_id__in=user_ids).values_list('user_id', 'fingerprint', 'sent_at')}
+
+
+def record(dispatches):
+    if dispatches:
+        ReminderDispatch.objects.bulk_create(
+            dispatches, update_conflicts=True, unique_fields=['user'],
+            update_fields=['sent_at', 'missing_count', 'fingerprint'])
+
+
+def send_reminders(limit=None, dry_run=False, connection=None):
+    """
+    Метод для рассылки дайджестов всем оценщикам с пропусками за один запуск. Возвращает счётчики.
+    """
+    rate = reminder_settings('RATE_PER_SECOND')
+    batch_size = reminder_settings('BATCH_SIZE')
+    repeat_after = timedelta(days=reminder_settings('REPEAT_UNCHANGED_DAYS'))
+    stats = {'evaluators': 0, 'sent': 0, 'failed': 0, 'missing': 0, 'unchanged': 0}
+    pending = []
+    interval = 1.0 / rate if rate else 0
+    next_at = time.monotonic()
+
+    connection = connection or get_connection(fail_silently=False)
+    # Выборку читаем целиком до отправки: во время рассылки пишем в ReminderDispatch, который она же проверяет
+    rows = list(missing_assessments())
+    previous = previous_dispatches({row[0] for row in rows})
+    try:
+        if not dry_run:
+            # Одно соединение на всю рассылку; send_messages его не закрывает
+            connection.open()
+        for user_id, username, email, sessions in digests(rows):
+            if limit and stats['evaluators'] >= limit:
+                break
+            digest_print = fingerprint(sessions)
+            last_print, last_sent_at = previous.get(user_id, ('', None))
+            if last_print == digest_print and last_sent_at >= now() - repeat_after:
+                # С прошлого письма ничего не изменилось — не повторяем тот же дайджест
+                stats['unchanged'] += 1
+                continue
+            missing = sum(len(names) for names in sessions.values())
+            stats['evaluators'] += 1
+            stats['missing'] += missing
+            if dry_run:
+                continue
+
+            delay = next_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            next_at = max(next_at, time.monotonic()) + interval
+            message = EmailMessage(SUBJECT, render(username, sessions), settings.DEFAULT_FROM_EMAIL, [email],
+                                   connection=connection)
+            try:
+                connection.send_messages([message])
+            except Exception:
+                # Одно недоставленное письмо не останавливает кампанию; оценщик получит его в следующий запуск
+                stats['failed'] += 1
+                connection.close()
+                connection.open()
+                continue
+            stats['sent'] += 1
+            pending.append(ReminderDispatch(user_id=user_id, sent_at=now(), missing_count=missing,
+                                            fingerprint=digest_print))
+            if len(pending) >= batch_size:
+                record(pending)
+                pending = []
+    finally:
+        record(pending)
+        if not dry_run:
+            connection.close()
+    return stats
@@ -0,0 +1,82 @@
+"""
+Роль и права текущего пользователя для проверок доступа.
+
+Контекст вычисляется один раз на запрос (запоминается на объекте
+пользователя) и хранится в общем кэше под ключом role:<user_id>. При
+сохранении или удалении Profile запись сбрасывается (см. signals.py),
+поэтому проверки роли обычно не стоят ни одного SQL-запроса.
+"""
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .instrumentation import record_cache
+from .models import Profile
+
+ROLE_KEY = 'role:{}'
+HR_MANAGER = 'hr_manager'
+TEAM_LEAD = 'team_lead'
+
+
+class RoleContext(NamedTuple):
+    profile_id: Optional[int]
+    role: Optional[str]
+    is_active: bool
+    is_superuser: bool = False
+
+    @property
+    def has_profile(self):
+        return self.profile_id is not None
+
+    @property
+    def is_hr_manager(self):
+        return self.role == HR_MANAGER
+
+    @property
+    def is_team_lead(self):
+        return self.role == TEAM_LEAD
+
+
+ANONYMOUS = RoleContext(profile_id=None, role=None, is_active=False)
+
+
+def role_key(user_id):
+    return ROLE_KEY.format(user_id)
+
+
+def _load(user):
+    row = Profile.objects.filter(user_id=user.pk).values('id', 'role', 'is_active').first()
+    if row is None:
+        # Отсутствие профиля тоже кэшируем: создание профиля сбросит запись
+        return RoleContext(profile_id=None, role=None, is_active=False)
+    return RoleContext(profile_id=row['id'], role=row['role'], is_active=row['is_active'])
+
+
+def get_role_context(user):
+    """
+    Метод для получения роли пользователя: сначала с объекта запроса, затем из кэша, затем из базы.
+    """
+    if user is None or not user.is_authenticated:
+        return ANONYMOUS
+    context = getattr(user, '_role_context', None)
+    if context is not None:
+        return context
+
+    key = role_key(user.pk)
+    context = cache.get(key)
+    record_cache(context is not None)
+    if context is None:
+        context = _load(user)
+        cache.set(key, context, settings.ROLE_CACHE_TIMEOUT)
+    # Флаг суперпользователя уже есть на объекте — в кэше его не держим
+    context = context._replace(is_superuser=user.is_superuser)
+    user._role_context = context
+    return context
+
+
+def invalidate(user_ids):
+    """
+    Метод для сброса закэшированных ролей (в том числе после массовых изменений профилей без сигналов).
+    """
+    cache.delete_many([role_key(user_id) for user_id in user_ids])
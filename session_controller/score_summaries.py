@@ -0,0 +1,217 @@
+"""
+Инкрементальное сопровождение сводок оценок по сессиям и по (сессия, компетенция).
+
+Каждое изменение Assessment превращается в дельту: добавленные и удалённые
+баллы по группе. Счётчики меняются атомарно через F-выражения, минимум и
+максимум при удалении пересчитываются подзапросом только по своей группе.
+"""
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, Max, Min, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+
+from .models import (Assessment, Evaluator, SessionCompetency,
+                     SessionCompetencyScoreSummary, SessionScoreSummary)
+
+_state = threading.local()
+
+STAT_FIELDS = ('count', 'total', 'sum_squares', 'min_score', 'max_score')
+SCORE_SUMMARY_FIELDS = ('count', 'total', 'sum_squares', 'min_score', 'max_score',
+                        'evaluator_count', 'competency_count')
+
+
+def score_summary_data(summary):
+    if summary is None:
+        return {'average_score': None, 'variance': None, 'min_score': None, 'max_score': None,
+                'assessment_count': 0, 'completion': None}
+    data = {
+        'average_score': summary.average,
+        'variance': summary.variance,
+        'min_score': summary.min_score,
+        'max_score': summary.max_score,
+        'assessment_count': summary.count,
+    }
+    if hasattr(summary, 'completion'):
+        data['completion'] = summary.completion
+    return data
+
+
+@contextmanager
+def suspended():
+    """
+    Отключает обработчики сигналов (для массовых операций, которые сами
+    обновляют или пересобирают сводки).
+    """
+    previous = getattr(_state, 'suspended', False)
+    _state.suspended = True
+    try:
+        yield
+    finally:
+        _state.suspended = previous
+
+
+def is_suspended():
+    return getattr(_state, 'suspended', False)
+
+
+def _extreme_subquery(aggregate, **group):
+    scores = Assessment.objects.filter(**{
+        name: OuterRef(name) for name in group
+    }).order_by().values(*group).annotate(value=aggregate('score')).values('value')
+    return Subquery(scores, output_field=IntegerField())
+
+
+def _apply_group(model, group, added, removed):
+    changes = {
+        'count': F('count') + (len(added) - len(removed)),
+        'total': F('total') + (sum(added) - sum(removed)),
+        'sum_squares': F('sum_squares') + (sum(s * s for s in added) - sum(s * s for s in removed)),
+    }
+    if removed:
+        # Удалённый балл мог быть крайним — берём крайние значения из самой группы
+        changes['min_score'] = _extreme_subquery(Min, **group)
+        changes['max_score'] = _extreme_subquery(Max, **group)
+    elif added:
+        low, high = Value(min(added)), Value(max(added))
+        changes['min_score'] = Least(Coalesce(F('min_score'), low), low)
+        changes['max_score'] = Greatest(Coalesce(F('max_score'), high), high)
+    model.objects.filter(**group).update(**changes)
+
+
+def apply_scores(added=(), removed=()):
+    """
+    Применяет изменения оценок к сводкам.
+    added/removed — итерируемые (session_id, competency_id, score).
+    """
+    by_session = defaultdict(lambda: ([], []))
+    by_competency = defaultdict(lambda: ([], []))
+    for index, rows in enumerate((added, removed)):
+        for session_id, competency_id, score in rows:
+            by_session[session_id][index].append(score)
+            by_competency[(session_id, competency_id)][index].append(score)
+
+    # Строки сводок создаются по первой добавленной оценке группы
+    new_sessions = [key for key, (plus, _) in by_session.items() if plus]
+    SessionScoreSummary.objects.bulk_create(
+        [SessionScoreSummary(session_id=session_id) for session_id in new_sessions],
+        ignore_conflicts=True)
+    new_pairs = [key for key, (plus, _) in by_competency.items() if plus]
+    SessionCompetencyScoreSummary.objects.bulk_create(
+        [SessionCompetencyScoreSummary(session_id=session_id, competency_id=competency_id)
+         for session_id, competency_id in new_pairs],
+        ignore_conflicts=True)
+
+    for session_id, (plus, minus) in by_session.items():
+        _apply_group(SessionScoreSummary, {'session_id': session_id}, plus, minus)
+    for (session_id, competency_id), (plus, minus) in by_competency.items():
+        _apply_group(SessionCompetencyScoreSummary,
+                     {'session_id': session_id, 'competency_id': competency_id}, plus, minus)
+
+
+def refresh_participants(session_id, create=True):
+    """
+    Обновляет число оценщиков и компетенций сессии (для доли заполнения).
+    """
+    counts = {
+        'evaluator_count': Evaluator.objects.filter(session_id=session_id).count(),
+        'competency_count': SessionCompetency.objects.filter(session_id=session_id).count(),
+    }
+    updated = SessionScoreSummary.objects.filter(session_id=session_id).update(**counts)
+    if not updated and create:
+        SessionScoreSummary.objects.bulk_create(
+            [SessionScoreSummary(session_id=session_id, **counts)], ignore_conflicts=True)
+
+
+def _compute(session_ids=None):
+    assessments = Assessment.objects.order_by()
+    if session_ids is not None:
+        assessments = assessments.filter(session_id__in=session_ids)
+    stats = {
+        'count': Count('id'),
+        'total': Sum('score'),
+        'sum_squares': Sum(F('score') * F('score')),
+        'min_score': Min('score'),
+        'max_score': Max('score'),
+    }
+    per_session = {
+        row.pop('session_id'): row
+        for row in assessments.values('session_id').annotate(**stats)
+    }
+    per_competency = {
+        (row.pop('session_id'), row.pop('competency_id')): row
+        for row in assessments.values('session_id', 'competency_id').annotate(**stats)
+    }
+
+    participants = defaultdict(lambda: {'evaluator_count': 0, 'competency_count': 0})
+    for model, field in ((Evaluator, 'evaluator_count'), (SessionCompetency, 'competency_count')):
+        rows = model.objects.order_by()
+        if session_ids is not None:
+            rows = rows.filter(session_id__in=session_ids)
+        for row in rows.values('session_id').annotate(n=Count('id')):
+            participants[row['session_id']][field] = row['n']
+
+    sessions = {}
+    for session_id in set(per_session) | set(participants):
+        row = dict(per_session.get(session_id, {}))
+        row.update(participants[session_id])
+        sessions[session_id] = row
+    return sessions, per_competency
+
+
+def rebuild(session_ids=None):
+    """
+    Пересобирает сводки с нуля (по всем или по указанным сессиям).
+    """
+    sessions, per_competency = _compute(session_ids)
+    with transaction.atomic():
+        session_summaries = SessionScoreSummary.objects.all()
+        competency_summaries = SessionCompetencyScoreSummary.objects.all()
+        if session_ids is not None:
+            session_summaries = session_summaries.filter(session_id__in=session_ids)
+            competency_summaries = competency_summaries.filter(session_id__in=session_ids)
+        session_summaries.delete()
+        competency_summaries.delete()
+        SessionScoreSummary.objects.bulk_create(
+            [SessionScoreSummary(session_id=session_id, **row) for session_id, row in sessions.items()],
+            batch_size=500)
+        SessionCompetencyScoreSummary.objects.bulk_create(
+            [SessionCompetencyScoreSummary(session_id=session_id, competency_id=competency_id, **row)
+             for (session_id, competency_id), row in per_competency.items()],
+            batch_size=500)
+    return len(sessions), len(per_competency)
+
+
+def verify(session_ids=None):
+    """
+    Сравнивает сохранённые сводки с пересчитанными. Возвращает список расхождений.
+    """
+    sessions, per_competency = _compute(session_ids)
+    empty = dict.fromkeys(STAT_FIELDS, 0)
+    empty.update(min_score=None, max_score=None)
+    empty_session = dict(empty, evaluator_count=0, competency_count=0)
+    fields = STAT_FIELDS + ('evaluator_count', 'competency_count')
+
+    mismatches = []
+    stored = SessionScoreSummary.objects.values('session_id', *fields)
+    if session_ids is not None:
+        stored = stored.filter(session_id__in=session_ids)
+    stored = {row.pop('session_id'): row for row in stored}
+    for session_id in set(sessions) | set(stored):
+        expected = dict(empty_session, **sessions.get(session_id, {}))
+        actual = stored.get(session_id, empty_session)
+        if expected != actual:
+            mismatches.append(('session', session_id, expected, actual))
+
+    stored = SessionCompetencyScoreSummary.objects.values('session_id', 'competency_id', *STAT_FIELDS)
+    if session_ids is not None:
+        stored = stored.filter(session_id__in=session_ids)
+    stored = {(row.pop('session_id'), row.pop('competency_id')): row for row in stored}
+    for key in set(per_competency) | set(stored):
+        expected = dict(empty, **per_competency.get(key, {}))
+        actual = stored.get(key, empty)
+        if expected != actual:
+            mismatches.append(('competency', key, expected, actual))
+    return mismatches
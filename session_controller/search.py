@@ -0,0 +1,284 @@
+"""
+Полнотекстовый поиск по сессиям, проектам и компетенциям.
+
+Каждый объект представлен строкой SearchDocument (заголовок и текст: описание,
+у сессий — комментарии оценок). Индекс по документам строит СУБД: FTS5 в
+SQLite, GIN по to_tsvector в PostgreSQL (см. миграцию 0011), поэтому время
+поиска почти не зависит от размера таблиц. Документы обновляются из сигналов
+моделей после коммита, повторные изменения объекта в одной транзакции
+переиндексируются один раз.
+"""
+import html
+import re
+import threading
+from collections import defaultdict
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.urls import reverse
+from django.utils.safestring import mark_safe
+
+from .cache_utils import bump_model_version
+from .models import Assessment, Competency, Project, SearchDocument, Session
+
+KINDS = ('session', 'project', 'competency')
+DETAIL_URLS = {'session': 'session_detail', 'project': 'project_detail', 'competency': 'competency_detail'}
+WORD_RE = re.compile(r'\w+')
+MAX_TERMS = 8
+# Символы из области частного использования: их не бывает в тексте, и после экранирования HTML они заменяются на <mark>
+MARK_START, MARK_END = '\ue000', '\ue001'
+FTS_TABLE = 'session_controller_searchdocument_fts'
+DOCUMENT_TABLE = SearchDocument._meta.db_table
+
+_state = threading.local()
+
+
+class SearchResult(NamedTuple):
+    kind: str
+    object_id: int
+    title: str
+    snippet: str
+    score: float
+
+    @property
+    def url(self):
+        return reverse(DETAIL_URLS[self.kind], args=[self.object_id])
+
+
+def search_settings(name):
+    return settings.SEARCH[name]
+
+
+def terms(query):
+    """
+    Метод для разбиения запроса на слова. Операторы и кавычки пользователя в запрос к индексу не попадают.
+    """
+    return WORD_RE.findall(query or '')[:MAX_TERMS]
+
+
+def highlight(text):
+    # Экранируем всё, кроме собственных маркеров совпадений
+    return mark_safe(html.escape(text or '').replace(MARK_START, '<mark>').replace(MARK_END, '</mark>'))
+
+
+class SQLiteBackend:
+    def match(self, words, title_only=False):
+        # Каждое слово — префикс; слова объединяются через AND
+        expression = ' '.join(f'"{word}"*' for word in words)
+        return f'title : ({expression})' if title_only else expression
+
+    def search(self, words, kinds, limit):
+        words_count = search_settings('SNIPPET_WORDS')
+        sql = (
+            f"SELECT d.kind, d.object_id, d.title, "
+            f"snippet({FTS_TABLE}, 1, %s, %s, '…', {words_count}), bm25({FTS_TABLE}, 10.0, 1.0) AS rank "
+            f"FROM {FTS_TABLE} JOIN {DOCUMENT_TABLE} d ON d.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s AND d.kind IN ({', '.join(['%s'] * len(kinds))}) "
+            f"ORDER BY rank LIMIT %s"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [MARK_START, MARK_END, self.match(words), *kinds, limit])
+            # bm25 тем меньше, чем лучше совпадение
+            return [(kind, object_id, title, snippet, -rank) for kind, object_id, title, snippet, rank in cursor]
+
+    def object_ids(self, words, kind, title_only=False):
+        return RawSQL(
+            f"SELECT d.object_id FROM {FTS_TABLE} JOIN {DOCUMENT_TABLE} d ON d.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s AND d.kind = %s",
+            (self.match(words, title_only), kind))
+
+
+class PostgreSQLBackend:
+    # Выражения совпадают с индексами из миграции 0011 — иначе индекс не используется
+    DOCUMENT = "to_tsvector('simple', d.title || ' ' || d.body)"
+    TITLE = "to_tsvector('simple', d.title)"
+
+    def match(self, words):
+        return ' & '.join(f'{word}:*' for word in words)
+
+    def search(self, words, kinds, limit):
+        words_count = search_settings('SNIPPET_WORDS')
+        options = f"StartSel={MARK_START}, StopSel={MARK_END}, MaxWords={words_count}, MinWords=5"
+        sql = (
+            f"SELECT d.kind, d.object_id, d.title, ts_headline('simple', d.body, q, %s), "
+            f"ts_rank(setweight(to_tsvector('simple', d.title), 'A') || "
+            f"setweight(to_tsvector('simple', d.body), 'B'), q) AS rank "
+            f"FROM {DOCUMENT_TABLE} d, to_tsquery('simple', %s) q "
+            f"WHERE {self.DOCUMENT} @@ q AND d.kind = ANY(%s) ORDER BY rank DESC LIMIT %s"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [options, self.match(words), list(kinds), limit])
+            return list(cursor)
+
+    def object_ids(self, words, kind, title_only=False):
+        return RawSQL(
+            f"SELECT d.object_id FROM {DOCUMENT_TABLE} d "
+            f"WHERE {self.TITLE if title_only else self.DOCUMENT} @@ to_tsquery('simple', %s) AND d.kind = %s",
+            (self.match(words), kind))
+
+
+class LikeBackend:
+    """
+    Запасной вариант для СУБД без полнотекстового индекса: поиск подстрок без ранжирования.
+    """
+    def _documents(self, words, title_only=False):
+        documents = SearchDocument.objects.all()
+        for word in words:
+            condition = Q(title__icontains=word)
+            documents = documents.filter(condition if title_only else condition | Q(body__icontains=word))
+        return documents
+
+    def search(self, words, kinds, limit):
+        rows = self._documents(words).filter(kind__in=kinds).order_by('title').values_list(
+            'kind', 'object_id', 'title', 'body')[:limit]
+        return [(kind, object_id, title, body[:200], 0.0) for kind, object_id, title, body in rows]
+
+    def object_ids(self, words, kind, title_only=False):
+        return self._documents(words, title_only).filter(kind=kind).values('object_id')
+
+
+BACKENDS = {'sqlite': SQLiteBackend, 'postgresql': PostgreSQLBackend}
+
+
+def get_backend():
+    return BACKENDS.get(connection.vendor, LikeBackend)()
+
+
+def search(query, kinds=KINDS, limit=None):
+    """
+    Метод для поиска по индексу: список SearchResult от лучшего совпадения к худшему.
+    """
+    words = terms(query)
+    kinds = [kind for kind in kinds if kind in KINDS]
+    if not words or not kinds:
+        return []
+    rows = get_backend().search(words, kinds, limit or search_settings('API_LIMIT'))
+    return [SearchResult(kind, object_id, title, highlight(snippet), round(score, 4))
+            for kind, object_id, title, snippet, score in rows]
+
+
+def matching(queryset, query, kind, title_only=False):
+    """
+    Метод для фильтрации выборки по индексу (вместо icontains в фильтрах и действиях API).
+    """
+    words = terms(query)
+    if not words:
+        return queryset.none()
+    return queryset.filter(id__in=get_backend().object_ids(words, kind, title_only))
+
+
+def ranked_objects(queryset, results):
+    """
+    Метод для загрузки объектов найденных документов одним запросом, в порядке ранжирования.
+    У объектов появляется атрибут search_snippet.
+    """
+    objects = queryset.in_bulk([result.object_id for result in results])
+    ranked = []
+    for result in results:
+        obj = objects.get(result.object_id)
+        if obj is not None:
+            obj.search_snippet = result.snippet
+            ranked.append(obj)
+    return ranked
+
+
+def session_documents(ids):
+    documents = {session_id: [title, []] for session_id, title in
+                 Session.objects.filter(id__in=ids).values_list('id', 'title')}
+    comments = Assessment.objects.filter(session_id__in=documents).exclude(comment__isnull=True).exclude(
+        comment='').order_by('id').values_list('session_id', 'comment')
+    for session_id, comment in comments.iterator(chunk_size=2000):
+        documents[session_id][1].append(comment)
+    return {session_id: (title, '\n'.join(comments)) for session_id, (title, comments) in documents.items()}
+
+
+def description_documents(model):
+    def build(ids):
+        return {object_id: (name, description or '') for object_id, name, description in
+                model.objects.filter(id__in=ids).values_list('id', 'name', 'description')}
+    return build
+
+
+BUILDERS = {
+    'session': session_documents,
+    'project': description_documents(Project),
+    'competency': description_documents(Competency),
+}
+SOURCE_MODELS = {'session': Session, 'project': Project, 'competency': Competency}
+
+
+def index(kind, ids, batch_size=500):
+    """
+    Метод для переиндексации объектов по id: новые документы создаются, изменившиеся
+    обновляются, документы удалённых объектов удаляются. Возвращает число изменённых документов.
+    """
+    ids = list(ids)
+    changed = 0
+    for start in range(0, len(ids), batch_size):
+        chunk = ids[start:start + batch_size]
+        documents = BUILDERS[kind](chunk)
+        stored = SearchDocument.objects.filter(kind=kind, object_id__in=chunk).only('id', 'object_id', 'title', 'body')
+        existing = {document.object_id: document for document in stored}
+        to_create, to_update = [], []
+        for object_id, (title, body) in documents.items():
+            title = title[:255]
+            document = existing.get(object_id)
+            if document is None:
+                to_create.append(SearchDocument(kind=kind, object_id=object_id, title=title, body=body))
+            elif (document.title, document.body) != (title, body):
+                # Неизменившиеся документы не переписываем — запись в FTS-индекс дорогая
+                document.title, document.body = title, body
+                to_update.append(document)
+        removed = [object_id for object_id in existing if object_id not in documents]
+        with transaction.atomic():
+            SearchDocument.objects.bulk_create(to_create, batch_size=batch_size)
+            SearchDocument.objects.bulk_update(to_update, ['title', 'body', 'updated_at'], batch_size=batch_size)
+            if removed:
+                SearchDocument.objects.filter(kind=kind, object_id__in=removed).delete()
+        changed += len(to_create) + len(to_update) + len(removed)
+    if changed:
+        # Результаты поиска на главной лежат во фрагментном кэше с версией SearchDocument
+        transaction.on_commit(lambda: bump_model_version(SearchDocument))
+    return changed
+
+
+def schedule(kind, ids):
+    """
+    Метод для переиндексации после коммита. Повторные изменения в одной транзакции сливаются.
+    """
+    pending = getattr(_state, 'pending', None)
+    if pending is None:
+        pending = _state.pending = defaultdict(set)
+    pending[kind].update(ids)
+    # Документ строится по текущему состоянию базы, поэтому id из откатившейся
+    # транзакции безвредны: они просто переиндексируются при следующем сбросе
+    transaction.on_commit(flush)
+
+
+def flush():
+    pending = getattr(_state, 'pending', None)
+    _state.pending = None
+    for kind, ids in (pending or {}).items():
+        index(kind, ids)
+
+
+def rebuild(batch_size=500):
+    """
+    Метод для полного построения индекса. Возвращает число документов каждого вида.
+    """
+    counts = {}
+    for kind in KINDS:
+        ids = list(SOURCE_MODELS[kind].objects.order_by('id').values_list('id', flat=True))
+        stale = SearchDocument.objects.filter(kind=kind).exclude(object_id__in=SOURCE_MODELS[kind].objects.values('id'))
+        stale.delete()
+        index(kind, ids, batch_size)
+        counts[kind] = len(ids)
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            # Сверка FTS-индекса с таблицей документов и слияние его сегментов
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+    return counts
@@ -1,14 +1,23 @@
+from django.db import transaction
 from rest_framework import serializers
-from .models import Session, Competency, Assessment, Profile
+from simple_history.utils import bulk_create_with_history, bulk_update_with_history
+
+from . import score_summaries, search
+from .roles import get_role_context
+from .models import Session, Competency, Assessment, Profile, Evaluator, SessionCompetency
 
 
 class UserProfileSerializer(serializers.ModelSerializer):
+    username = serializers.CharField(source='user.username', read_only=True)
+
     class Meta:
         model = Profile
         fields = '__all__'
 
 
 class SessionSerializer(serializers.ModelSerializer):
+    evaluated_username = serializers.CharField(source='evaluated.username', read_only=True)
+
     class Meta:
         model = Session
         fields = '__all__'
@@ -20,8 +29,7 @@ class SessionSerializer(serializers.ModelSerializer):
         return value
 
     def validate_evaluated(self, value):
-        user_profile = Profile.objects.get(user=self.context['request'].user)
-        if user_profile.role != 'hr_manager':
+        if not get_role_context(self.context['request'].user).is_hr_manager:
             raise serializers.ValidationError(
                 "Только HR Manager может назначать сотрудника.")
 
@@ -31,8 +39,7 @@ class SessionSerializer(serializers.ModelSerializer):
         return value
 
     def validate_is_active(self, value):
-        user_profile = Profile.objects.get(user=self.context['request'].user)
-        if not value or user_profile.role != 'hr_manager':
+        if not value or not get_role_context(self.context['request'].user).is_hr_manager:
             raise serializers.ValidationError(
                 "Только HR Manager может активировать сессию.")
         return value
@@ -57,6 +64,9 @@ class CompetencySerializer(serializers.ModelSerializer):
 
 
 class AssessmentSerializer(serializers.ModelSerializer):
+    competency_name = serializers.CharField(source='competency.name', read_only=True)
+    evaluator_username = serializers.CharField(source='evaluator.username', read_only=True)
+
     class Meta:
         model = Assessment
         fields = '__all__'
@@ -90,3 +100,97 @@ class AssessmentSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 "Комментарий не должен превышать 300 символов.")
         return value
+
+
+class ScoresheetEntrySerializer(serializers.Serializer):
+    competency = serializers.IntegerField()
+    score = serializers.IntegerField()
+    comment = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+    def validate_score(self, value):
+        if value < 1 or value > 10:
+            raise serializers.ValidationError(
+                "Оценка должна быть в диапазоне от 1 до 10.")
+        return value
+
+    def validate_comment(self, value):
+        if value and len(value) > 300:
+            raise serializers.ValidationError(
+                "Комментарий не должен превышать 300 символов.")
+        return value
+
+
+class ScoresheetSerializer(serializers.Serializer):
+    """
+    Все оценки одного оценщика по сессии. Связи проверяются
+    несколькими запросами на весь лист, а не по запросу на строку.
+    """
+    session = serializers.IntegerField()
+    evaluator = serializers.IntegerField(required=False)
+    scores = ScoresheetEntrySerializer(many=True, allow_empty=False)
+
+    def validate(self, attrs):
+        request = self.context.get('request')
+        if 'evaluator' not in attrs:
+            if request is None or not request.user.is_authenticated:
+                raise serializers.ValidationError(
+                    {'evaluator': "Оценщик обязателен для заполнения."})
+            attrs['evaluator'] = request.user.id
+
+        session_id, evaluator_id = attrs['session'], attrs['evaluator']
+        if not Session.objects.filter(id=session_id).exists():
+            raise serializers.ValidationError({'session': "Сессия не найдена."})
+        if not Evaluator.objects.filter(session_id=session_id, evaluator_id=evaluator_id).exists():
+            raise serializers.ValidationError(
+                {'evaluator': "Пользователь не назначен оценщиком этой сессии."})
+
+        allowed = set(SessionCompetency.objects.filter(
+            session_id=session_id).values_list('competency_id', flat=True))
+        errors, seen = [], set()
+        for entry in attrs['scores']:
+            competency_id = entry['competency']
+            if competency_id not in allowed:
+                errors.append({'competency': ["Компетенция не входит в эту сессию."]})
+            elif competency_id in seen:
+                errors.append({'competency': ["Компетенция указана несколько раз."]})
+            else:
+                errors.append({})
+            seen.add(competency_id)
+        if any(errors):
+            raise serializers.ValidationError({'scores': errors})
+        return attrs
+
+    def create(self, validated_data):
+        session_id = validated_data['session']
+        evaluator_id = validated_data['evaluator']
+        existing = {
+            assessment.competency_id: assessment
+            for assessment in Assessment.objects.filter(session_id=session_id, evaluator_id=evaluator_id)
+        }
+        request = self.context.get('request')
+        user = request.user if request is not None and request.user.is_authenticated else None
+
+        to_create, to_update = [], []
+        for entry in validated_data['scores']:
+            comment = entry.get('comment')
+            assessment = existing.get(entry['competency'])
+            if assessment is None:
+                to_create.append(Assessment(
+                    session_id=session_id, competency_id=entry['competency'],
+                    evaluator_id=evaluator_id, score=entry['score'], comment=comment))
+            elif (assessment.score, assessment.comment) != (entry['score'], comment):
+                assessment.score, assessment.comment = entry['score'], comment
+                to_update.append(assessment)
+
+        with transaction.atomic(), score_summaries.suspended():
+            if to_create:
+                bulk_create_with_history(to_create, Assessment, default_user=user)
+            if to_update:
+                bulk_update_with_history(to_update, Assessment, ['score', 'comment'], default_user=user)
+            # Сводки сессии пересчитываются одним набором запросов, а не по строке
+            score_summaries.rebuild([session_id])
+            # Массовые операции идут мимо сигналов — комментарии переиндексируем сами
+            search.schedule('session', [session_id])
+
+        return {'created': len(to_create), 'updated': len(to_update),
+                'unchanged': len(validated_data['scores']) - len(to_create) - len(to_update)}
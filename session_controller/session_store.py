@@ -0,0 +1,154 @@
+"""
+Хранилище сессий: чтение из кэша, запись в базу только для долговечных изменений.
+
+Сессия читается из кэша (Redis) и только при промахе — из django_session.
+В базу сессия пишется при создании, при смене данных входа (пользователь,
+бэкенд, хэш пароля) и когда срок строки в базе заметно отстаёт от срока
+сессии; прочие ключи (например, сообщения) живут только в кэше. Поэтому
+обычный запрос вошедшего пользователя не обращается к django_session, а
+после потери кэша пользователь остаётся авторизованным.
+
+Если Redis недоступен, кэш сессий временно переключается на память процесса
+(SESSIONS['FALLBACK_CACHE']). Ключи, изменённые или удалённые за это время,
+после восстановления Redis удаляются из него, чтобы там не осталось старых
+копий (например, сессии, из которой вышли); следующее чтение возьмёт их из
+базы.
+
+Просроченные строки удаляет пачками задача clear_expired_sessions.
+"""
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+AUTH_KEYS = (SESSION_KEY, BACKEND_SESSION_KEY, HASH_SESSION_KEY)
+# (отпечаток данных входа, срок строки в базе) на момент последней записи в базу
+DB_STATE_KEY = '_session_db_state'
+
+
+def session_settings(name):
+    return settings.SESSIONS[name]
+
+
+class FallbackCache:
+    """
+    Кэш сессий: основной кэш, а при его ошибке — кэш в памяти процесса на RETRY_SECONDS.
+    Бэкенды берутся из caches при каждом обращении: у каждого потока свой клиент, и видны переопределения CACHES.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._down_until = 0.0
+        self._dirty = set()
+
+    @property
+    def primary(self):
+        return caches[settings.SESSION_CACHE_ALIAS]
+
+    @property
+    def fallback(self):
+        alias = session_settings('FALLBACK_CACHE')
+        if alias in settings.CACHES:
+            return caches[alias]
+        # Без отдельного алиаса (например, при переопределённых CACHES) — собственный кэш в памяти
+        return _local_cache
+
+    def _recover(self):
+        with self._lock:
+            dirty = list(self._dirty)
+        self.primary.delete_many(dirty)
+        with self._lock:
+            self._dirty.difference_update(dirty)
+        logger.info("Кэш сессий снова доступен, удалено устаревших копий: %s", len(dirty))
+
+    def _call(self, method, key, *args):
+        if time.monotonic() >= self._down_until:
+            try:
+                if self._dirty:
+                    self._recover()
+                return getattr(self.primary, method)(key, *args)
+            except Exception:
+                logger.warning("Кэш сессий недоступен, сессии читаются из памяти процесса", exc_info=True)
+                self._down_until = time.monotonic() + session_settings('RETRY_SECONDS')
+        if method != 'get':
+            with self._lock:
+                self._dirty.add(key)
+        return getattr(self.fallback, method)(key, *args)
+
+    def get(self, key, default=None):
+        return self._call('get', key, default)
+
+    def set(self, key, value, timeout):
+        return self._call('set', key, value, timeout)
+
+    def delete(self, key):
+        return self._call('delete', key)
+
+    def __contains__(self, key):
+        return self._call('has_key', key)
+
+
+_local_cache = LocMemCache('session_store_fallback', {})
+_cache = FallbackCache()
+
+
+def get_cache():
+    return _cache
+
+
+class SessionStore(CachedDBStore):
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._cache = get_cache()
+
+    @staticmethod
+    def _auth_fingerprint(data):
+        values = repr([data.get(key) for key in AUTH_KEYS])
+        return hashlib.sha1(values.encode()).hexdigest()
+
+    def _needs_db_write(self, data, must_create):
+        state = data.get(DB_STATE_KEY)
+        if must_create or self.session_key is None or not state:
+            return True
+        fingerprint, db_expiry = state
+        if fingerprint != self._auth_fingerprint(data):
+            return True
+        # Строка в базе истекает раньше сессии больше чем на половину срока — продлеваем её
+        return db_expiry < self.get_expiry_date().timestamp() - self.get_expiry_age() / 2
+
+    def save(self, must_create=False):
+        data = self._get_session(no_load=must_create)
+        if self._needs_db_write(data, must_create):
+            data[DB_STATE_KEY] = (self._auth_fingerprint(data), self.get_expiry_date().timestamp())
+            return super().save(must_create)
+        try:
+            self._cache.set(self.cache_key, self._session, self.get_expiry_age())
+        except Exception:
+            logger.exception("Не удалось сохранить сессию в кэш")
+
+    @classmethod
+    def clear_expired(cls, batch_size=None):
+        """
+        Метод для удаления просроченных сессий пачками по первичному ключу. Возвращает число удалённых.
+        """
+        batch_size = batch_size or session_settings('CLEANUP_BATCH_SIZE')
+        model = cls.get_model_class()
+        cutoff = timezone.now()
+        deleted = 0
+        while True:
+            keys = list(model.objects.filter(expire_date__lt=cutoff).values_list('session_key', flat=True)[
+                :batch_size])
+            if not keys:
+                return deleted
+            # Короткие транзакции: очистка не держит блокировку записи между пачками
+            with transaction.atomic():
+                deleted += model.objects.filter(session_key__in=keys)._raw_delete(model.objects.db)
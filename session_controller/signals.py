@@ -0,0 +1,129 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import autocomplete, avatars, db_maintenance, read_models, roles, score_summaries, search
+from .cache_utils import bump_model_version
+from .models import Assessment, Competency, Evaluator, Profile, Project, Session, SessionCompetency
+
+# Вход пользователя обновляет только last_login — подсказкам и кэшам это неважно
+LOGIN_ONLY = frozenset({'last_login'})
+
+
+def model_changed(model):
+    bump_model_version(model)
+    # Зависящие от модели страницы прогреваются заранее, а не первым пользователем
+    read_models.changed(model)
+
+
+@receiver([post_save, post_delete], sender=Session)
+@receiver([post_save, post_delete], sender=SessionCompetency)
+@receiver([post_save, post_delete], sender=Evaluator)
+@receiver([post_save, post_delete], sender=Project)
+@receiver([post_save, post_delete], sender=Competency)
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=Profile)
+def bump_cache_version(sender, **kwargs):
+    if kwargs.get('update_fields') == LOGIN_ONLY:
+        return
+    # После коммита, иначе параллельный запрос может закэшировать старые данные под новой версией
+    transaction.on_commit(lambda: model_changed(sender))
+
+
+@receiver([post_save, post_delete], sender=Session)
+@receiver([post_save, post_delete], sender=Project)
+@receiver([post_save, post_delete], sender=Competency)
+def update_search_index(sender, instance, **kwargs):
+    search.schedule(sender._meta.model_name, [instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Assessment)
+def update_session_search_index(sender, instance, **kwargs):
+    # Комментарии оценок входят в документ сессии
+    search.schedule('session', [instance.session_id])
+
+
+# Подключены после bump_cache_version: к моменту обновления индекса версия модели уже увеличена
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=Profile)
+@receiver([post_save, post_delete], sender=Competency)
+def update_autocomplete(sender, instance, **kwargs):
+    if kwargs.get('update_fields') == LOGIN_ONLY:
+        return
+    if sender is Competency:
+        name, object_id = 'competencies', instance.pk
+    else:
+        name, object_id = 'users', instance.pk if sender is User else instance.user_id
+    transaction.on_commit(lambda: autocomplete.refresh(name, sender, [object_id]))
+
+
+@receiver([post_save, post_delete], sender=Profile)
+def invalidate_role_context(sender, instance, **kwargs):
+    user_id = instance.user_id
+    # Сбрасываем и сразу, и после коммита: между ними роль могли закэшировать из старых данных
+    roles.invalidate([user_id])
+    transaction.on_commit(lambda: roles.invalidate([user_id]))
+
+
+@receiver(pre_save, sender=Profile)
+def reset_avatar_derivatives(sender, instance, update_fields=None, **kwargs):
+    # Аватар меняют форма, админка и /api/users/ — миниатюры старого сбрасываем при любом сохранении
+    instance._avatar_changed = False
+    if update_fields is not None and 'avatar' not in update_fields:
+        return
+    previous = Profile.objects.filter(pk=instance.pk).values_list('avatar', flat=True).first() if instance.pk else ''
+    if (previous or '') != (instance.avatar.name or ''):
+        instance._avatar_changed = True
+        avatars.reset(instance)
+
+
+@receiver(post_save, sender=Profile)
+def schedule_avatar_derivatives(sender, instance, **kwargs):
+    if getattr(instance, '_avatar_changed', False):
+        instance._avatar_changed = False
+        avatars.schedule(instance)
+
+
+@receiver(pre_save, sender=Assessment)
+def remember_previous_score(sender, instance, **kwargs):
+    if score_summaries.is_suspended() or instance.pk is None:
+        return
+    instance._previous_score = Assessment.objects.filter(pk=instance.pk).values_list(
+        'session_id', 'competency_id', 'score').first()
+
+
+@receiver(post_save, sender=Assessment)
+def update_score_summaries(sender, instance, created, **kwargs):
+    if score_summaries.is_suspended():
+        return
+    current = (instance.session_id, instance.competency_id, instance.score)
+    previous = getattr(instance, '_previous_score', None)
+    instance._previous_score = None
+    if created or previous is None:
+        score_summaries.apply_scores(added=[current])
+    elif previous != current:
+        score_summaries.apply_scores(added=[current], removed=[previous])
+
+
+@receiver(post_delete, sender=Assessment)
+def remove_from_score_summaries(sender, instance, **kwargs):
+    if score_summaries.is_suspended():
+        return
+    score_summaries.apply_scores(
+        removed=[(instance.session_id, instance.competency_id, instance.score)])
+
+
+@receiver([post_save, post_delete], sender=SessionCompetency)
+@receiver([post_save, post_delete], sender=Evaluator)
+def update_session_participants(sender, instance, **kwargs):
+    if score_summaries.is_suspended():
+        return
+    # При каскадном удалении сессии строку сводки заново не создаём
+    score_summaries.refresh_participants(
+        instance.session_id, create=kwargs.get('created', False))
+
+
+# Прагмы, зависящие от режима журнала базы (db_maintenance.py)
+connection_created.connect(db_maintenance.tune_connection, dispatch_uid='sqlite_tune_connection')
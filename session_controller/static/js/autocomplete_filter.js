@@ -0,0 +1,13 @@
+'use strict';
+// Фильтр списка админки с автодополнением: выбор значения перезагружает список с параметром фильтра
+window.addEventListener('load', function() {
+    django.jQuery('.autocomplete-filter').on('change', function() {
+        const url = new URL(window.location.href);
+        url.searchParams.delete(this.dataset.parameter);
+        url.searchParams.delete('p');
+        if (this.value) {
+            url.searchParams.set(this.dataset.parameter, this.value);
+        }
+        window.location.href = url.toString();
+    });
+});
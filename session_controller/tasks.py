@@ -3,13 +3,13 @@ from django.core.mail import send_mail
 
 @shared_task
 def archive_old_sessions():
-    from datetime import timedelta
-    from django.utils.timezone import now
-    from .models import Session
+    """
+    Ночная архивация неактивных сессий в сжатые файлы с удалением из базы небольшими пачками.
+    """
+    from .archive import archive_sessions
 
-    cutoff_date = now() - timedelta(days=30)
-    Session.objects.filter(is_active=False, created_at__lt=cutoff_date).delete()
-    return "Старые сессии архивированы"
+    stats = archive_sessions()
+    return dict(stats, files=len(stats['files']))
 
 @shared_task
 def send_reminder_email(user_email, subject, message):
@@ -23,3 +23,187 @@ def send_reminder_email(user_email, subject, message):
         recipient_list=[user_email],
     )
     return f"Напоминание отправлено на {user_email}"
+
+
+@shared_task
+def send_reminders(limit=None):
+    """
+    Кампания напоминаний: по одному письму каждому оценщику с незаполненными оценками
+    через одно SMTP-соединение.
+    """
+    from .reminders import send_reminders as send
+
+    return send(limit=limit)
+
+
+@shared_task
+def write_visit_logs(records):
+    """
+    Пакетная запись логов посещений, накопленных LogMiddleware.
+    """
+    from django.utils.dateparse import parse_datetime
+    from .visit_log_writer import write_records
+
+    for record in records:
+        record['timestamp'] = parse_datetime(record['timestamp'])
+    write_records(records)
+    return len(records)
+
+
+@shared_task
+def rollup_visit_logs():
+    """
+    Инкрементальное обновление почасовых и посуточных агрегатов посещений.
+    """
+    from .visit_rollups import rollup_visit_logs as rollup
+
+    return rollup()
+
+
+@shared_task
+def prune_visit_logs(days=None):
+    """
+    Сворачивание и удаление сырых логов посещений старше N дней.
+    """
+    from django.conf import settings
+    from .visit_rollups import prune_visit_logs as prune
+
+    return prune(days or settings.VISIT_LOG_RETENTION_DAYS)
+
+
+@shared_task
+def export_assessments(export_format, params, relative_path):
+    """
+    Фоновая выгрузка оценок в файл; ссылка на него выдаётся при постановке задачи.
+    """
+    from .exports import export_to_file
+
+    export_to_file(export_format, params, relative_path)
+    return relative_path
+
+
+@shared_task
+def prune_assessment_exports():
+    """
+    Удаление файлов фоновых выгрузок оценок старше срока хранения.
+    """
+    from .exports import prune_files
+
+    return prune_files()
+
+
+@shared_task
+def sync_directory(path=None, deactivate_missing=None):
+    """
+    Ночная синхронизация пользователей и профилей со справочником сотрудников.
+    """
+    from django.conf import settings
+    from .hris_sync import sync_directory as sync
+
+    path = path or settings.HRIS_DIRECTORY['PATH']
+    if not path:
+        return "Путь к справочнику не задан"
+    if deactivate_missing is None:
+        deactivate_missing = settings.HRIS_DIRECTORY['DEACTIVATE_MISSING']
+    stats = sync(path, deactivate_missing=deactivate_missing)
+    return dict(stats, errors=len(stats['errors']))
+
+
+@shared_task
+def export_profile_pdfs(profile_ids, name):
+    """
+    Фоновая генерация PDF-резюме выбранных профилей в zip-архив.
+    """
+    from .pdf_export import build_archive
+
+    return build_archive(profile_ids, name)
+
+
+@shared_task
+def prune_pdf_cache():
+    """
+    Удаление давно не использованных PDF из кэша резюме.
+    """
+    from .pdf_export import prune_cache
+
+    return prune_cache()
+
+
+@shared_task
+def prune_pdf_exports():
+    """
+    Удаление архивов PDF-резюме старше срока хранения.
+    """
+    from .pdf_export import prune_archives
+
+    return prune_archives()
+
+
+@shared_task
+def process_avatar(profile_id):
+    """
+    Нарезка миниатюр WebP и JPEG для загруженного аватара.
+    """
+    from .avatars import process_avatar as process
+
+    return process(profile_id)
+
+
+@shared_task
+def compact_history():
+    """
+    Ночное сжатие таблиц истории: удаление версий без изменений и версий старше срока хранения.
+    """
+    from .history import compact_history as compact
+
+    return {label: {'scanned': scanned, 'removed': removed} for label, (scanned, removed) in compact().items()}
+
+
+@shared_task
+def rebuild_read_model(name):
+    """
+    Пересборка одной модели чтения по расписанию django_celery_beat.
+    """
+    from .read_models import rebuild
+
+    return rebuild(name)
+
+
+@shared_task
+def refresh_read_models(force=False):
+    """
+    Прогрев холодных моделей чтения после записей и раз в минуту.
+    """
+    from .read_models import refresh
+
+    return refresh(force)
+
+
+@shared_task
+def optimize_database():
+    """
+    Ежечасный PRAGMA optimize для SQLite.
+    """
+    from .db_maintenance import optimize
+
+    return optimize()
+
+
+@shared_task
+def maintain_database():
+    """
+    Ночное обслуживание SQLite: ANALYZE, инкрементальная очистка, checkpoint WAL.
+    """
+    from .db_maintenance import maintain
+
+    return maintain()
+
+
+@shared_task
+def clear_expired_sessions():
+    """
+    Удаление просроченных сессий из базы пачками.
+    """
+    from .session_store import SessionStore
+
+    return SessionStore.clear_expired()
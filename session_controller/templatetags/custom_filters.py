@@ -1,10 +1,12 @@
 import base64
+
 from django import template
-from io import BytesIO
-from PIL import Image
+
+from session_controller import avatars
 
 register = template.Library()
 
+
 @register.filter
 def base64_image(image_data):
     """
@@ -13,4 +15,19 @@ def base64_image(image_data):
     if image_data:
         # Преобразуем байтовые данные в Base64
         return base64.b64encode(image_data).decode('utf-8')
-    return ''
\ No newline at end of file
+    return ''
+
+
+def _variant(spec):
+    size, _, image_format = (spec or 'medium').partition(':')
+    return size, image_format or 'webp'
+
+
+@register.filter
+def avatar_url(profile, spec='medium'):
+    """
+    Фильтр для ссылки на миниатюру аватара: {{ profile|avatar_url:"medium:jpeg" }}.
+    """
+    if not profile or not profile.avatar:
+        return ''
+    return avatars.avatar_url(profile, *_variant(spec))
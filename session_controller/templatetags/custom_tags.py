@@ -1,9 +1,15 @@
 from django import template
+from django.conf import settings
+from session_controller.cache_utils import get_or_build, versions_key
 from session_controller.models import Session
 
 register = template.Library()
 
 @register.inclusion_tag('sessions_list.html')
 def show_sessions():
-    sessions = Session.objects.filter(is_active=True)
+    sessions = get_or_build(
+        f"tag:show_sessions:{versions_key((Session,))}",
+        lambda: list(Session.objects.filter(is_active=True)),
+        settings.PAGE_CACHE_TIMEOUT,
+    )
     return {'sessions': sessions}
@@ -0,0 +1,238 @@
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import history, hris_sync, instrumentation, reminders, search
+from .models import (Assessment, Competency, Evaluator, Profile, ReminderDispatch, Session, SessionCompetency,
+                     VisitLog)
+from .visit_log_writer import VisitLogWriter, get_writer
+
+LOCAL_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class MissingAssessmentsTests(TestCase):
+    def setUp(self):
+        evaluated = User.objects.create_user('evaluated', email='evaluated@example.com')
+        self.evaluator = User.objects.create_user('evaluator', email='evaluator@example.com')
+        self.session = Session.objects.create(title='S', evaluated=evaluated)
+        self.first = Competency.objects.create(name='C1')
+        self.second = Competency.objects.create(name='C2')
+        for competency in (self.first, self.second):
+            SessionCompetency.objects.create(session=self.session, competency=competency)
+        Evaluator.objects.create(session=self.session, evaluator=self.evaluator)
+
+    def test_one_row_per_missing_assessment(self):
+        Assessment.objects.create(session=self.session, competency=self.first, evaluator=self.evaluator, score=3)
+
+        rows = list(reminders.missing_assessments())
+
+        self.assertEqual(rows, [
+            (self.evaluator.id, 'evaluator', 'evaluator@example.com', self.session.id, 'S', 'C2'),
+        ])
+
+    def test_digest_lists_each_competency_once(self):
+        (_, _, _, sessions), = reminders.digests(reminders.missing_assessments())
+
+        self.assertEqual(sessions, {(self.session.id, 'S'): ['C1', 'C2']})
+
+    def test_session_without_competencies_is_skipped(self):
+        SessionCompetency.objects.filter(session=self.session).delete()
+
+        self.assertEqual(list(reminders.missing_assessments()), [])
+
+    def test_unchanged_digest_is_not_repeated(self):
+        connection = mock.Mock()
+        self.assertEqual(reminders.send_reminders(connection=connection)['sent'], 1)
+        ReminderDispatch.objects.update(sent_at=timezone.now() - timedelta(days=2))
+
+        stats = reminders.send_reminders(connection=connection)
+
+        self.assertEqual((stats['sent'], stats['unchanged']), (0, 1))
+        self.assertEqual(connection.send_messages.call_count, 1)
+
+    def test_changed_digest_is_sent_again(self):
+        connection = mock.Mock()
+        reminders.send_reminders(connection=connection)
+        ReminderDispatch.objects.update(sent_at=timezone.now() - timedelta(days=2))
+        Assessment.objects.create(session=self.session, competency=self.first, evaluator=self.evaluator, score=3)
+
+        stats = reminders.send_reminders(connection=connection)
+
+        self.assertEqual((stats['sent'], stats['unchanged']), (1, 0))
+        self.assertEqual(connection.send_messages.call_count, 2)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class DirectorySyncTests(TestCase):
+    def test_bad_rows_are_reported_and_skipped(self):
+        rows = [
+            (1, '{"username": "impossible", "role": "employee", "hire_date": "2024-02-30"}'),
+            (2, '{bad json'),
+            (3, '[1, 2]'),
+            (4, '{"username": "valid", "role": "employee", "hire_date": "2024-02-10"}'),
+        ]
+
+        stats = hris_sync.DirectorySync().run(rows)
+
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual([error.split(':')[0] for error in stats['errors']], ['строка 1', 'строка 2', 'строка 3'])
+        self.assertTrue(User.objects.filter(username='valid').exists())
+        self.assertFalse(User.objects.filter(username='impossible').exists())
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class AvatarDerivativesTests(TestCase):
+    def setUp(self):
+        self.profile = Profile.objects.create(user=User.objects.create_user('owner'), avatar='avatars/old.png')
+        # Так результат записывает задача process_avatar — без сигналов
+        Profile.objects.filter(pk=self.profile.pk).update(
+            avatar_derivatives={'small_webp': 'avatars/derived/old-64.webp'})
+
+    @mock.patch('session_controller.tasks.process_avatar.delay')
+    def test_changed_avatar_resets_and_schedules_derivatives(self, delay):
+        profile = Profile.objects.get(pk=self.profile.pk)
+        profile.avatar = 'avatars/new.png'
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.save()
+
+        self.assertEqual(Profile.objects.get(pk=profile.pk).avatar_derivatives, {})
+        delay.assert_called_once_with(profile.pk)
+
+    @mock.patch('session_controller.tasks.process_avatar.delay')
+    def test_other_changes_keep_derivatives(self, delay):
+        profile = Profile.objects.get(pk=self.profile.pk)
+        profile.department = 'HR'
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.save()
+
+        self.assertEqual(Profile.objects.get(pk=profile.pk).avatar_derivatives,
+                         {'small_webp': 'avatars/derived/old-64.webp'})
+        delay.assert_not_called()
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class AssessmentExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('exporter'))
+        # Журнал посещений пишется пачками; иначе буфер сбросится при выходе — уже в рабочую базу
+        self.addCleanup(get_writer().flush)
+
+    def test_invalid_filters_are_rejected(self):
+        for query in ('session=abc', 'created_after=2024-02-30', 'created_before=yesterday'):
+            with self.subTest(query=query):
+                response = self.client.get(f'/api/assessments/export/?{query}')
+                self.assertEqual(response.status_code, 400)
+
+    def test_export_requires_authentication(self):
+        self.assertEqual(APIClient().get('/api/assessments/export/').status_code, 403)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class VisitLogsTests(TestCase):
+    def test_impossible_time_filter_is_ignored(self):
+        response = self.client.get('/logs/', {'since': '2024-13-01T10:00', 'until': '2024-02-30T10:00'})
+
+        self.assertEqual(response.status_code, 200)
+
+
+class RouteKeyTests(TestCase):
+    def test_regex_anchors_are_stripped(self):
+        routes = {
+            'api/^sessions/$': 'GET /api/sessions/',
+            'api/^sessions/(?P<pk>[^/.]+)/$': 'GET /api/sessions/(?P<pk>[^/.]+)/',
+            'profile/<int:pk>/': 'GET /profile/<int:pk>/',
+        }
+        for route, key in routes.items():
+            request = SimpleNamespace(method='GET', resolver_match=SimpleNamespace(route=route))
+            with self.subTest(route=route):
+                self.assertEqual(instrumentation._route_key(request), key)
+
+
+class VisitLogWriterTests(TestCase):
+    def test_records_for_another_database_are_dropped(self):
+        writer = VisitLogWriter(dict(get_writer().config, BACKEND='buffer', SAMPLE_RATE=1.0))
+        writer._ensure_thread = lambda: None
+        writer.enqueue(User.objects.create_user('visitor').pk, '/', 'GET', timezone.now())
+
+        # Как при сбросе на выходе, когда тестовая база уже удалена
+        with mock.patch('session_controller.visit_log_writer.current_database', return_value='other.sqlite3'), \
+                self.assertLogs('session_controller.visit_log_writer', 'WARNING'):
+            self.assertEqual(writer.flush(), 0)
+
+        self.assertEqual(writer.stats()['dropped'], 1)
+        self.assertFalse(VisitLog.objects.exists())
+
+    def test_records_for_current_database_are_written(self):
+        writer = VisitLogWriter(dict(get_writer().config, BACKEND='buffer', SAMPLE_RATE=1.0))
+        writer._ensure_thread = lambda: None
+        writer.enqueue(User.objects.create_user('visitor').pk, '/', 'GET', timezone.now())
+
+        self.assertEqual(writer.flush(), 1)
+        self.assertEqual(VisitLog.objects.count(), 1)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class LastLoginTests(TestCase):
+    def test_login_updates_last_login_immediately(self):
+        user = User.objects.create_user('member', password='secret')
+
+        self.client.force_login(user)
+
+        # last_login входит в токен сброса пароля — запись не откладывается в буфер
+        self.assertIsNotNone(User.objects.get(pk=user.pk).last_login)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class SessionTitleFilterTests(TestCase):
+    def setUp(self):
+        self.session = Session.objects.create(title='Lighthouse review', evaluated=User.objects.create_user('lamp'))
+        self.client = APIClient()
+
+    def test_title_matches_any_substring(self):
+        response = self.client.get('/api/sessions/', {'title': 'ight'})
+
+        self.assertEqual([row['id'] for row in response.data['results']], [self.session.id])
+
+    def test_title_words_match_indexed_word_prefixes(self):
+        search.index('session', [self.session.pk])
+
+        found = self.client.get('/api/sessions/', {'title_words': 'light'}).data['results']
+        missed = self.client.get('/api/sessions/', {'title_words': 'ight'}).data['results']
+
+        self.assertEqual([row['id'] for row in found], [self.session.id])
+        self.assertEqual(missed, [])
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class CompetencyUpdateTests(TestCase):
+    @mock.patch('session_controller.views.model_changed')
+    def test_update_refreshes_caches_after_commit(self, model_changed):
+        competency = Competency.objects.create(name='Old')
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = APIClient().post(f'/api/competencies/{competency.pk}/update_competency/', {'name': 'New'})
+        self.assertEqual(response.status_code, 200)
+        model_changed.assert_not_called()
+
+        for callback in callbacks:
+            callback()
+        model_changed.assert_called_once_with(Competency)
+
+
+class HistoryRetentionTests(TestCase):
+    def test_keep_days_applies_without_keep_versions(self):
+        current = timezone.now()
+        versions = [(1, current - timedelta(days=400), '+', 'a'), (2, current - timedelta(days=1), '~', 'b')]
+
+        removed = history._group_deletions(versions, 1, keep_versions=0, cutoff=current - timedelta(days=180))
+
+        self.assertEqual(removed, [1])
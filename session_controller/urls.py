@@ -11,4 +11,6 @@ from . import views
 urlpatterns = router.urls
 urlpatterns += [
     path('get_session_count/', views.get_session_count, name='get_session_count'),
+    path('search/', views.search_api, name='search_api'),
+    path('autocomplete/<str:name>/', views.autocomplete_api, name='autocomplete_api'),
 ]
\ No newline at end of file
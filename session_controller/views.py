@@ -1,9 +1,15 @@
-from django.http import JsonResponse
+from datetime import timedelta
+
+from django.http import FileResponse, JsonResponse
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import is_naive, make_aware, now
+from django.utils.functional import SimpleLazyObject
 from django.db.models import Count
 from django.http import HttpResponseRedirect
 from django.views.generic.edit import UpdateView, DeleteView
 from django.urls import reverse, reverse_lazy
-from django.db.models import Q
+from django.db.models import OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from rest_framework import viewsets
 from django.shortcuts import get_object_or_404, render, redirect
 
@@ -11,16 +17,19 @@ from rest_framework.filters import SearchFilter, OrderingFilter
 from django_filters.rest_framework import DjangoFilterBackend
 from .filters import SessionFilter, CompetencyFilter, UserProfileFilter
 
-from .models import Project, Session, Competency, Assessment, Profile, User
-from .serializers import SessionSerializer, CompetencySerializer, AssessmentSerializer, UserProfileSerializer
-from django.db import models
+from .models import (Project, Session, Competency, Assessment, Profile, User, SessionCompetency, Evaluator,
+                     SessionCompetencyScoreSummary, SearchDocument)
+from .serializers import (SessionSerializer, CompetencySerializer, AssessmentSerializer, UserProfileSerializer,
+                          ScoresheetSerializer)
+from django.db import models, transaction
 
 from rest_framework.pagination import PageNumberPagination
-from django.db.models import Avg
 from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from django.core.cache import cache
+from .cache_utils import bump_model_version, get_or_build, model_versions, params_digest, versions_key
 from django.contrib.auth.decorators import login_required
 from .models import Profile
 from .forms import CompetencyForm, ProfileAvatarForm, LoginForm, RegisterForm
@@ -29,12 +38,111 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
 
 from .models import VisitLog
+from .visit_log_writer import get_writer
+from . import autocomplete, exports, instrumentation, read_models, search
+from .tasks import export_assessments
+from django.conf import settings
+from .visit_rollups import GROUP_FIELDS, visit_report
+from .fast_lists import FastListMixin
+from .keyset import keyset_page
+from .roles import get_role_context
+from .history import update_with_history
+from .signals import model_changed
+from .score_summaries import SCORE_SUMMARY_FIELDS, score_summary_data
+from .db_router import replica_reads
 from django.contrib.auth.decorators import login_required
 
+VISIT_LOGS_PAGE_SIZE = 50
+SESSIONS_PAGE_SIZE = 50
+
+
+def _parse_log_time(value):
+    try:
+        value = parse_datetime(value) if value else None
+    except ValueError:
+        # Формат верный, но даты не существует (2024-13-01) — фильтр не применяем
+        return None
+    if value is not None and is_naive(value):
+        value = make_aware(value)
+    return value
+
+
 # @login_required
+@replica_reads
 def visit_logs(request):
-    logs = VisitLog.objects.order_by('-timestamp')  # Логи в обратном порядке
-    return render(request, 'visit_logs.html', {'logs': logs})
+    filters = {name: request.GET.get(name, '').strip()
+               for name in ('user', 'path', 'method', 'since', 'until')}
+
+    # Имя пользователя берём join'ом, без запроса на каждую строку
+    logs = VisitLog.objects.values(
+        'id', 'user__username', 'path', 'method', 'timestamp')
+    if filters['user']:
+        logs = logs.filter(user__username=filters['user'])
+    if filters['path']:
+        logs = logs.filter(path__startswith=filters['path'])
+    if filters['method']:
+        logs = logs.filter(method=filters['method'].upper())
+    since = _parse_log_time(filters['since'])
+    if since:
+        logs = logs.filter(timestamp__gte=since)
+    until = _parse_log_time(filters['until'])
+    if until:
+        logs = logs.filter(timestamp__lt=until)
+
+    # Логи в обратном порядке, страница начинается после курсора
+    logs, next_cursor = keyset_page(
+        logs, request.GET.get('cursor'), VISIT_LOGS_PAGE_SIZE)
+
+    next_query = None
+    if next_cursor:
+        params = request.GET.copy()
+        params['cursor'] = next_cursor
+        next_query = params.urlencode()
+
+    return render(request, 'visit_logs.html', {
+        'logs': logs,
+        'filters': filters,
+        'next_query': next_query,
+        'is_first_page': not request.GET.get('cursor'),
+    })
+
+
+def visit_log_writer_stats(request):
+    """
+    Счётчики буфера логов посещений текущего процесса.
+    """
+    return JsonResponse(get_writer().stats())
+
+
+def metrics(request):
+    """
+    Скользящая статистика задержек по маршрутам текущего процесса.
+    """
+    token = settings.PERF_METRICS_TOKEN
+    if not request.user.is_staff and not (token and request.headers.get('X-Metrics-Token') == token):
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+    if request.method == 'POST' and request.POST.get('reset'):
+        instrumentation.reset()
+    return JsonResponse({'routes': instrumentation.snapshot(), 'visit_log_writer': get_writer().stats(),
+                         'read_models': read_models.stats()})
+
+
+@replica_reads
+def visit_stats(request):
+    """
+    Отчёт по посещениям из почасовых/посуточных агрегатов.
+    """
+    period = request.GET.get('period', 'day')
+    group_by = [name for name in request.GET.get('by', 'path').split(',') if name in GROUP_FIELDS]
+    if period not in ('hour', 'day') or not group_by:
+        return JsonResponse({'error': 'Invalid request'}, status=400)
+    try:
+        days = int(request.GET.get('days', 7))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid request'}, status=400)
+    since = now() - timedelta(days=days)
+    return JsonResponse({'results': visit_report(period, since, group_by)})
+
 
 def register_view(request):
     if request.method == "POST":
@@ -52,10 +160,7 @@ def register_view(request):
                 user = User.objects.create_user(
                     username=username, password=password)
                 login(request, user)  # Авторизация после регистрации
-
-                # Сохранение данных в сессии
-                request.session['user_logged_in'] = True
-                request.session['username'] = user.username
+                # Имя и признак входа доступны через request.user — в сессию их не пишем
                 messages.success(request, "Регистрация прошла успешно")
                 return redirect('home')
         else:
@@ -81,10 +186,7 @@ def login_view(request):
             user = authenticate(request, username=username, password=password)
             if user is not None:
                 login(request, user)
-
-                # Сохранение данных в сессии
-                request.session['user_logged_in'] = True
-                request.session['username'] = user.username
+                # Имя и признак входа доступны через request.user — в сессию их не пишем
                 return redirect('home')
             else:
                 messages.error(request, 'Неверное имя пользователя или пароль')
@@ -97,6 +199,55 @@ def login_view(request):
     return render(request, 'login.html', {'form': form})
 
 
+def search_api(request):
+    """
+    Поиск по сессиям, проектам и компетенциям: ?q=&kind=session,project&limit=
+    """
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'error': 'Параметр q обязателен'}, status=400)
+    kinds = [kind for kind in request.GET.get('kind', '').split(',') if kind] or search.KINDS
+    unknown = [kind for kind in kinds if kind not in search.KINDS]
+    if unknown:
+        return JsonResponse({'error': f"Неизвестный вид: {', '.join(unknown)}"}, status=400)
+    try:
+        limit = min(int(request.GET.get('limit') or settings.SEARCH['API_LIMIT']), settings.SEARCH['API_MAX_LIMIT'])
+    except ValueError:
+        return JsonResponse({'error': 'limit должен быть числом'}, status=400)
+
+    results = search.search(query, kinds, max(limit, 1))
+    return JsonResponse({
+        'query': query,
+        'count': len(results),
+        'results': [{
+            'kind': result.kind,
+            'id': result.object_id,
+            'title': result.title,
+            'snippet': result.snippet,
+            'score': result.score,
+            'url': result.url,
+        } for result in results],
+    }, json_dumps_params={'ensure_ascii': False})
+
+
+def autocomplete_api(request, name):
+    """
+    Подсказки для полей выбора: ?term=&page= (формат ответа — как у автодополнения админки Django)
+    """
+    if name not in autocomplete.INDEXES:
+        return JsonResponse({'error': f'Неизвестный список: {name}'}, status=404)
+    term = request.GET.get('term', request.GET.get('q', ''))
+    try:
+        page = int(request.GET.get('page') or 1)
+    except ValueError:
+        page = 1
+    results, more = autocomplete.lookup(name, term, page)
+    return JsonResponse({
+        'results': [{'id': str(object_id), 'text': text} for object_id, text in results],
+        'pagination': {'more': more},
+    })
+
+
 def get_session_count(request):
     if request:
         session_count = Session.objects.count()
@@ -105,7 +256,17 @@ def get_session_count(request):
         return JsonResponse({'error': 'Invalid request'}, status=400)
 
 
-class SessionViewSet(viewsets.ModelViewSet):
+# Модели, от которых зависят виджеты главной страницы
+HOME_CACHE_MODELS = (Session, Project, Competency, SessionCompetency, SearchDocument)
+
+# Модели, от которых зависит закэшированный список сессий
+SESSION_CACHE_MODELS = (Session, SessionCompetency, Evaluator, SearchDocument)
+SESSION_CACHE_PARAMS = ('title', 'title_words', 'evaluated', 'created_at_after', 'created_at_before',
+                        'search', 'ordering', 'page', 'status', 'format')
+SESSION_CACHE_TIMEOUT = 60 * 60
+
+
+class SessionViewSet(FastListMixin, viewsets.ModelViewSet):
     serializer_class = SessionSerializer
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_class = SessionFilter
@@ -118,36 +279,53 @@ class SessionViewSet(viewsets.ModelViewSet):
         Метод для вычисления среднего балла по оценкам для каждой сессии.
         """
         try:
-            # Агрегирование среднего балла по сессиям
-            sessions_with_avg_score = Session.objects.annotate(
-                average_score=Avg('assessments__score')
-            )
+            # Средний балл читается из сводок постранично, без агрегирования всех оценок
+            sessions = Session.objects.order_by('id').select_related('score_summary').only(
+                'id', 'title', *(f'score_summary__{name}' for name in SCORE_SUMMARY_FIELDS))
+            page = self.paginate_queryset(sessions)
 
             # Создаем список с результатами
             data = [
-                {
+                dict({
                     'session_id': session.id,
                     'title': session.title,
-                    'average_score': session.average_score
-                }
-                for session in sessions_with_avg_score
+                }, **score_summary_data(getattr(session, 'score_summary', None)))
+                for session in page
             ]
 
-            return Response(data)
+            return self.get_paginated_response(data)
 
         except Exception as e:
             return Response({"error": f"An error occurred: {str(e)}"}, status=500)
 
+    @action(methods=['GET'], detail=True)
+    def score_summary(self, request, pk=None):
+        """
+        Статистика оценок сессии в целом и по каждой компетенции.
+        """
+        session = get_object_or_404(Session.objects.select_related('score_summary'), pk=pk)
+        competencies = SessionCompetencyScoreSummary.objects.filter(
+            session_id=session.id).select_related('competency').order_by('competency_id')
+        summary = getattr(session, 'score_summary', None)
+        evaluator_count = summary.evaluator_count if summary else 0
+        return Response(dict(score_summary_data(summary), session_id=session.id, title=session.title, competencies=[
+            dict(score_summary_data(item), competency_id=item.competency_id, name=item.competency.name,
+                 completion=min(item.count / evaluator_count, 1.0) if evaluator_count else None)
+            for item in competencies
+        ]))
+
     @action(methods=['GET'], detail=False)
     def debug_cache(self, request):
         """
         Отладочный метод для проверки содержимого кэша.
         """
         try:
-            cached_data = cache.get('cached_sessions')
+            cache_key = self.get_list_cache_key(request)
+            cached_data = cache.get(cache_key)
+            versions = model_versions(SESSION_CACHE_MODELS)
             if cached_data:
-                return Response({"cached_sessions": cached_data})
-            return Response({"message": "Cache is empty"})
+                return Response({"cache_key": cache_key, "versions": versions, "cached_sessions": cached_data})
+            return Response({"message": "Cache is empty", "cache_key": cache_key, "versions": versions})
         except Exception as e:
             return Response({"error": f"An error occurred: {str(e)}"}, status=500)
 
@@ -156,22 +334,26 @@ class SessionViewSet(viewsets.ModelViewSet):
         """
         Метод для очистки кэша.
         """
-        cache_key = 'cached_sessions'
-        cache.delete(cache_key)
+        # Новые версии делают все закэшированные страницы недостижимыми
+        for model in SESSION_CACHE_MODELS:
+            bump_model_version(model)
         return Response({"message": "Cache cleared successfully"})
 
-    def get_queryset(self):
-        cache_key = 'cached_sessions'
-        sessions = cache.get(cache_key)
+    def get_list_cache_key(self, request):
+        digest = params_digest(request.query_params, SESSION_CACHE_PARAMS)
+        return f"sessions:list:{request.get_host()}:{versions_key(SESSION_CACHE_MODELS)}:{digest}"
 
-        if not sessions:
-            # Если кэш пуст, извлекаем данные из базы
-            sessions = list(Session.objects.values())
-            cache.set(cache_key, sessions, timeout=3600)  # Кэш на 1 час
+    def list(self, request, *args, **kwargs):
+        # В кэше лежит уже сериализованная страница для нормализованных параметров
+        data = get_or_build(
+            self.get_list_cache_key(request),
+            lambda: super(SessionViewSet, self).list(request, *args, **kwargs).data,
+            SESSION_CACHE_TIMEOUT,
+        )
+        return Response(data)
 
-        # Преобразуем данные в QuerySet
-        ids = [s['id'] for s in sessions]
-        queryset = Session.objects.filter(id__in=ids)
+    def get_queryset(self):
+        queryset = Session.objects.select_related('evaluated').prefetch_related('competencies').order_by('id')
 
         # Фильтрация
         status = self.request.query_params.get('status')
@@ -197,7 +379,7 @@ def competency_view(request):
     return render(request, 'competency_form.html', {'form': form})
 
 
-class CompetencyViewSet(viewsets.ModelViewSet):
+class CompetencyViewSet(FastListMixin, viewsets.ModelViewSet):
     queryset = Competency.objects.all()
     serializer_class = CompetencySerializer
     filter_backends = [DjangoFilterBackend]
@@ -270,14 +452,18 @@ class CompetencyViewSet(viewsets.ModelViewSet):
             fields_to_update['name'] = data['name']
         if 'description' in data:
             fields_to_update['description'] = data['description']
-        if 'department' in data:
-            fields_to_update['department'] = data['department']
+        # Поля department у компетенции нет: раньше update() с ним падал, теперь оно игнорируется
 
         if fields_to_update:
-            updated_count = Competency.objects.filter(
-                pk=pk).update(**fields_to_update)
+            # UPDATE с записью версии в историю, без save() и сигналов
+            updated_count = update_with_history(
+                Competency.objects.filter(pk=pk), fields_to_update,
+                user=request.user if request.user.is_authenticated else None)
 
             if updated_count > 0:
+                # Сигналы не посылаются — после коммита делаем то же, что signals.bump_cache_version
+                transaction.on_commit(lambda: model_changed(Competency))
+                search.schedule('competency', [int(pk)])
                 return Response({"detail": "Competency updated successfully"}, status=status.HTTP_200_OK)
             else:
                 return Response({"detail": "Competency not found"}, status=status.HTTP_404_NOT_FOUND)
@@ -312,8 +498,8 @@ class CompetencyViewSet(viewsets.ModelViewSet):
         return Response({"detail": "Both 'name' and 'department' query parameters are required"}, status=400)
 
 
-class UserProfileViewSet(viewsets.ModelViewSet):
-    queryset = Profile.objects.all()
+class UserProfileViewSet(FastListMixin, viewsets.ModelViewSet):
+    queryset = Profile.objects.select_related('user').prefetch_related('projects')
     serializer_class = UserProfileSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_class = UserProfileFilter
@@ -324,8 +510,8 @@ class AssessmentPagination(PageNumberPagination):
     max_page_size = 100
 
 
-class AssessmentViewSet(viewsets.ModelViewSet):
-    queryset = Assessment.objects.all()
+class AssessmentViewSet(FastListMixin, viewsets.ModelViewSet):
+    queryset = Assessment.objects.select_related('competency', 'evaluator')
     serializer_class = AssessmentSerializer
     ordering_fields = ['created_at']
 
@@ -347,6 +533,39 @@ class AssessmentViewSet(viewsets.ModelViewSet):
 
         return queryset
 
+    @action(methods=['GET'], detail=False, permission_classes=[IsAuthenticated])
+    def export(self, request):
+        """
+        Метод для выгрузки оценок в CSV, JSONL или XLSX (?export_format=...).
+        Большие выгрузки (или ?async=1) пишутся фоновой задачей, в ответе — ссылка на файл.
+        """
+        export_format = request.query_params.get('export_format', 'csv')
+        params = {name: request.query_params[name] for name in exports.FILTERS if request.query_params.get(name)}
+        try:
+            queryset = exports.assessment_queryset(params)
+            count = queryset.count()
+            exports.check_format(export_format, count)
+        except exports.ExportError as e:
+            return Response({"error": str(e)}, status=400)
+
+        if count > settings.ASSESSMENT_EXPORT['ASYNC_THRESHOLD'] or request.query_params.get('async') == '1':
+            relative_path, url = exports.export_path(export_format, request.user.id)
+            task = export_assessments.delay(export_format, params, relative_path)
+            return Response({"task_id": task.id, "rows": count, "url": request.build_absolute_uri(url)},
+                            status=status.HTTP_202_ACCEPTED)
+        return exports.export_response(queryset, export_format)
+
+    @action(methods=['GET'], detail=False, url_path=r'export/(?P<name>[^/]+)', url_name='export-file',
+            permission_classes=[IsAuthenticated])
+    def export_file(self, request, name):
+        """
+        Метод для скачивания файла фоновой выгрузки; доступен только запросившему её пользователю.
+        """
+        path = exports.stored_file(request.user.id, name)
+        if path is None:
+            return Response({"error": "Файл ещё не готов или срок его хранения истёк."}, status=404)
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=name)
+
     @action(methods=['GET'], detail=False)
     def by_user(self, request):
         user_id = request.query_params.get('user_id')
@@ -357,6 +576,17 @@ class AssessmentViewSet(viewsets.ModelViewSet):
             return Response(serializer.data)
         return Response({"detail": "user_id parameter is required"}, status=400)
 
+    @action(methods=['POST'], detail=False)
+    def submit_scoresheet(self, request):
+        """
+        Сохраняет сразу все оценки одного оценщика по сессии.
+        """
+        serializer = ScoresheetSerializer(data=request.data, context=self.get_serializer_context())
+        if serializer.is_valid():
+            result = serializer.save()
+            return Response(result, status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
     @action(methods=['POST'], detail=True)
     def add_assessment(self, request, pk=None):
         session = self.get_object()
@@ -405,33 +635,32 @@ def edit_avatar(request):
     else:
         form = ProfileAvatarForm(instance=profile)
 
-    return render(request, 'edit_avatar.html', {'form': form})
+    return render(request, 'edit_avatar.html', {'form': form, 'profile': profile})
 
 
 def home(request):
     query = request.GET.get('query', '')
 
-    # Проверяем, аутентифицирован ли пользователь
-    if request.user.is_authenticated:
-        try:
-            profile = request.user.profile
-        except Profile.DoesNotExist:
-            profile = None
-    else:
-        profile = None
+    # Роль и id профиля — из кэша ролей, без отдельного запроса к Profile
+    role = get_role_context(request.user)
 
+    # Запросы ленивые: при попадании во фрагментный кэш шаблона они не выполняются
     if query:
-        active_sessions = Session.objects.filter(title__icontains=query)
-        current_projects = Project.objects.filter(name__icontains=query)
-        top_competencies = Competency.objects.filter(name__icontains=query)
+        # Поиск по индексу; выполняется только при промахе фрагментного кэша
+        limit = settings.SEARCH['HOME_LIMIT']
+        active_sessions = SimpleLazyObject(lambda: search.ranked_objects(
+            Session.objects.select_related('evaluated'), search.search(query, ['session'], limit)))
+        current_projects = SimpleLazyObject(lambda: search.ranked_objects(
+            Project.objects.all(), search.search(query, ['project'], limit)))
+        top_competencies = SimpleLazyObject(lambda: search.ranked_objects(
+            Competency.objects.annotate(session_count=models.Count('sessions_set')),
+            search.search(query, ['competency'], limit)))
     else:
-        active_sessions = Session.objects.filter(
+        active_sessions = Session.objects.select_related('evaluated').filter(
             is_active=True).order_by('-created_at')[:5]
         current_projects = Project.objects.filter(
             end_date__isnull=False).order_by('-start_date')[:5]
-        top_competencies = Competency.objects.annotate(
-            session_count=models.Count('sessions_set')
-        ).order_by('-session_count')[:5]
+        top_competencies = SimpleLazyObject(lambda: read_models.get('top_competencies'))
 
     context = {
         'active_sessions': active_sessions,
@@ -439,7 +668,9 @@ def home(request):
         'top_competencies': top_competencies,
         'query': query,
         'text': 'рады видеть!',
-        'profile': profile
+        'role': role,
+        'cache_timeout': settings.PAGE_CACHE_TIMEOUT,
+        'widgets_version': versions_key(HOME_CACHE_MODELS),
     }
     return render(request, 'index.html', context)
 
@@ -453,18 +684,38 @@ def delete_session(request, session_id):
 
 
 def all_sessions(request):
-    sessions = Session.objects.all()
-    return render(request, 'all_sessions.html', {'sessions': sessions})
+    # Страница по ключу (created_at, id) из плоских строк — стоимость не зависит от числа сессий
+    sessions, next_cursor = keyset_page(
+        Session.objects.values('id', 'title', 'created_at', 'evaluated_id', 'evaluated__username'),
+        request.GET.get('cursor'), SESSIONS_PAGE_SIZE, field='created_at')
+    return render(request, 'all_sessions.html', {
+        'sessions': sessions,
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('cursor'),
+    })
 
 
 def all_projects(request):
     projects = Project.objects.all()
-    return render(request, 'all_projects.html', {'projects': projects})
+    return render(request, 'all_projects.html', {
+        'projects': projects,
+        'cache_timeout': settings.PAGE_CACHE_TIMEOUT,
+        'projects_version': versions_key((Project,)),
+    })
 
 
+@replica_reads
 def all_competencies(request):
-    competencies = Competency.objects.all()
-    return render(request, 'all_competencies.html', {'competencies': competencies})
+    # Число изменений считается подзапросом, а не отдельным запросом на строку
+    history_count = Competency.history.model.objects.filter(id=OuterRef('pk')).order_by().values(
+        'id').annotate(total=Count('*')).values('total')
+    competencies = Competency.objects.annotate(
+        history_count=Coalesce(Subquery(history_count), 0))
+    return render(request, 'all_competencies.html', {
+        'competencies': competencies,
+        'cache_timeout': settings.PAGE_CACHE_TIMEOUT,
+        'competencies_version': versions_key((Competency,)),
+    })
 
 
 def session_detail(request, pk):
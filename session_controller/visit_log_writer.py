@@ -0,0 +1,204 @@
+"""
+Буферизованная запись логов посещений и других некритичных записей.
+
+Middleware только кладёт запись в буфер процесса, а в базу она попадает
+пачкой через bulk_create из фонового потока (или уходит в задачу Celery),
+поэтому запрос не ждёт INSERT и не держит блокировку записи SQLite.
+
+Записи ставятся через submit() по видам (WRITERS) и пишутся пачками в
+коротких транзакциях. Сюда попадает только то, потерю чего при падении
+процесса можно пережить: не last_login — он входит в токен сброса пароля
+и обновляется синхронно стандартным приёмником Django.
+
+Каждая запись помнит базу, в которой её поставили. Если к моменту сброса
+база по умолчанию сменилась (тестовая база удалена, сброс при выходе из
+benchmark_routes), записи отбрасываются, а не пишутся в чужую базу.
+"""
+import atexit
+import logging
+import os
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BACKEND': 'buffer',  # 'buffer' — bulk_create в фоновом потоке, 'celery' — пачки в задачу, 'off'
+    'BATCH_SIZE': 100,  # сброс при накоплении стольких записей
+    'FLUSH_INTERVAL': 5.0,  # ... или не реже, чем раз в столько секунд
+    'MAX_BUFFER': 10000,  # всё, что сверх, отбрасывается и учитывается в dropped
+    'SAMPLE_RATE': 1.0,  # доля запросов, попадающих в лог
+    'EXCLUDE_PATHS': ('/static/', '/media/', '/__debug__/', '/swagger/'),
+}
+
+PATH_MAX_LENGTH = 255
+
+
+def current_database():
+    return str(connections[DEFAULT_DB_ALIAS].settings_dict['NAME'])
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'VISIT_LOG', {}))
+    config['EXCLUDE_PATHS'] = tuple(config['EXCLUDE_PATHS'])
+    return config
+
+
+class VisitLogWriter:
+    def __init__(self, config=None):
+        self.config = config or get_config()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._buffer = []
+        self._thread = None
+        self._pid = None
+        self.queued = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.skipped = 0
+
+    @property
+    def enabled(self):
+        return self.config['BACKEND'] != 'off'
+
+    def should_log(self, request):
+        """
+        Отсекает служебные пути и применяет выборку.
+        """
+        if not self.enabled or request.path.startswith(self.config['EXCLUDE_PATHS']):
+            return False
+        rate = self.config['SAMPLE_RATE']
+        if rate < 1.0 and random.random() >= rate:
+            self.skipped += 1
+            return False
+        return True
+
+    def enqueue(self, user_id, path, method, timestamp):
+        self.submit('visit_log', {
+            'user_id': user_id,
+            'path': path[:PATH_MAX_LENGTH],
+            'method': method,
+            'timestamp': timestamp,
+        })
+
+    def submit(self, kind, record):
+        """
+        Ставит запись вида kind (ключ WRITERS) в очередь фонового писателя.
+        """
+        if not self.enabled:
+            # Логи посещений выключены, но остальные записи нужны — пишем сразу
+            with transaction.atomic():
+                WRITERS[kind]([record])
+            return
+        with self._lock:
+            if len(self._buffer) >= self.config['MAX_BUFFER']:
+                self.dropped += 1
+                return
+            self._buffer.append((kind, current_database(), record))
+            self.queued += 1
+            full = len(self._buffer) >= self.config['BATCH_SIZE']
+        self._ensure_thread()
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        """
+        Забирает накопленные записи и пишет их пачкой на каждый вид.
+        """
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if not batch:
+            return 0
+        database = current_database()
+        by_kind = {}
+        foreign = 0
+        for kind, record_database, record in batch:
+            if record_database != database:
+                foreign += 1
+                continue
+            by_kind.setdefault(kind, []).append(record)
+        if foreign:
+            logger.warning("Отброшено %s записей, поставленных для другой базы", foreign)
+            with self._lock:
+                self.dropped += foreign
+        written = 0
+        for kind, records in by_kind.items():
+            try:
+                if kind == 'visit_log' and self.config['BACKEND'] == 'celery':
+                    from .tasks import write_visit_logs
+                    write_visit_logs.delay([
+                        dict(record, timestamp=record['timestamp'].isoformat()) for record in records
+                    ])
+                else:
+                    # Одна короткая транзакция на пачку вида вместо транзакции на каждую запись
+                    with transaction.atomic():
+                        WRITERS[kind](records, batch_size=self.config['BATCH_SIZE'])
+            except Exception:
+                logger.exception("Не удалось записать %s записей %s", len(records), kind)
+                with self._lock:
+                    self.dropped += len(records)
+                continue
+            written += len(records)
+        with self._lock:
+            self.flushed += written
+        return written
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': self.config['BACKEND'],
+                'buffered': len(self._buffer),
+                'queued': self.queued,
+                'flushed': self.flushed,
+                'dropped': self.dropped,
+                'skipped': self.skipped,
+            }
+
+    def _ensure_thread(self):
+        # После fork (gunicorn, celery prefork) поток родителя недоступен — запускаем свой
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name='visit-log-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.config['FLUSH_INTERVAL'])
+            self._wakeup.clear()
+            close_old_connections()
+            self.flush()
+
+
+def write_records(records, batch_size=500):
+    from .models import VisitLog
+
+    VisitLog.objects.bulk_create(
+        [VisitLog(**record) for record in records], batch_size=batch_size)
+
+
+WRITERS = {
+    'visit_log': write_records,
+}
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = VisitLogWriter()
+                atexit.register(_writer.flush)
+    return _writer
@@ -0,0 +1,142 @@
+"""
+Почасовые и посуточные агрегаты логов посещений.
+
+Сырые VisitLog обрабатываются инкрементально по возрастанию id: каждая
+пачка сворачивается в счётчики (период, user, path, method) и прибавляется
+к VisitRollup. Отчёты читают только агрегаты, а старые сырые строки после
+учёта удаляются задачей хранения.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+from django.utils.timezone import now
+
+from .models import VisitLog, VisitPath, VisitRollup, VisitRollupCheckpoint
+
+CHECKPOINT_NAME = 'visit_log'
+LOCK_KEY = 'visit_rollups:lock'
+LOCK_TIMEOUT = 60 * 10
+
+GROUP_FIELDS = {
+    'user': 'user__username',
+    'path': 'path__path',
+    'method': 'method',
+}
+
+
+def truncate(timestamp, period):
+    timestamp = timestamp.replace(minute=0, second=0, microsecond=0)
+    if period == 'day':
+        timestamp = timestamp.replace(hour=0)
+    return timestamp
+
+
+def get_path_ids(paths):
+    """
+    Возвращает {path: id}, добавляя недостающие пути в словарь.
+    """
+    paths = set(paths)
+    ids = dict(VisitPath.objects.filter(
+        path__in=paths).values_list('path', 'id'))
+    missing = paths - ids.keys()
+    if missing:
+        VisitPath.objects.bulk_create(
+            [VisitPath(path=path) for path in missing], ignore_conflicts=True)
+        ids.update(VisitPath.objects.filter(
+            path__in=missing).values_list('path', 'id'))
+    return ids
+
+
+def _apply(counts):
+    """
+    Прибавляет счётчики {(period, bucket, user_id, path_id, method): hits} к агрегатам.
+    """
+    buckets = {key[1] for key in counts}
+    user_ids = {key[2] for key in counts}
+    existing = {
+        (r.period, r.bucket, r.user_id, r.path_id, r.method): r
+        for r in VisitRollup.objects.filter(bucket__in=buckets, user_id__in=user_ids)
+    }
+    to_update, to_create = [], []
+    for key, hits in counts.items():
+        rollup = existing.get(key)
+        if rollup:
+            rollup.hits += hits
+            to_update.append(rollup)
+        else:
+            period, bucket, user_id, path_id, method = key
+            to_create.append(VisitRollup(
+                period=period, bucket=bucket, user_id=user_id,
+                path_id=path_id, method=method, hits=hits))
+    VisitRollup.objects.bulk_update(to_update, ['hits'], batch_size=500)
+    VisitRollup.objects.bulk_create(to_create, batch_size=500)
+
+
+def rollup_visit_logs(batch_size=5000):
+    """
+    Учитывает в агрегатах все новые сырые логи. Возвращает число обработанных строк.
+    """
+    if not cache.add(LOCK_KEY, 1, LOCK_TIMEOUT):
+        return 0
+    try:
+        checkpoint, _ = VisitRollupCheckpoint.objects.get_or_create(
+            name=CHECKPOINT_NAME)
+        processed = 0
+        while True:
+            rows = list(VisitLog.objects.filter(id__gt=checkpoint.last_id).order_by('id').values_list(
+                'id', 'user_id', 'path', 'method', 'timestamp')[:batch_size])
+            if not rows:
+                break
+            path_ids = get_path_ids(row[2] for row in rows)
+            counts = Counter()
+            for _, user_id, path, method, timestamp in rows:
+                for period in ('hour', 'day'):
+                    counts[(period, truncate(timestamp, period), user_id, path_ids[path], method)] += 1
+            with transaction.atomic():
+                _apply(counts)
+                checkpoint.last_id = rows[-1][0]
+                checkpoint.save(update_fields=['last_id', 'updated_at'])
+            processed += len(rows)
+        return processed
+    finally:
+        cache.delete(LOCK_KEY)
+
+
+def prune_visit_logs(days, batch_size=5000):
+    """
+    Сворачивает и удаляет сырые логи старше days дней. Удаляются только
+    строки, уже учтённые в агрегатах.
+    """
+    rollup_visit_logs()
+    checkpoint = VisitRollupCheckpoint.objects.filter(
+        name=CHECKPOINT_NAME).first()
+    if checkpoint is None:
+        return 0
+    cutoff = now() - timedelta(days=days)
+    deleted = 0
+    while True:
+        ids = list(VisitLog.objects.filter(
+            timestamp__lt=cutoff, id__lte=checkpoint.last_id).values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        deleted += VisitLog.objects.filter(id__in=ids).delete()[0]
+    return deleted
+
+
+def visit_report(period='day', since=None, group_by=('path',), limit=50):
+    """
+    Число посещений из агрегатов, сгруппированное по user/path/method.
+    """
+    fields = [GROUP_FIELDS[name] for name in group_by]
+    queryset = VisitRollup.objects.filter(period=period)
+    if since is not None:
+        queryset = queryset.filter(bucket__gte=truncate(since, period))
+    rows = queryset.values(*fields).annotate(
+        total=Sum('hits')).order_by('-total')[:limit]
+    return [
+        dict({name: row[GROUP_FIELDS[name]] for name in group_by}, hits=row['total'])
+        for row in rows
+    ]